@@ -2,6 +2,7 @@ from flask import Flask, request, jsonify, send_file, send_from_directory, make_
 from flask_cors import CORS
 from flask_mail import Mail, Message
 from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import jwt
@@ -14,9 +15,36 @@ from functools import wraps
 from dotenv import load_dotenv
 import redis
 import json
+import hashlib
+import mimetypes
+import math
+import time
 import openai  # Add OpenAI import
 import base64
+import io
 import requests
+import threading
+import tempfile
+
+from cache import NamespacedCache
+from json_provider import MongoJSONProvider
+from compression import COMPRESS_MIN_SIZE, DYNAMIC_LEVELS, compress, is_compressible, negotiate
+from db_indexes import ensure_indexes
+from image_variants import ImageVariantWorker, variant_fields
+from upload_storage import IMMUTABLE_MAX_AGE, hashed_name, is_content_hashed, save_stream
+from chunked_uploads import ChunkedUploadStore, UploadNotFound
+from upload_jobs import MAX_ATTEMPTS, CloudinaryUploader, LocalUploader, UploadJobQueue, public_job
+from upload_blobs import UploadBlobIndex, reference_projection, referenced_urls
+from stock_reservations import InsufficientStock, StockReservations, merge_lines
+from stock_alerts import FLUSH_INTERVAL, StockAlerts
+from order_pricing import ORDER_PRODUCT_PROJECTION, order_items, order_totals
+from sales_rollups import SalesRollups
+from delivery_queue import CLAIM_BATCH, DELIVERABLE_STATUSES, DELIVERY_PROJECTION, MAX_ACTIVE_CLAIMS, DeliveryQueue
+from delivery_zones import UNZONED, ZoneSummary, zone_fields
+from exports import EXPORT_BATCH_SIZE, EXPORT_FORMATS, batched, export_chunks, export_filename
+from idempotency import MAX_KEY_LENGTH, IdempotencyConflict, IdempotencyLedger, request_fingerprint
+from product_images import LEGACY_GALLERY_FIELDS, LEGACY_IMAGE_FIELDS, canonical_images
+from product_search import ProductSearchIndex
 
 # Conditional import for cloudinary
 try:
@@ -75,6 +103,9 @@ else:
     print("Cloudinary library not available, using mock implementation")
 
 app = Flask(__name__)
+# ObjectId/datetime/Decimal128 are serialized by the provider, so handlers
+# can return Mongo documents as they come off the cursor
+app.json = MongoJSONProvider(app)
 CORS(
     app,
     origins=[
@@ -87,7 +118,7 @@ CORS(
         "https://green-cart-pi-sepia.vercel.app"
     ],
     methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "Cache-Control", "Pragma", "Expires"],
+    allow_headers=["Content-Type", "Authorization", "Cache-Control", "Pragma", "Expires", "Idempotency-Key", "X-Part-SHA256"],
     supports_credentials=True,
     vary_header=True
 )
@@ -125,8 +156,8 @@ def add_cors_headers(response):
     
     response.headers['Access-Control-Allow-Credentials'] = 'true'
     response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
-    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, Cache-Control, Pragma, Expires'
-    response.headers['Vary'] = 'Origin'
+    response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization, Cache-Control, Pragma, Expires, Idempotency-Key, X-Part-SHA256'
+    response.vary.add('Origin')
     return response
 
 # Apply the CORS headers to all responses
@@ -155,7 +186,7 @@ def handle_preflight():
         else:
             response.headers.add("Access-Control-Allow-Origin", "https://greencart-frontend-r7zs.onrender.com")
             
-        response.headers.add('Access-Control-Allow-Headers', "Content-Type, Authorization, Cache-Control, Pragma, Expires")
+        response.headers.add('Access-Control-Allow-Headers', "Content-Type, Authorization, Cache-Control, Pragma, Expires, Idempotency-Key, X-Part-SHA256")
         response.headers.add('Access-Control-Allow-Methods', "GET, POST, PUT, DELETE, OPTIONS")
         response.headers.add('Access-Control-Allow-Credentials', "true")
         return response
@@ -187,6 +218,16 @@ categories_collection = db.categories
 remedy_categories_collection = db.remedy_categories
 crops_collection = db.crop_suitability
 
+# Index bootstrap: idempotent, runs off the request path so a slow or
+# unreachable Mongo never delays startup. Set ENSURE_INDEXES=false to skip.
+def bootstrap_indexes():
+    for collection_name, index_name, status in ensure_indexes(db):
+        if status != 'ok':
+            print(f"Index {collection_name}.{index_name} {status}")
+
+if os.getenv('ENSURE_INDEXES', 'true').lower() == 'true':
+    threading.Thread(target=bootstrap_indexes, name='index-bootstrap', daemon=True).start()
+
 # JWT Configuration
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'greencart-secret-key-2024-secure-jwt-token')
 
@@ -225,9 +266,195 @@ if REDIS_HOST:
         print("Redis connection successful")
     except Exception as e:
         print(f"Redis connection failed: {e}")
+        redis_client = None
 else:
     print("Redis is disabled")
 
+# Namespaced cache: admin writes bump a namespace generation, which retires
+# every cached key derived from it
+cache = NamespacedCache(redis_client)
+
+def invalidates(*namespaces):
+    """Bump the given cache namespaces after a successful write"""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            response = app.make_response(f(*args, **kwargs))
+            if response.status_code < 400:
+                cache.invalidate(*namespaces)
+            return response
+        return wrapper
+    return decorator
+
+class UncacheableResponse(Exception):
+    """Raised inside a cache loader so error responses are returned but never stored"""
+    def __init__(self, response):
+        super().__init__(response.status)
+        self.response = response
+
+def payload_response(entry):
+    """
+    Send a cached JSON payload, pre-compressed when the client allows, that
+    clients must revalidate by ETag. Endpoints with conditional validators
+    send those instead of the body hash, so the ETag a client echoes back is
+    the one answer_conditional_get checks before the view runs.
+    """
+    validators = g.get('conditional_validators')
+    encoding = negotiate(request.accept_encodings, entry.variants)
+    if encoding:
+        response = app.response_class(entry.variants[encoding], mimetype='application/json')
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = app.response_class(entry.body, mimetype='application/json')
+    if validators is not None:
+        response.set_etag(validators[0], weak=True)
+    elif encoding:
+        # Encoded bodies are not byte-identical to the identity one
+        response.set_etag(entry.etag, weak=True)
+    else:
+        response.set_etag(entry.etag)
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+def cached_view(namespace, ttl=300, stale_ttl=600):
+    """
+    Serve a public GET view from the namespace's two-tier cache. The view
+    runs at most once per key and generation across workers; its 200
+    responses are stored as bytes and anything else is passed through.
+    Without Redis, entries are kept for seconds only (cache.LOCAL_ONLY_TTL).
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            path, query_string = request.path, request.query_string
+            name = f.__name__
+            if query_string or kwargs:
+                name += ':' + hashlib.sha1(json.dumps(
+                    [sorted(request.args.items(multi=True)), kwargs], sort_keys=True
+                ).encode('utf-8')).hexdigest()
+            
+            def load():
+                # Background refreshes run after the request is gone, so give
+                # the view a request context of its own
+                with app.test_request_context(path, query_string=query_string):
+                    response = app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    raise UncacheableResponse(response)
+                body = response.get_data()
+                return hashlib.sha1(body).hexdigest(), body
+            
+            try:
+                entry = cache.fetch_entry(namespace, name, load, ttl, stale_ttl)
+            except UncacheableResponse as uncacheable:
+                return uncacheable.response
+            return payload_response(entry)
+        return wrapper
+    return decorator
+
+# Response compression
+# Cached payloads carry pre-compressed variants (see payload_response); any
+# other large JSON/text response is compressed here on the way out.
+@app.after_request
+def compress_response(response):
+    if not is_compressible(response.mimetype):
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or (response.content_length or 0) < COMPRESS_MIN_SIZE):
+        return response
+    
+    encoding = negotiate(request.accept_encodings)
+    if not encoding:
+        return response
+    response.set_data(compress(response.get_data(), encoding, DYNAMIC_LEVELS[encoding]))
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+# Conditional GET for public reads
+# Validators are derived from the namespace generations behind each endpoint,
+# so a repeat visitor whose copy is still current gets a 304 before the view
+# queries Mongo or serializes anything. That needs generations shared through
+# Redis: a per-process generation never sees another worker's writes.
+CONDITIONAL_ENDPOINTS = {
+    'public_list_products': ('products',),
+    'search_products_endpoint': ('products', 'product_search'),
+    'get_product_by_id': ('products',),
+    'list_categories': ('categories',),
+    'list_product_categories': ('categories',),
+    'list_remedies': ('remedies',),
+    'get_remedy': ('remedies',),
+    'list_remedy_categories': ('remedy_categories',),
+    'get_reviews': ('reviews',),
+    'get_blog_posts': ('blog_posts',),
+    'get_blog_post': ('blog_posts',),
+    'get_events': ('events',),
+    'get_all_crop_suitability': ('crops',),
+}
+# Upcoming events drop off the list as time passes, so their validators also
+# roll over on a fixed time bucket
+EVENTS_VALIDATOR_BUCKET = 600
+
+def conditional_validators():
+    """Return (etag, last_modified epoch) for the current public GET, or None"""
+    namespaces = CONDITIONAL_ENDPOINTS.get(request.endpoint)
+    if not namespaces or request.method != 'GET' or not cache.shared:
+        return None
+    
+    parts = [request.endpoint, request.query_string.decode('latin-1'), sorted((request.view_args or {}).items())]
+    parts += [cache.generation(ns) for ns in namespaces]
+    last_modified = max(cache.changed_at(ns) for ns in namespaces)
+    if request.endpoint == 'get_events':
+        bucket = int(time.time() // EVENTS_VALIDATOR_BUCKET)
+        parts.append(bucket)
+        last_modified = max(last_modified, bucket * EVENTS_VALIDATOR_BUCKET)
+    # Some reads are personalised (e.g. blog "liked" flags)
+    auth = request.headers.get('Authorization')
+    if auth:
+        parts.append(hashlib.sha1(auth.encode('utf-8')).hexdigest())
+    
+    etag = hashlib.sha1(json.dumps(parts).encode('utf-8')).hexdigest()
+    # HTTP dates have one-second resolution; round up so a change is never hidden
+    return etag, math.ceil(last_modified)
+
+@app.before_request
+def answer_conditional_get():
+    validators = conditional_validators()
+    if validators is None:
+        return None
+    g.conditional_validators = validators
+    etag, last_modified = validators
+    
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since:
+        fresh = last_modified <= request.if_modified_since.timestamp()
+    else:
+        fresh = False
+    if fresh:
+        response = app.response_class(status=304)
+        return apply_conditional_headers(response, validators)
+    return None
+
+def apply_conditional_headers(response, validators):
+    etag, last_modified = validators
+    if 'ETag' not in response.headers:
+        response.set_etag(etag, weak=True)
+    response.last_modified = datetime.datetime.fromtimestamp(last_modified, datetime.timezone.utc)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.after_request
+def add_conditional_headers(response):
+    validators = g.get('conditional_validators')
+    if validators is not None and response.status_code == 200:
+        apply_conditional_headers(response, validators)
+    return response
+
 # OTP Helper Functions
 def generate_otp():
     """Generate a random OTP of specified length"""
@@ -432,10 +659,6 @@ def token_required(f):
             return jsonify({'success': False, 'error': f'Authentication error: {str(e)}'}), 401
     return wrapper
 
-@app.route('/uploads/<filename>')
-def uploaded_file(filename):
-    return send_from_directory(UPLOAD_DIR, filename)
-
 @app.route('/')
 def home():
     return 'GreenCart Flask Backend Running!'
@@ -878,38 +1101,21 @@ def toggle_user_active(user_id):
 @admin_required
 def admin_list_products():
     try:
-        q = request.args.get('q', '').strip().lower()
+        q = request.args.get('q', '').strip()
+        if q:
+            # Ranked, typo-tolerant match from the search index
+            ranked = [pid for pid, _ in ensure_search_index().search(q, limit=None)]
+            rank = {pid: i for i, pid in enumerate(ranked)}
+            products = sorted(
+                products_collection.find({'_id': {'$in': [ObjectId(pid) for pid in ranked]}}, PRODUCT_LIST_PROJECTION),
+                key=lambda p: rank[str(p['_id'])]
+            )
+        else:
+            products = products_collection.find({}, PRODUCT_LIST_PROJECTION)
         items = []
-        for p in products_collection.find():
+        for p in products:
             try:
-                # Handle image URLs properly - check all possible fields
-                image_url = (p.get('image') or 
-                            p.get('imageUrl') or 
-                            p.get('imagePath') or 
-                            p.get('image_path') or 
-                            p.get('photo') or 
-                            p.get('thumbnail') or 
-                            '')
-                
-                # Ensure image_url starts with /uploads/ if it's a local path
-                if image_url and not image_url.startswith('http') and not image_url.startswith('/uploads/'):
-                    image_url = '/uploads/' + image_url.lstrip('/')
-                
-                doc = {
-                    'id': str(p['_id']),
-                    'name': p.get('name'),
-                    'category': p.get('category'),
-                    'subcategory': p.get('subcategory', ''),
-                    'price': float(p.get('price', 0)),
-                    'description': p.get('description', 'No description available'),
-                    'stock': int(p.get('stock', 0)),
-                    'imageUrl': image_url,
-                    'image': image_url,  # Ensure both fields are present
-                    'arModelUrl': p.get('arModelUrl', ''),
-                }
-                print(f"DEBUG: Admin Product {doc['id']} image_url: {image_url}") # Debug log
-                if not q or q in (doc['name'] or '').lower() or q in (doc['category'] or '').lower() or q in (doc['subcategory'] or '').lower():
-                    items.append(doc)
+                items.append(format_public_product(p))
             except Exception as item_e:
                 print(f"Error processing admin product {p.get('_id')}: {item_e}")
         return jsonify(items)
@@ -921,15 +1127,6 @@ def admin_list_products():
 def admin_create_product():
     try:
         data = request.get_json()
-        # Handle image URL properly
-        image_url = data.get('image') or data.get('imageUrl', '')
-        
-        # If image_url is a relative path, make it absolute
-        if image_url and not image_url.startswith('http') and not image_url.startswith('/uploads/'):
-            # If it's a relative path, make it absolute
-            if not image_url.startswith('/'):
-                image_url = '/uploads/' + image_url.lstrip('/')
-        
         doc = {
             'name': data.get('name'),
             'category': data.get('category'),
@@ -937,15 +1134,19 @@ def admin_create_product():
             'price': float(data.get('price', 0)),
             'description': data.get('description', ''),
             'stock': int(data.get('stock', 0)),
-            'imageUrl': image_url,
-            'image': image_url,
+            # One canonical image (+ optional gallery), normalized once here
+            **canonical_images(data),
             'arModelUrl': data.get('arModelUrl', ''),
             'created_at': datetime.datetime.utcnow(),
         }
+        doc.update(image_variant_fields(doc['image']))
         # validations
         if not doc['name'] or not doc['category'] or doc['price'] <= 0 or doc['stock'] < 0:
             return jsonify({'error': 'Validation failed'}), 400
         res = products_collection.insert_one(doc)
+        track_upload_refs('products', after=doc)
+        bump_catalog_version()
+        refresh_search_index(res.inserted_id, doc)
         return jsonify({'id': str(res.inserted_id)}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -955,15 +1156,6 @@ def admin_create_product():
 def admin_update_product(product_id):
     try:
         data = request.get_json()
-        # Handle image URL properly
-        image_url = data.get('image') or data.get('imageUrl', '')
-        
-        # If image_url is a relative path, make it absolute
-        if image_url and not image_url.startswith('http') and not image_url.startswith('/uploads/'):
-            # If it's a relative path, make it absolute
-            if not image_url.startswith('/'):
-                image_url = '/uploads/' + image_url.lstrip('/')
-        
         update = {
             'name': data.get('name'),
             'category': data.get('category'),
@@ -971,13 +1163,31 @@ def admin_update_product(product_id):
             'price': float(data.get('price', 0)),
             'description': data.get('description', ''),
             'stock': int(data.get('stock', 0)),
-            'imageUrl': image_url,
-            'image': image_url,
+            **canonical_images(data),
             'arModelUrl': data.get('arModelUrl', ''),
         }
+        update.update(image_variant_fields(update['image'], replace=True))
         if not update['name'] or not update['category'] or update['price'] <= 0 or update['stock'] < 0:
             return jsonify({'error': 'Validation failed'}), 400
-        products_collection.update_one({'_id': ObjectId(product_id)}, {'$set': update})
+        legacy_fields = LEGACY_IMAGE_FIELDS
+        if any(field in data for field in ('gallery',) + LEGACY_GALLERY_FIELDS):
+            legacy_fields += LEGACY_GALLERY_FIELDS
+        else:
+            # Edits that do not send a gallery keep the stored one
+            update.pop('gallery')
+        previous = products_collection.find_one_and_update({'_id': ObjectId(product_id)}, {
+            '$set': update,
+            '$unset': {field: '' for field in legacy_fields},
+        }, projection={**reference_projection('products'), **SEARCH_PROJECTION})
+        if previous is None:
+            return jsonify({'error': 'Product not found'}), 404
+        track_upload_refs('products', before=previous, after={**previous, **update})
+        bump_catalog_version()
+        # Price and stock edits leave the search index as it is
+        if any(previous.get(field) != update.get(field) for field in SEARCH_PROJECTION):
+            refresh_search_index(product_id, update)
+        # Restocking resolves the product's stock alerts
+        stock_alerts.observe([{'_id': product_id, 'name': update['name'], 'stock': update['stock']}])
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -986,75 +1196,350 @@ def admin_update_product(product_id):
 @admin_required
 def admin_delete_product(product_id):
     try:
-        products_collection.delete_one({'_id': ObjectId(product_id)})
+        removed = products_collection.find_one_and_delete({'_id': ObjectId(product_id)}, projection=reference_projection('products'))
+        track_upload_refs('products', before=removed)
+        bump_catalog_version()
+        refresh_search_index(product_id)
         return '', 204
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
-# Public catalog (no auth) - WITH REDIS CACHING
+# Public catalog snapshot
+# Serialized product listings are kept as ready-to-send bytes under the
+# 'products' cache generation. Any write that changes what the listing shows
+# bumps the generation, which retires every older payload at once. Without
+# Redis the generation is per process, so the cache caps these lifetimes to
+# a few seconds (cache.LOCAL_ONLY_TTL).
+CATALOG_SNAPSHOT_TTL = 3600
+CATALOG_PAGE_TTL = 300
+CATALOG_STALE_TTL = 600
+
+# Listing sort options: name -> (field, direction). Ties are broken on _id.
+PRODUCT_SORTS = {
+    'newest': ('_id', -1),
+    'price_asc': ('price', 1),
+    'price_desc': ('price', -1),
+    'name': ('name', 1),
+}
+PRODUCT_PAGE_DEFAULT = 24
+PRODUCT_PAGE_MAX = 100
+PRODUCT_LIST_PROJECTION = {
+    'name': 1, 'category': 1, 'subcategory': 1, 'price': 1, 'description': 1, 'stock': 1,
+    'image': 1, 'imageSrcset': 1, 'arModelUrl': 1,
+}
+
+def get_catalog_version():
+    """Return the current catalog version token"""
+    return cache.generation('products')
+
+def bump_catalog_version():
+    """Invalidate every catalog payload after a product write"""
+    return cache.bump('products')
+
+def format_public_product(p):
+    """Shape a product document for the public listing"""
+    # `image` is normalized at write time (see product_images)
+    image_url = p.get('image', '')
+    return {
+        'id': str(p['_id']),
+        'name': p.get('name'),
+        'category': p.get('category'),
+        'subcategory': p.get('subcategory', ''),
+        'price': float(p.get('price', 0)),
+        'description': p.get('description', 'No description available'),
+        'stock': int(p.get('stock', 0)),
+        'imageUrl': image_url,
+        'image': image_url,  # Ensure both fields are present
+        'srcset': p.get('imageSrcset', {}),
+        'arModelUrl': p.get('arModelUrl', ''),
+    }
+
+def serialize_payload(data):
+    """Encode a JSON payload once and return (etag, body)"""
+    body = app.json.dumps_bytes(data)
+    return hashlib.sha1(body).hexdigest(), body
+
+def build_catalog_snapshot():
+    """Serialize the full catalog once and return (etag, body)"""
+    items = []
+    for p in products_collection.find({}, PRODUCT_LIST_PROJECTION):
+        try:
+            items.append(format_public_product(p))
+        except Exception as item_e:
+            print(f"Error processing product {p.get('_id')}: {item_e}")
+    
+    return serialize_payload(items)
+
+def get_catalog_payload(name, builder, ttl=CATALOG_SNAPSHOT_TTL):
+    """Return the cache entry for a named catalog payload at the current version, building it on a miss"""
+    return cache.fetch_entry('products', name, builder, ttl, CATALOG_STALE_TTL)
+
+def get_catalog_snapshot():
+    """Return the cache entry for the full catalog at the current version"""
+    return get_catalog_payload('all', build_catalog_snapshot)
+
+def encode_product_cursor(sort_name, doc):
+    """Build an opaque keyset token from the last product on a page"""
+    field = PRODUCT_SORTS[sort_name][0]
+    token = {'s': sort_name, 'id': str(doc['_id'])}
+    if field != '_id':
+        token['v'] = doc.get(field)
+    raw = json.dumps(token, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_product_cursor(sort_name, cursor):
+    """Turn a keyset token back into a Mongo range condition"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        token = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        last_id = ObjectId(token['id'])
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if token.get('s') != sort_name:
+        raise ValueError('Cursor does not match the requested sort')
+    
+    field, direction = PRODUCT_SORTS[sort_name]
+    op = '$gt' if direction == 1 else '$lt'
+    if field == '_id':
+        return {'_id': {op: last_id}}
+    last_value = token.get('v')
+    return {'$or': [
+        {field: {op: last_value}},
+        {field: last_value, '_id': {op: last_id}},
+    ]}
+
+def parse_product_list_args(args):
+    """Validate listing query params into (query, sort_name, limit, cursor)"""
+    query = {}
+    category = args.get('category', '').strip()
+    subcategory = args.get('subcategory', '').strip()
+    if category and category.lower() != 'all':
+        query['category'] = category
+    if subcategory and subcategory.lower() != 'all':
+        query['subcategory'] = subcategory
+    
+    price = {}
+    for param, op in (('minPrice', '$gte'), ('maxPrice', '$lte')):
+        if args.get(param):
+            try:
+                price[op] = float(args.get(param))
+            except ValueError:
+                raise ValueError(f'{param} must be a number')
+    if price:
+        query['price'] = price
+    
+    if args.get('inStock', '').lower() in ('1', 'true', 'yes'):
+        query['stock'] = {'$gt': 0}
+    
+    sort_name = args.get('sort') or None
+    if sort_name is not None and sort_name not in PRODUCT_SORTS:
+        raise ValueError(f"sort must be one of: {', '.join(PRODUCT_SORTS)}")
+    
+    limit = None
+    if args.get('limit') or args.get('cursor'):
+        try:
+            limit = int(args.get('limit', PRODUCT_PAGE_DEFAULT))
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        limit = max(1, min(limit, PRODUCT_PAGE_MAX))
+    
+    return query, sort_name, limit, args.get('cursor') or None
+
+def build_product_page(query, sort_name, limit, cursor):
+    """Run a filtered, sorted listing query and return (etag, body)"""
+    field, direction = PRODUCT_SORTS[sort_name]
+    sort_spec = [(field, direction)] if field == '_id' else [(field, direction), ('_id', direction)]
+    
+    if cursor:
+        query = {'$and': [query, decode_product_cursor(sort_name, cursor)]}
+    
+    found = products_collection.find(query, PRODUCT_LIST_PROJECTION).sort(sort_spec)
+    if limit is None:
+        return serialize_payload([format_public_product(p) for p in found])
+    
+    docs = list(found.limit(limit + 1))
+    next_cursor = encode_product_cursor(sort_name, docs[limit - 1]) if len(docs) > limit else None
+    return serialize_payload({
+        'items': [format_public_product(p) for p in docs[:limit]],
+        'next': next_cursor,
+    })
+
+# Public catalog (no auth) - served from versioned payloads
 @app.route('/api/products', methods=['GET'])
 def public_list_products():
     try:
-        # Initialize cache_key
-        cache_key = f"products_list_{request.args.get('category', 'all')}_{request.args.get('subcategory', 'all')}"
+        try:
+            query, sort_name, limit, cursor = parse_product_list_args(request.args)
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
         
-        # Try to get cached response first (if Redis is available)
-        if redis_client:
-            try:
-                cached_data = redis_client.get(cache_key)
-                if cached_data:
-                    # Ensure cached_data is a string before parsing
-                    if isinstance(cached_data, (str, bytes)):
-                        return jsonify(json.loads(cached_data))
-                    else:
-                        # If it's not a string/bytes, treat as already parsed data
-                        return jsonify(cached_data)
-            except Exception as e:
-                print(f"Redis cache read error: {e}")
-                # Continue without cache if Redis fails
+        if not query and limit is None and sort_name is None:
+            # Unfiltered listing: the shared full-catalog snapshot
+            entry = get_catalog_snapshot()
+        else:
+            # Filtered listings and keyset pages are cached per catalog version
+            sort_name = sort_name or 'newest'
+            page_key = hashlib.sha1(json.dumps(
+                [query, sort_name, limit, cursor], sort_keys=True, default=str
+            ).encode('utf-8')).hexdigest()
+            entry = get_catalog_payload(
+                f"page:{page_key}",
+                lambda: build_product_page(query, sort_name, limit, cursor),
+                ttl=CATALOG_PAGE_TTL
+            )
+        
+        # Clients may keep the body but must revalidate; unchanged catalogs answer 304
+        return payload_response(entry)
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        # If not in cache or Redis not available, fetch from database
-        items = []
-        for p in products_collection.find({}):
-            try:
-                # Handle image URLs properly - check all possible fields
-                image_url = (p.get('image') or 
-                            p.get('imageUrl') or 
-                            p.get('imagePath') or 
-                            p.get('image_path') or 
-                            p.get('photo') or 
-                            p.get('thumbnail') or 
-                            '')
-                
-                # Ensure image_url starts with /uploads/ if it's a local path
-                if image_url and not image_url.startswith('http') and not image_url.startswith('/uploads/'):
-                    image_url = '/uploads/' + image_url.lstrip('/')
-                
-                items.append({
-                    'id': str(p['_id']),
-                    'name': p.get('name'),
-                    'category': p.get('category'),
-                    'subcategory': p.get('subcategory', ''),
-                    'price': float(p.get('price', 0)),
-                    'description': p.get('description', 'No description available'),
-                    'stock': int(p.get('stock', 0)),
-                    'imageUrl': image_url,
-                    'image': image_url,  # Ensure both fields are present
-                    'arModelUrl': p.get('arModelUrl', ''),
-                })
-            except Exception as item_e:
-                print(f"Error processing product {p.get('_id')}: {item_e}")
+# Product search
+# The in-process index follows the 'product_search' cache generation, bumped
+# only when product text changes, so stock updates never force a rebuild.
+# Without Redis that generation is per process and maintenance scripts cannot
+# reach it, so the index is also rebuilt once it is SEARCH_INDEX_LOCAL_TTL old.
+SEARCH_PROJECTION = {'name': 1, 'category': 1, 'subcategory': 1, 'description': 1}
+SEARCH_PAGE_DEFAULT = 20
+SEARCH_INDEX_LOCAL_TTL = 60
+
+product_search_index = ProductSearchIndex()
+
+def ensure_search_index():
+    """Rebuild the search index if another worker has changed the catalog text"""
+    version = cache.generation('product_search')
+    expired = not cache.shared and product_search_index.age() > SEARCH_INDEX_LOCAL_TTL
+    if product_search_index.version != version or expired:
+        product_search_index.build(products_collection.find({}, SEARCH_PROJECTION), version)
+    return product_search_index
+
+def refresh_search_index(product_id, product=None):
+    """Apply a product write (None for a delete) to the search index"""
+    previous, current = cache.bump('product_search')
+    product_search_index.apply(product_id, product, previous, current)
+
+def search_products(query, limit=SEARCH_PAGE_DEFAULT, category=None):
+    """Return public product dicts with a relevance score, best match first"""
+    ranked = ensure_search_index().search(query, limit=limit, category=category)
+    if not ranked:
+        return []
+    found = products_collection.find({'_id': {'$in': [ObjectId(pid) for pid, _ in ranked]}}, PRODUCT_LIST_PROJECTION)
+    docs = {str(p['_id']): p for p in found}
+    items = []
+    for product_id, score in ranked:
+        if product_id in docs:
+            item = format_public_product(docs[product_id])
+            item['score'] = score
+            items.append(item)
+    return items
+
+@app.route('/api/products/search', methods=['GET'])
+def search_products_endpoint():
+    try:
+        q = request.args.get('q', '').strip()
+        if not q:
+            return jsonify({'error': 'Query parameter q is required'}), 400
+        try:
+            limit = max(1, min(int(request.args.get('limit', SEARCH_PAGE_DEFAULT)), PRODUCT_PAGE_MAX))
+        except ValueError:
+            return jsonify({'error': 'limit must be an integer'}), 400
         
-        # Cache the result in Redis for 5 minutes (if Redis is available)
-        if redis_client:
-            try:
-                redis_client.setex(cache_key, 300, json.dumps(items))
-                print("Products cached in Redis for 5 minutes")
-            except Exception as e:
-                print(f"Error caching products in Redis: {e}")
+        items = search_products(q, limit, request.args.get('category') or None)
+        return jsonify({'query': q, 'count': len(items), 'items': items})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Cart hydration: one $in query for every line instead of three calls per product
+PRODUCT_BATCH_MAX = 100
+
+def check_cart_items(lines):
+    """
+    Resolve cart lines [{id, quantity, price}] against current products and
+    return one result per line: summary, stock, availability and price drift.
+    """
+    object_ids = {}
+    for line in lines:
+        try:
+            object_ids[line['id']] = ObjectId(line['id'])
+        except Exception:
+            pass
+    
+    products = {}
+    if object_ids:
+        for p in products_collection.find({'_id': {'$in': list(set(object_ids.values()))}}, PRODUCT_LIST_PROJECTION):
+            products[str(p['_id'])] = p
+    
+    results = []
+    for line in lines:
+        product = products.get(str(object_ids.get(line['id'], '')))
+        if product is None:
+            results.append({
+                'id': line['id'],
+                'found': False,
+                'available': False,
+                'error': 'Product not found' if line['id'] in object_ids else 'Invalid product ID',
+            })
+            continue
+        
+        summary = format_public_product(product)
+        stock = summary['stock']
+        cart_price = line.get('price')
+        results.append({
+            'id': line['id'],
+            'found': True,
+            'product': summary,
+            'stock': stock,
+            'inStock': stock > 0,
+            'requestedQuantity': line['quantity'],
+            'available': stock >= line['quantity'],
+            'maxAvailable': stock,
+            'price': summary['price'],
+            'cartPrice': cart_price,
+            'priceChanged': cart_price is not None and round(cart_price, 2) != round(summary['price'], 2),
+        })
+    return results
+
+def parse_cart_lines(data):
+    """Validate the batch request body into [{id, quantity, price}]"""
+    raw = (data or {}).get('items')
+    if raw is None and isinstance((data or {}).get('ids'), list):
+        raw = [{'id': product_id} for product_id in data['ids']]
+    if not isinstance(raw, list) or not raw:
+        raise ValueError('items must be a non-empty list')
+    if len(raw) > PRODUCT_BATCH_MAX:
+        raise ValueError(f'At most {PRODUCT_BATCH_MAX} items per request')
+    
+    lines = []
+    for item in raw:
+        if isinstance(item, str):
+            item = {'id': item}
+        if not isinstance(item, dict) or not item.get('id'):
+            raise ValueError('Each item needs an id')
+        try:
+            quantity = int(item.get('quantity', 1))
+            price = float(item['price']) if item.get('price') is not None else None
+        except (TypeError, ValueError):
+            raise ValueError('quantity and price must be numbers')
+        if quantity < 1:
+            raise ValueError('quantity must be at least 1')
+        lines.append({'id': str(item['id']), 'quantity': quantity, 'price': price})
+    return lines
+
+@app.route('/api/products/batch', methods=['POST'])
+def batch_products():
+    try:
+        try:
+            lines = parse_cart_lines(request.get_json(silent=True))
+        except ValueError as ve:
+            return jsonify({'error': str(ve)}), 400
         
-        print(f"DEBUG: Public Product image_urls: {[item['imageUrl'] for item in items]}")
-        return jsonify(items)
+        results = check_cart_items(lines)
+        return jsonify({
+            'items': results,
+            'allAvailable': all(r['available'] for r in results),
+            'priceChanged': any(r.get('priceChanged') for r in results),
+        })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1067,18 +1552,7 @@ def get_product_by_id(product_id):
         if not product:
             return jsonify({'error': 'Product not found'}), 404
         
-        # Handle image URLs properly - check all possible fields
-        image_url = (product.get('image') or 
-                    product.get('imageUrl') or 
-                    product.get('imagePath') or 
-                    product.get('image_path') or 
-                    product.get('photo') or 
-                    product.get('thumbnail') or 
-                    '')
-        
-        # Ensure image_url starts with /uploads/ if it's a local path
-        if image_url and not image_url.startswith('http') and not image_url.startswith('/uploads/'):
-            image_url = '/uploads/' + image_url.lstrip('/')
+        image_url = product.get('image', '')
         
         # Prepare the response
         product_data = {
@@ -1096,7 +1570,9 @@ def get_product_by_id(product_id):
             'arModelUrl': product.get('arModelUrl', ''),
             'rating': product.get('rating', 0),
             'reviews': product.get('reviews', 0),
-            'images': product.get('images', [image_url])  # Ensure we have an images array
+            'images': ([image_url] if image_url else []) + product.get('gallery', []),
+            'srcset': product.get('imageSrcset', {}),
+            'imageVariants': product.get('imageVariants', []),
         }
         
         return jsonify(product_data)
@@ -1105,6 +1581,7 @@ def get_product_by_id(product_id):
 
 # Categories Management
 @app.route('/api/categories', methods=['GET'])
+@cached_view('categories')
 def list_categories():
     try:
         items = []
@@ -1128,6 +1605,7 @@ def list_categories():
                 'name': cat.get('name'),
                 'description': cat.get('description', ''),
                 'imageUrl': full_image_url,  # Use the properly formatted image URL
+                'srcset': cat.get('imageSrcset', {}),
                 'subcategories': subcategories
             })
         return jsonify(items)
@@ -1136,6 +1614,7 @@ def list_categories():
 
 @app.route('/api/categories', methods=['POST'])
 @admin_required
+@invalidates('categories')
 def create_category():
     try:
         data = request.get_json()
@@ -1145,16 +1624,19 @@ def create_category():
             'imageUrl': data.get('imageUrl', ''),  # Add imageUrl field
             'subcategories': []
         }
+        doc.update(image_variant_fields(doc['imageUrl']))
         if not doc['name']:
             return jsonify({'error': 'Name is required'}), 400
         
         result = categories_collection.insert_one(doc)
+        track_upload_refs('categories', after=doc)
         return jsonify({'id': str(result.inserted_id)}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/categories/<category_id>', methods=['PUT'])
 @admin_required
+@invalidates('categories')
 def update_category(category_id):
     try:
         data = request.get_json()
@@ -1163,16 +1645,21 @@ def update_category(category_id):
             'description': data.get('description', ''),
             'imageUrl': data.get('imageUrl', '')  # Add imageUrl field
         }
+        update.update(image_variant_fields(update['imageUrl'], replace=True))
         if not update['name']:
             return jsonify({'error': 'Name is required'}), 400
         
-        categories_collection.update_one({'_id': ObjectId(category_id)}, {'$set': update})
+        previous = categories_collection.find_one_and_update(
+            {'_id': ObjectId(category_id)}, {'$set': update}, projection=reference_projection('categories')
+        )
+        track_upload_refs('categories', before=previous, after=update if previous else None)
         return '', 204
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/categories/<category_id>', methods=['DELETE'])
 @admin_required
+@invalidates('categories')
 def delete_category(category_id):
     try:
         # Check if any remedies use this category
@@ -1180,7 +1667,8 @@ def delete_category(category_id):
         if remedies_using_category:
             return jsonify({'error': 'Cannot delete category that is being used by remedies'}), 400
         
-        categories_collection.delete_one({'_id': ObjectId(category_id)})
+        removed = categories_collection.find_one_and_delete({'_id': ObjectId(category_id)}, projection=reference_projection('categories'))
+        track_upload_refs('categories', before=removed)
         return '', 204
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -1188,6 +1676,7 @@ def delete_category(category_id):
 # Subcategories Management
 @app.route('/api/subcategories', methods=['POST'])
 @admin_required
+@invalidates('categories')
 def create_subcategory():
     try:
         data = request.get_json()
@@ -1216,6 +1705,7 @@ def create_subcategory():
 
 @app.route('/api/subcategories/<subcategory_id>', methods=['PUT'])
 @admin_required
+@invalidates('categories')
 def update_subcategory(subcategory_id):
     try:
         data = request.get_json()
@@ -1266,6 +1756,7 @@ def update_subcategory(subcategory_id):
 
 @app.route('/api/subcategories/<subcategory_id>', methods=['DELETE'])
 @admin_required
+@invalidates('categories')
 def delete_subcategory(subcategory_id):
     try:
         # Find the category containing this subcategory
@@ -1287,6 +1778,170 @@ def delete_subcategory(subcategory_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+# Responsive image variants
+# Local uploads are resized in the background; once ready the variants are
+# copied onto every product, category and blog post using the image.
+def record_image_variants(url, variants):
+    fields = variant_fields(variants)
+    if products_collection.update_many({'image': url}, {'$set': fields}).modified_count:
+        bump_catalog_version()
+    if categories_collection.update_many({'imageUrl': url}, {'$set': fields}).modified_count:
+        cache.bump('categories')
+    if db.blog_posts.update_many({'image_url': url}, {'$set': fields}).modified_count:
+        cache.bump('blog_posts')
+
+image_variant_worker = ImageVariantWorker(UPLOAD_DIR, db.image_variants, on_ready=record_image_variants)
+
+def image_variant_fields(url, replace=False):
+    """Variant fields to store with a document using url; replace clears stale ones"""
+    try:
+        fields = image_variant_worker.lookup(url)
+    except Exception as e:
+        print(f"Image variant lookup failed for {url}: {e}")
+        fields = {}
+    if not fields and replace:
+        return variant_fields([])
+    return fields
+
+# Upload references
+# Reference counts let gc_uploads.py delete files nothing uses any more.
+upload_blobs = UploadBlobIndex(db.upload_blobs)
+
+def track_upload_refs(collection_name, before=None, after=None):
+    """Adjust upload reference counts for a document write"""
+    try:
+        upload_blobs.adjust(referenced_urls(before, collection_name), referenced_urls(after, collection_name))
+    except Exception as e:
+        # Counts are rebuilt by gc_uploads.py before anything is deleted
+        print(f"Upload reference tracking failed for {collection_name}: {e}")
+
+# Background upload jobs
+# Uploads are staged locally and acknowledged at once with a job ID and a
+# provisional /uploads/ URL; the pool pushes them to Cloudinary with retries.
+# Documents saved with the provisional URL are rewritten once the final one
+# is known. Without Cloudinary the staged copy itself is the final URL.
+def record_uploaded_url(job, result):
+    url = result['url']
+    if job.get('sha256') and url != job.get('provisional_url'):
+        upload_blobs.record_remote(job['sha256'], url, result.get('public_id'), job['options'].get('resource_type', 'image'))
+    local_url = job.get('provisional_url')
+    if not local_url or local_url == url:
+        return
+    image_fields = {'image': url, **image_variant_fields(url, replace=True)}
+    changed = products_collection.update_many({'image': local_url}, {'$set': image_fields}).modified_count
+    changed += products_collection.update_many({'gallery': local_url}, {'$set': {'gallery.$': url}}).modified_count
+    changed += products_collection.update_many({'arModelUrl': local_url}, {'$set': {'arModelUrl': url}}).modified_count
+    if changed:
+        bump_catalog_version()
+    category_fields = {'imageUrl': url, **image_variant_fields(url, replace=True)}
+    if categories_collection.update_many({'imageUrl': local_url}, {'$set': category_fields}).modified_count:
+        cache.bump('categories')
+    post_fields = {'image_url': url, **image_variant_fields(url, replace=True)}
+    if db.blog_posts.update_many({'image_url': local_url}, {'$set': post_fields}).modified_count:
+        cache.bump('blog_posts')
+
+upload_jobs = UploadJobQueue(
+    db.upload_jobs,
+    CloudinaryUploader(cloudinary.uploader) if CLOUDINARY_AVAILABLE else LocalUploader(UPLOAD_DIR),
+    on_done=record_uploaded_url,
+    # Serverless requests have a short time limit, so retry less there
+    max_attempts=2 if os.getenv('VERCEL') else MAX_ATTEMPTS,
+    inline=bool(os.getenv('VERCEL')),
+)
+
+def resume_upload_jobs():
+    try:
+        resumed = upload_jobs.recover()
+        if resumed:
+            print(f"Resumed {resumed} unfinished upload job(s)")
+    except Exception as e:
+        print(f"Could not resume upload jobs: {e}")
+
+if not os.getenv('VERCEL'):
+    threading.Thread(target=resume_upload_jobs, name='upload-jobs-recover', daemon=True).start()
+
+def register_upload(sha256, url, size=None, ext=None):
+    try:
+        upload_blobs.register(sha256, url, size=size, ext=ext)
+    except Exception as e:
+        # The file is stored; it is only missing from the dedup index
+        print(f"Could not index upload {sha256}: {e}")
+
+def store_upload(stream, ext):
+    """Hash and store an upload under /uploads/; returns (url, sha256)"""
+    saved_name, sha256, size = save_stream(stream, UPLOAD_DIR, ext)
+    url = f"/uploads/{saved_name}"
+    register_upload(sha256, url, size=size, ext=ext)
+    return url, sha256
+
+def stage_upload(stream, ext):
+    """Stage an upload for a job; returns (staged_path, provisional_url, sha256)"""
+    if os.getenv('VERCEL'):
+        # Only /tmp is writable, and nothing there is served
+        saved_name, sha256, size = save_stream(stream, tempfile.gettempdir(), ext)
+        register_upload(sha256, None, size=size, ext=ext)
+        return os.path.join(tempfile.gettempdir(), saved_name), None, sha256
+    url, sha256 = store_upload(stream, ext)
+    return os.path.join(UPLOAD_DIR, url[len('/uploads/'):]), url, sha256
+
+def start_upload_job(staged_path, provisional_url, sha256, resource_type='image', folder='greencart/uploads', discard_staged=False):
+    """
+    Push a staged upload to the remote store, unless identical bytes are
+    already there, in which case a finished job-shaped result is returned.
+    """
+    blob = upload_blobs.find(sha256)
+    if blob and blob.get('remote_url'):
+        if discard_staged and os.path.exists(staged_path):
+            os.remove(staged_path)
+        return {'_id': None, 'status': 'done', 'url': blob['remote_url'], 'deduplicated': True}
+    return upload_jobs.submit(
+        staged_path,
+        options={
+            # Named by content, so concurrent identical uploads share one resource
+            'folder': folder,
+            'public_id': hashed_name(sha256, ''),
+            'overwrite': False,
+            'resource_type': resource_type,
+        },
+        provisional_url=provisional_url,
+        discard_staged=discard_staged,
+        sha256=sha256,
+    )
+
+def existing_upload_url(sha256):
+    """Final URL of an already stored upload with this hash, if any"""
+    blob = upload_blobs.find(sha256)
+    if not blob:
+        return None
+    if blob.get('remote_url'):
+        return blob['remote_url']
+    local_url = blob.get('local_url')
+    if local_url and os.path.exists(os.path.join(UPLOAD_DIR, local_url[len('/uploads/'):])):
+        return local_url
+    return None
+
+def upload_job_response(job, **extra):
+    """202 with the job while it runs, 200 once the final URL is known"""
+    body = public_job(job)
+    body.update(success=True, **extra)
+    if job['_id']:
+        body['statusUrl'] = f"/api/uploads/jobs/{job['_id']}"
+    if job.get('deduplicated'):
+        body['deduplicated'] = True
+    return jsonify(body), 200 if body['final'] else 202
+
+@app.route('/api/uploads/jobs/<job_id>', methods=['GET'])
+@admin_required
+def get_upload_job(job_id):
+    try:
+        # ?wait=N long-polls up to N seconds (at most MAX_WAIT) for the job to finish
+        job = upload_jobs.wait(job_id, request.args.get('wait', 0, type=float))
+        if not job:
+            return jsonify({'success': False, 'error': 'Upload job not found'}), 404
+        return jsonify({'success': True, **public_job(job)})
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 # Image upload (admin)
 @app.route('/api/admin/upload', methods=['POST'])
 @admin_required
@@ -1332,10 +1987,10 @@ def upload_image():
             }
             ext = mime_to_ext.get(mime, ext if ext else '.jpg')
 
-        saved_name = f"{datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}{ext}"
-        path = os.path.join(UPLOAD_DIR, saved_name)
-        file.save(path)
-        return jsonify({'url': f"/uploads/{saved_name}"})
+        # Stored under its content hash: cached as immutable, and identical files are kept once
+        url, _ = store_upload(file.stream, ext)
+        image_variant_worker.enqueue(url)
+        return jsonify({'url': url})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -1384,66 +2039,158 @@ def upload_image_user(current_user=None):
             }
             ext = mime_to_ext.get(mime, ext if ext else '.jpg')
 
-        saved_name = f"{datetime.datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}{ext}"
-        path = os.path.join(UPLOAD_DIR, saved_name)
-        file.save(path)
-        return jsonify({'url': f"/uploads/{saved_name}"})
+        # Stored under its content hash: cached as immutable, and identical files are kept once
+        url, _ = store_upload(file.stream, ext)
+        image_variant_worker.enqueue(url)
+        return jsonify({'url': url})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 # Serve uploaded files
+# Content-hashed names never change content, so browsers may keep them for a
+# year without revalidating. Older names are revalidated by ETag/Last-Modified.
+# Range requests are honoured, so large AR models can resume.
+mimetypes.add_type('model/gltf-binary', '.glb')
+mimetypes.add_type('model/gltf+json', '.gltf')
+mimetypes.add_type('model/vnd.usdz+zip', '.usdz')
+
 @app.route('/uploads/<path:filename>')
-def serve_uploads(filename):
+def serve_upload(filename):
     # In serverless environments, we can't serve files from the local filesystem
     if os.getenv('VERCEL'):
         return jsonify({'error': 'File serving is not supported in serverless deployment'}), 400
-    return send_from_directory(UPLOAD_DIR, filename)
+    
+    # Temp files and in-progress chunked upload parts are never public
+    if any(segment.startswith('.') for segment in filename.split('/')):
+        return jsonify({'error': 'Not found'}), 404
+
+    immutable = is_content_hashed(filename)
+    response = send_from_directory(
+        UPLOAD_DIR, filename,
+        conditional=True,
+        max_age=IMMUTABLE_MAX_AGE if immutable else None,
+    )
+    # Advertise resumable downloads even on full responses
+    response.headers['Accept-Ranges'] = 'bytes'
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
 
 # Orders endpoints (basic list and status update)
+# Listings are keyset-paginated on (created_at, _id), so a deep page costs the
+# same as the first, and they project away what list views do not show.
+ORDER_PAGE_DEFAULT = 20
+ORDER_PAGE_MAX = 100
+ORDER_COUNT_TTL = 60
+ORDER_LIST_PROJECTION = {
+    'userName': 1, 'userEmail': 1, 'userId': 1, 'total': 1,
+    'paymentStatus': 1, 'deliveryStatus': 1, 'razorpay_payment_id': 1, 'created_at': 1,
+}
+# Order history previews a few items per order, so it keeps a slim copy of each
+USER_ORDER_LIST_PROJECTION = {
+    **ORDER_LIST_PROJECTION,
+    'items.id': 1, 'items.name': 1, 'items.image': 1, 'items.quantity': 1,
+}
+
+def format_order_summary(o):
+    """Shape an order document for order lists"""
+    summary = {
+        'id': str(o['_id']),
+        'customerName': o.get('userName'),
+        'customerEmail': o.get('userEmail'),
+        'userId': o.get('userId'),
+        'totalAmount': float(o.get('total', 0)),
+        'paymentStatus': o.get('paymentStatus', 'Pending'),
+        'deliveryStatus': o.get('deliveryStatus', 'Pending'),
+        'razorpayPaymentId': o.get('razorpay_payment_id'),
+        'createdAt': o.get('created_at'),
+    }
+    if 'items' in o:
+        summary['items'] = o['items']
+    return summary
+
+def encode_order_cursor(doc):
+    """Build an opaque keyset token from the last order on a page"""
+    created_at = doc.get('created_at')
+    token = {'id': str(doc['_id']), 't': created_at.isoformat() if created_at else None}
+    raw = json.dumps(token, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_order_cursor(cursor, direction):
+    """Turn a keyset token back into a Mongo range condition"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        token = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        last_id = ObjectId(token['id'])
+        last_created = datetime.datetime.fromisoformat(token['t']) if token.get('t') else None
+    except Exception:
+        raise ValueError('Invalid cursor')
+    op = '$gt' if direction == 1 else '$lt'
+    return {'$or': [
+        {'created_at': {op: last_created}},
+        {'created_at': last_created, '_id': {op: last_id}},
+    ]}
+
+def parse_order_page_args(args):
+    """Validate paging params into (limit, cursor, include_total); limit is None for a full list"""
+    limit = None
+    if args.get('limit') or args.get('cursor'):
+        try:
+            limit = int(args.get('limit', ORDER_PAGE_DEFAULT))
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        limit = max(1, min(limit, ORDER_PAGE_MAX))
+    include_total = args.get('includeTotal', '').lower() in ('1', 'true', 'yes')
+    return limit, args.get('cursor') or None, include_total
+
+def count_orders(query):
+    """Order count for a listing: collection metadata when unfiltered, else a short-lived cached count"""
+    if not query:
+        return orders_collection.estimated_document_count()
+    name = 'count:' + hashlib.sha1(json.dumps(query, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    def load():
+        body = str(orders_collection.count_documents(query)).encode('ascii')
+        return hashlib.sha1(body).hexdigest(), body
+    return int(cache.fetch('orders', name, load, ORDER_COUNT_TTL)[1])
+
+def order_page(query, projection, direction=-1):
+    """
+    List orders matching query, newest first unless direction is 1. Without
+    limit/cursor params the whole list is returned as before; with them, a
+    page {'items', 'next'} (plus 'total' when includeTotal is set).
+    """
+    limit, cursor, include_total = parse_order_page_args(request.args)
+    page_query = {'$and': [query, decode_order_cursor(cursor, direction)]} if cursor else query
+    found = orders_collection.find(page_query, projection).sort([('created_at', direction), ('_id', direction)])
+    if limit is None:
+        return [format_order_summary(o) for o in found]
+
+    docs = list(found.limit(limit + 1))
+    page = {
+        'items': [format_order_summary(o) for o in docs[:limit]],
+        'next': encode_order_cursor(docs[limit - 1]) if len(docs) > limit else None,
+    }
+    if include_total:
+        page['total'] = count_orders(query)
+    return page
+
 @app.route('/api/orders', methods=['GET'])
 @store_manager_required
 def list_orders():
     try:
         # Get query parameters for filtering
-        payment_status = request.args.get('paymentStatus')
-        delivery_status = request.args.get('deliveryStatus')
-        user_id = request.args.get('userId')
-        sort_order = request.args.get('sortOrder', 'desc')  # Default to descending (newest first)
-        
-        # Build query
         query = {}
-        if payment_status:
-            query['paymentStatus'] = payment_status
-        if delivery_status:
-            query['deliveryStatus'] = delivery_status
-        if user_id:
-            query['userId'] = user_id
-        
-        # Debug logging
-        print(f"DEBUG: Order query: {query}")
-        
-        items = []
-        order_count = orders_collection.count_documents(query)
-        print(f"DEBUG: Found {order_count} orders matching query")
-        
-        # Sort by creation date
-        sort_direction = -1 if sort_order == 'desc' else 1
-        
-        for o in orders_collection.find(query).sort('created_at', sort_direction):
-            items.append({
-                'id': str(o['_id']),
-                'customerName': o.get('userName'),
-                'customerEmail': o.get('userEmail'),
-                'userId': o.get('userId'),
-                'totalAmount': float(o.get('total', 0)),
-                'paymentStatus': o.get('paymentStatus', 'Pending'),
-                'deliveryStatus': o.get('deliveryStatus', 'Pending'),
-                'razorpayPaymentId': o.get('razorpay_payment_id'),
-                'createdAt': o.get('created_at'),
-            })
-            
-        print(f"DEBUG: Returning {len(items)} orders")
-        return jsonify(items)
+        for param, field in (('paymentStatus', 'paymentStatus'), ('deliveryStatus', 'deliveryStatus'), ('userId', 'userId')):
+            if request.args.get(param):
+                query[field] = request.args.get(param)
+        # Default to descending (newest first)
+        direction = 1 if request.args.get('sortOrder', 'desc') == 'asc' else -1
+        return jsonify(order_page(query, ORDER_LIST_PROJECTION, direction))
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
     except Exception as e:
         print(f"ERROR in list_orders: {e}")
         return jsonify({'error': str(e)}), 500
@@ -1455,43 +2202,127 @@ def get_user_orders():
         user = get_current_user()
         if not user:
             return jsonify({'error': 'User not found'}), 404
-        
-        # Get user's orders, sorted by creation date (newest first)
-        orders = list(orders_collection.find(
-            {'userId': str(user['_id'])}
-        ).sort('created_at', -1))
-        
-        # Format orders for frontend
-        formatted_orders = []
-        for o in orders:
-            formatted_orders.append({
-                'id': str(o['_id']),
-                'customerName': o.get('userName'),
-                'customerEmail': o.get('userEmail'),
-                'userId': o.get('userId'),
-                'totalAmount': float(o.get('total', 0)),
-                'paymentStatus': o.get('paymentStatus', 'Pending'),
-                'deliveryStatus': o.get('deliveryStatus', 'Pending'),
-                'razorpayPaymentId': o.get('razorpay_payment_id'),
-                'createdAt': o.get('created_at'),
-                'items': o.get('items', []),
-            })
-        
-        return jsonify(formatted_orders)
+        # The web profile pages ask for pages; older clients still get the full list
+        return jsonify(order_page({'userId': str(user['_id'])}, USER_ORDER_LIST_PROJECTION))
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
     except Exception as e:
         print(f"ERROR in get_user_orders: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/user/orders/summary', methods=['GET'])
+@login_required
+def get_user_order_summary():
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        totals = next(orders_collection.aggregate([
+            {'$match': {'userId': str(user['_id'])}},
+            {'$group': {'_id': None, 'orders': {'$sum': 1}, 'spent': {'$sum': {'$ifNull': ['$total', 0]}}}},
+        ]), {})
+        return jsonify({
+            'totalOrders': totals.get('orders', 0),
+            'totalSpent': round(float(totals.get('spent', 0)), 2),
+        })
+    except Exception as e:
+        print(f"ERROR in get_user_order_summary: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/user/orders/<order_id>', methods=['GET'])
+@login_required
+def get_user_order(order_id):
+    try:
+        user = get_current_user()
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        if not ObjectId.is_valid(order_id):
+            return jsonify({'error': 'Order not found'}), 404
+        order = orders_collection.find_one(
+            {'_id': ObjectId(order_id), 'userId': str(user['_id'])},
+            {**ORDER_LIST_PROJECTION, 'items': 1, 'address': 1, 'subtotal': 1, 'discount': 1, 'shipping': 1, 'tax': 1}
+        )
+        if not order:
+            return jsonify({'error': 'Order not found'}), 404
+        return jsonify({
+            **format_order_summary(order),
+            'items': order.get('items', []),
+            'address': order.get('address'),
+            **{field: order[field] for field in ('subtotal', 'discount', 'shipping', 'tax') if field in order},
+        })
+    except Exception as e:
+        print(f"ERROR in get_user_order: {e}")
+        return jsonify({'error': str(e)}), 500
+
 # Admin stats
 @app.route('/api/admin/stats', methods=['GET'])
 @admin_required
 def admin_stats():
     try:
+        # Collection metadata counts: O(1) instead of a scan per dashboard load
         return jsonify({
-            'users': users_collection.count_documents({}),
-            'products': products_collection.count_documents({}),
-            'orders': orders_collection.count_documents({}),
-            'remedies': remedies_collection.count_documents({}),
+            'users': users_collection.estimated_document_count(),
+            'products': products_collection.estimated_document_count(),
+            'orders': orders_collection.estimated_document_count(),
+            'remedies': remedies_collection.estimated_document_count(),
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+# Sales analytics, served from the sales_rollups collection (see sales_rollups)
+sales_rollups = SalesRollups(db.sales_rollups, orders_collection)
+ANALYTICS_DAYS_DEFAULT = 30
+ANALYTICS_DAYS_MAX = 366
+PAYMENT_STATUSES = ['Pending', 'Success', 'Failed', 'Cash on Delivery']
+DELIVERY_STATUSES = ['Pending', 'Confirmed', 'Shipped', 'Delivered']
+
+def record_sale(order_id):
+    """Add a placed or paid order to the sales rollups; never fails the request"""
+    try:
+        sales_rollups.record(ObjectId(order_id))
+    except Exception as e:
+        print(f"Error updating sales rollups for order {order_id}: {e}")
+
+def order_status_counts():
+    """Order counts per payment and delivery status, as index count scans cached briefly"""
+    def load():
+        counts = {
+            'payment': {status: orders_collection.count_documents({'paymentStatus': status}) for status in PAYMENT_STATUSES},
+            'delivery': {status: orders_collection.count_documents({'deliveryStatus': status}) for status in DELIVERY_STATUSES},
+        }
+        body = json.dumps(counts).encode('utf-8')
+        return hashlib.sha1(body).hexdigest(), body
+    return json.loads(cache.fetch('orders', 'status_counts', load, ORDER_COUNT_TTL)[1])
+
+@app.route('/api/admin/analytics', methods=['GET'])
+@admin_required
+def admin_analytics():
+    try:
+        try:
+            days = max(1, min(int(request.args.get('days', ANALYTICS_DAYS_DEFAULT)), ANALYTICS_DAYS_MAX))
+            limit = max(1, min(int(request.args.get('limit', 10)), 50))
+        except ValueError:
+            return jsonify({'error': 'days and limit must be integers'}), 400
+        by = request.args.get('by', 'revenue')
+        if by not in ('revenue', 'quantity'):
+            return jsonify({'error': 'by must be revenue or quantity'}), 400
+
+        end = datetime.datetime.utcnow()
+        start = end - datetime.timedelta(days=days - 1)
+        series = sales_rollups.revenue_series(start, end)
+        orders = sum(day['orders'] for day in series)
+        revenue = round(sum(day['revenue'] for day in series), 2)
+        return jsonify({
+            'from': series[0]['day'],
+            'to': series[-1]['day'],
+            'totals': {
+                'orders': orders,
+                'revenue': revenue,
+                'averageOrderValue': round(revenue / orders, 2) if orders else 0,
+            },
+            'revenue': series,
+            'topProducts': sales_rollups.top_products(start, end, limit=limit, by=by),
+            'ordersByStatus': order_status_counts(),
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -1544,13 +2375,12 @@ def update_order_status(order_id):
         if status not in valid_statuses:
             return jsonify({'error': 'Invalid status'}), 400
         
-        # Get the order to get user information
-        order = orders_collection.find_one({'_id': ObjectId(order_id)})
+        # Update the order status, releasing any driver's claim it no longer
+        # needs; the previous document has the user and zone
+        order = delivery_queue.set_status(ObjectId(order_id), status, str(get_current_user()['_id']))
         if not order:
             return jsonify({'error': 'Order not found'}), 404
-        
-        # Update the order status
-        orders_collection.update_one({'_id': ObjectId(order_id)}, {'$set': {'deliveryStatus': status}})
+        track_zone(order.get('zone'), order.get('deliveryStatus'), status)
         
         # Send notification to user
         user_id = order.get('userId')
@@ -1576,53 +2406,131 @@ def update_order_status(order_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
-# Delivery endpoints
+# Delivery endpoints. Drivers claim orders from a shared pool and only see
+# the ones they hold (see delivery_queue); admins see and deliver any order.
+# Orders are grouped into pincode zones with running counts (see delivery_zones).
+delivery_queue = DeliveryQueue(orders_collection, db.delivery_couriers)
+zone_summary = ZoneSummary(db.delivery_zones, orders_collection)
+ZONE_BATCHES_MAX = 20
+
+def track_zone(zone, old_status, new_status):
+    """Move an order between status counts in its zone summary; never fails the request"""
+    try:
+        zone_summary.move(zone, old_status, new_status)
+    except Exception as e:
+        print(f"Error updating delivery zone summary for zone {zone}: {e}")
+
+def format_delivery_order(o):
+    return {
+        'id': str(o['_id']),
+        'customerName': o.get('userName'),
+        'customerEmail': o.get('userEmail'),
+        'customerPhone': o.get('userPhone'),
+        'address': o.get('address', o.get('shippingAddress', {})),
+        'totalAmount': float(o.get('total', 0)),
+        'deliveryStatus': o.get('deliveryStatus', 'Pending'),
+        'createdAt': o.get('created_at'),
+        'deliveredAt': o.get('delivered_at'),
+        'leaseExpiresAt': o.get('leaseExpiresAt'),
+        'pincode': o.get('pincode'),
+        'zone': o.get('zone'),
+    }
+
 @app.route('/api/delivery/orders', methods=['GET'])
 @delivery_boy_required
 def list_delivery_orders():
     try:
-        # Get list type: 'active' (default) or 'history'
+        user = get_current_user()
+        courier_id = str(user['_id'])
+        # Get list type: 'active' (default), 'history' or, for admins, 'all'
         list_type = request.args.get('type', 'active')
-        
+
         if list_type == 'history':
-            query = {'deliveryStatus': 'Delivered'}
+            orders = delivery_queue.history(courier_id)
+        elif list_type == 'all' and user.get('role') == 'admin':
+            orders = orders_collection.find(
+                {'deliveryStatus': {'$in': DELIVERABLE_STATUSES}}, DELIVERY_PROJECTION
+            ).sort('created_at', -1).limit(50)
         else:
-            # Active orders are those confirmed or shipped/out for delivery
-            query = {'deliveryStatus': {'$in': ['Confirmed', 'Shipped']}}
-            
-        items = []
-        # Sort history by delivery time if available, otherwise creation time
-        sort_field = 'delivered_at' if list_type == 'history' else 'created_at'
-        
-        for o in orders_collection.find(query).sort(sort_field, -1).limit(50):
-            items.append({
-                'id': str(o['_id']),
-                'customerName': o.get('userName'),
-                'customerEmail': o.get('userEmail'),
-                'customerPhone': o.get('userPhone'),
-                'address': o.get('address', o.get('shippingAddress', {})),
-                'totalAmount': float(o.get('total', 0)),
-                'deliveryStatus': o.get('deliveryStatus', 'Pending'),
-                'createdAt': o.get('created_at'),
-                'deliveredAt': o.get('delivered_at'),
-            })
-        return jsonify(items)
+            orders = delivery_queue.mine(courier_id)
+        return jsonify([format_delivery_order(o) for o in orders])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/delivery/orders/claim', methods=['POST'])
+@delivery_boy_required
+def claim_delivery_orders():
+    try:
+        data = request.get_json(silent=True) or {}
+        count = min(max(int(data.get('count', CLAIM_BATCH)), 1), MAX_ACTIVE_CLAIMS)
+        zone = data.get('zone') or None
+        claimed = delivery_queue.claim(str(get_current_user()['_id']), count, zone=zone)
+        return jsonify({
+            'success': True,
+            'claimed': [format_delivery_order(o) for o in claimed],
+        })
+    except (TypeError, ValueError):
+        return jsonify({'error': 'count must be a number'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/delivery/zones', methods=['GET'])
+@delivery_boy_required
+def list_delivery_zones():
+    try:
+        return jsonify(zone_summary.summary())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/delivery/batches', methods=['GET'])
+@delivery_boy_required
+def list_delivery_batches():
+    """Unclaimed orders grouped by zone, busiest zones first, each in route order"""
+    try:
+        size = min(max(int(request.args.get('size', CLAIM_BATCH)), 1), MAX_ACTIVE_CLAIMS)
+        limit = min(max(int(request.args.get('zones', 5)), 1), ZONE_BATCHES_MAX)
+        batches = []
+        for zone in zone_summary.summary():
+            if len(batches) >= limit or not zone['open']:
+                break
+            if zone['zone'] == UNZONED:
+                continue
+            orders = delivery_queue.available(zone['zone'], size)
+            if orders:
+                batches.append({
+                    'zone': zone['zone'],
+                    'open': zone['open'],
+                    'orders': [format_delivery_order(o) for o in orders],
+                })
+        return jsonify(batches)
+    except ValueError:
+        return jsonify({'error': 'size and zones must be numbers'}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/delivery/orders/<order_id>/release', methods=['POST'])
+@delivery_boy_required
+def release_delivery_order(order_id):
+    try:
+        if not delivery_queue.release(ObjectId(order_id), str(get_current_user()['_id'])):
+            return jsonify({'error': 'Order is not assigned to you'}), 409
+        return jsonify({'success': True})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
 @app.route('/api/delivery/orders/<order_id>/deliver', methods=['POST'])
 @delivery_boy_required
 def mark_order_delivered(order_id):
     try:
-        result = orders_collection.update_one(
-            {'_id': ObjectId(order_id)},
-            {'$set': {'deliveryStatus': 'Delivered', 'delivered_at': datetime.datetime.utcnow()}}
+        user = get_current_user()
+        order = delivery_queue.deliver(
+            ObjectId(order_id), str(user['_id']), any_courier=user.get('role') == 'admin'
         )
-        if result.matched_count == 0:
-            return jsonify({'error': 'Order not found'}), 404
-            
+        if not order:
+            return jsonify({'error': 'Order not found or not assigned to you'}), 404
+        track_zone(order.get('zone'), order.get('deliveryStatus'), 'Delivered')
+
         # Send notification
-        order = orders_collection.find_one({'_id': ObjectId(order_id)})
         user_id = order.get('userId')
         if user_id:
             notification = {
@@ -1644,6 +2552,7 @@ def mark_order_delivered(order_id):
 @app.route('/api/remedies', methods=['GET'])
 # Remedies CRUD
 @app.route('/api/remedies', methods=['GET'])
+@cached_view('remedies')
 def list_remedies():
     try:
         items = []
@@ -1699,6 +2608,7 @@ def get_remedy(remedy_id):
 
 @app.route('/api/remedies', methods=['POST'])
 @admin_required
+@invalidates('remedies')
 def create_remedy():
     try:
         data = request.get_json()
@@ -1722,12 +2632,14 @@ def create_remedy():
             return jsonify({'error': 'Name and illness are required'}), 400
         
         res = remedies_collection.insert_one(doc)
+        track_upload_refs('remedies', after=doc)
         return jsonify({'id': str(res.inserted_id)}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/remedies/<remedy_id>', methods=['PUT'])
 @admin_required
+@invalidates('remedies')
 def update_remedy(remedy_id):
     try:
         data = request.get_json()
@@ -1749,16 +2661,21 @@ def update_remedy(remedy_id):
         if not update['name'] or not update['illness']:
             return jsonify({'error': 'Name and illness are required'}), 400
         
-        remedies_collection.update_one({'_id': ObjectId(remedy_id)}, {'$set': update})
+        previous = remedies_collection.find_one_and_update(
+            {'_id': ObjectId(remedy_id)}, {'$set': update}, projection=reference_projection('remedies')
+        )
+        track_upload_refs('remedies', before=previous, after=update if previous else None)
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/remedies/<remedy_id>', methods=['DELETE'])
 @admin_required
+@invalidates('remedies')
 def delete_remedy(remedy_id):
     try:
-        remedies_collection.delete_one({'_id': ObjectId(remedy_id)})
+        removed = remedies_collection.find_one_and_delete({'_id': ObjectId(remedy_id)}, projection=reference_projection('remedies'))
+        track_upload_refs('remedies', before=removed)
         return '', 204
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -1788,83 +2705,175 @@ def upload_file():
             if not (is_image or is_model):
                 return jsonify({'success': False, 'error': 'File type not allowed. Allowed types: Images and 3D Models (.glb, .gltf, .usdz)'}), 400
             
-            # Generate unique filename
-            unique_filename = f"{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}_{filename}"
-            
             # check if we are on Vercel
             is_vercel = os.getenv('VERCEL') == '1'
-            
-            if CLOUDINARY_AVAILABLE:
-                # Upload to Cloudinary
-                try:
-                    # Reset pointer to start of file
-                    file.stream.seek(0)
-                    
-                    # For models, use 'raw' resource type to preserve file format
-                    resource_type = 'raw' if is_model else 'image'
-                    
-                    result = cloudinary.uploader.upload(
-                        file,
-                        folder="greencart/uploads",
-                        public_id=os.path.splitext(unique_filename)[0],
-                        resource_type=resource_type
-                    )
-                    return jsonify({
-                        'success': True,
-                        'url': result.get('secure_url'),
-                        'public_id': result.get('public_id')
-                    })
-                except Exception as e:
-                    print(f"Cloudinary upload failed: {e}")
-                    if is_vercel:
-                        return jsonify({
-                            'success': False, 
-                            'error': f'Cloudinary upload failed: {str(e)}. Please check your Cloudinary environment variables (CLOUD_NAME, CLOUD_API_KEY, CLOUD_API_SECRET).'
-                        }), 500
-                    # For local dev, we can still fall back
-                    print("Falling back to local storage for development.")
-            
-            # Local storage (only if not on Vercel)
-            if is_vercel:
-                error_msg = 'Cloudinary is not configured or failed. Persistent storage is required for uploads on Vercel.'
-                if not CLOUDINARY_AVAILABLE:
-                    error_msg = 'Cloudinary library is not available in the production environment. Please ensure it is in requirements.txt.'
-                
+
+            # Without Cloudinary, Vercel has no persistent storage to fall back to
+            if is_vercel and not CLOUDINARY_AVAILABLE:
                 return jsonify({
-                    'success': False, 
-                    'error': error_msg
+                    'success': False,
+                    'error': 'Cloudinary library is not available in the production environment. Please ensure it is in requirements.txt.'
                 }), 500
 
-            file_path = os.path.join(UPLOAD_DIR, unique_filename)
-            
             # Ensure upload directory exists
-            try:
-                os.makedirs(UPLOAD_DIR, exist_ok=True)
-            except Exception as e:
-                return jsonify({'success': False, 'error': f'Failed to create upload directory: {str(e)}'}), 500
-            
-            # Reset pointer to start of file before saving
+            if not is_vercel:
+                try:
+                    os.makedirs(UPLOAD_DIR, exist_ok=True)
+                except Exception as e:
+                    return jsonify({'success': False, 'error': f'Failed to create upload directory: {str(e)}'}), 500
+
+            # Reset pointer to start of file before staging
             file.stream.seek(0)
-            file.save(file_path)
-            
-            # Return relative URL
-            local_url = f"/uploads/{unique_filename}"
-            return jsonify({
-                'success': True,
-                'url': local_url
-            })
-            
+            staged_path, provisional_url, sha256 = stage_upload(file.stream, ext)
+            if provisional_url and is_image:
+                image_variant_worker.enqueue(provisional_url)
+
+            # For models, use 'raw' resource type to preserve file format
+            job = start_upload_job(
+                staged_path, provisional_url, sha256,
+                resource_type='raw' if is_model else 'image',
+                discard_staged=is_vercel,
+            )
+            if job['status'] == 'failed':
+                return jsonify({
+                    'success': False,
+                    'error': f"Cloudinary upload failed: {job.get('error')}. Please check your Cloudinary environment variables (CLOUD_NAME, CLOUD_API_KEY, CLOUD_API_SECRET)."
+                }), 500
+            return upload_job_response(job)
+
     except Exception as e:
         print(f"Upload error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+# Resumable chunked uploads (admin)
+# Large AR models and images are sent as numbered parts that are streamed to
+# disk, so a dropped connection only costs the part in flight and memory use
+# does not grow with the file size.
+chunked_uploads = ChunkedUploadStore(db.upload_sessions, UPLOAD_DIR)
 
-@app.route('/uploads/<path:filename>')
-def serve_upload(filename):
-    return send_from_directory(UPLOAD_DIR, filename)
+def chunked_upload_unavailable():
+    # Parts must land on the same disk across requests
+    if os.getenv('VERCEL'):
+        return jsonify({'success': False, 'error': 'Chunked uploads are not supported in serverless deployment'}), 400
+    return None
+
+@app.route('/api/admin/uploads', methods=['POST'])
+@admin_required
+def initiate_chunked_upload():
+    try:
+        unavailable = chunked_upload_unavailable()
+        if unavailable:
+            return unavailable
+
+        data = request.get_json() or {}
+        filename = secure_filename(data.get('filename') or '')
+        ext = os.path.splitext(filename)[1].lower()
+        if not filename:
+            return jsonify({'success': False, 'error': 'filename is required'}), 400
+        if ext not in ALLOWED_IMAGE_EXTENSIONS and ext not in ALLOWED_MODEL_EXTENSIONS:
+            return jsonify({'success': False, 'error': 'File type not allowed. Allowed types: Images and 3D Models (.glb, .gltf, .usdz)'}), 400
+
+        # Identical bytes are already stored: skip the transfer entirely
+        existing = existing_upload_url(str(data.get('sha256') or '').lower())
+        if existing:
+            return jsonify({'success': True, 'deduplicated': True, 'final': True, 'url': existing})
+
+        chunked_uploads.sweep_expired_parts()
+        session = chunked_uploads.initiate(
+            filename, ext, data.get('size'),
+            sha256=data.get('sha256'),
+            part_size=data.get('partSize'),
+            user_id=str(get_current_user()['_id']),
+            content_type=data.get('contentType'),
+        )
+        return jsonify({
+            'success': True,
+            'uploadId': session['_id'],
+            'partSize': session['part_size'],
+            'totalParts': session['total_parts'],
+            'expiresAt': session['expires_at'],
+        }), 201
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Chunked upload error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/uploads/<upload_id>/parts/<int:part_number>', methods=['PUT'])
+@admin_required
+def upload_chunk(upload_id, part_number):
+    try:
+        unavailable = chunked_upload_unavailable()
+        if unavailable:
+            return unavailable
+
+        part = chunked_uploads.write_part(
+            upload_id, part_number, request.stream,
+            sha256=request.headers.get('X-Part-SHA256'),
+        )
+        return jsonify({'success': True, 'part': part_number, **part})
+    except UploadNotFound as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Chunked upload error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/uploads/<upload_id>', methods=['GET'])
+@admin_required
+def chunked_upload_status(upload_id):
+    try:
+        return jsonify({'success': True, **chunked_uploads.status(upload_id)})
+    except UploadNotFound as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/uploads/<upload_id>/complete', methods=['POST'])
+@admin_required
+def complete_chunked_upload(upload_id):
+    try:
+        unavailable = chunked_upload_unavailable()
+        if unavailable:
+            return unavailable
+
+        saved_name, sha256, size = chunked_uploads.complete(upload_id)
+        ext = os.path.splitext(saved_name)[1].lower()
+        is_model = ext in ALLOWED_MODEL_EXTENSIONS
+        url = f"/uploads/{saved_name}"
+        register_upload(sha256, url, size=size, ext=ext)
+        if not is_model:
+            image_variant_worker.enqueue(url)
+        chunked_uploads.record_url(upload_id, url)
+
+        job = start_upload_job(
+            os.path.join(UPLOAD_DIR, saved_name), url, sha256,
+            resource_type='raw' if is_model else 'image',
+        )
+        return upload_job_response(job, sha256=sha256, size=size)
+    except UploadNotFound as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Chunked upload error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/admin/uploads/<upload_id>', methods=['DELETE'])
+@admin_required
+def abort_chunked_upload(upload_id):
+    try:
+        chunked_uploads.abort(upload_id)
+        return '', 204
+    except UploadNotFound as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/remedies/bulk-upload', methods=['POST'])
 @admin_required
+@invalidates('remedies')
 def bulk_upload_remedies():
     try:
         if 'file' not in request.files:
@@ -1942,6 +2951,7 @@ def bulk_upload_remedies():
 
 # Categories Management
 @app.route('/api/product-categories', methods=['GET'])
+@cached_view('categories')
 def list_product_categories():
     try:
         items = []
@@ -1965,6 +2975,7 @@ def list_product_categories():
                 'name': cat.get('name'),
                 'description': cat.get('description', ''),
                 'imageUrl': full_image_url,  # Use the properly formatted image URL
+                'srcset': cat.get('imageSrcset', {}),
                 'subcategories': subcategories
             })
         return jsonify(items)
@@ -1972,6 +2983,7 @@ def list_product_categories():
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/remedy-categories', methods=['GET'])
+@cached_view('remedy_categories')
 def list_remedy_categories():
     try:
         items = []
@@ -1990,6 +3002,7 @@ def list_remedy_categories():
 
 @app.route('/api/remedy-categories', methods=['POST'])
 @admin_required
+@invalidates('remedy_categories')
 def create_remedy_category():
     try:
         data = request.get_json()
@@ -2010,6 +3023,7 @@ def create_remedy_category():
 
 @app.route('/api/remedy-categories/<category_id>', methods=['PUT'])
 @admin_required
+@invalidates('remedy_categories')
 def update_remedy_category(category_id):
     try:
         data = request.get_json()
@@ -2029,6 +3043,7 @@ def update_remedy_category(category_id):
 
 @app.route('/api/remedy-categories/<category_id>', methods=['DELETE'])
 @admin_required
+@invalidates('remedy_categories')
 def delete_remedy_category(category_id):
     try:
         # Check if any remedies use this category
@@ -2106,6 +3121,7 @@ def get_reviews():
 
 @app.route('/api/reviews', methods=['POST'])
 @login_required
+@invalidates('reviews')
 def create_review():
     try:
         user = get_current_user()
@@ -2149,8 +3165,55 @@ def create_review():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Idempotent checkout: retries carrying the same Idempotency-Key replay the
+# first successful response instead of placing or verifying the order again
+idempotency = IdempotencyLedger(redis_client, db.idempotency_keys)
+
+def idempotent(scope, key_from=None):
+    """
+    Replay the stored response for a repeated Idempotency-Key.
+    key_from derives a key from the JSON body when the header is missing.
+    Only successful responses are stored; errors free the key for a retry.
+    """
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            client_key = request.headers.get('Idempotency-Key', '').strip()
+            if not client_key and key_from:
+                client_key = str(key_from(request.get_json(silent=True) or {}) or '')
+            if not client_key:
+                return f(*args, **kwargs)
+            if len(client_key) > MAX_KEY_LENGTH:
+                return jsonify({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}), 400
+
+            user = get_current_user()
+            key = f"{scope}:{user['_id'] if user else 'anonymous'}:{client_key}"
+            fingerprint = request_fingerprint(request.method, request.path, request.get_data())
+            try:
+                stored = idempotency.begin(key, fingerprint)
+            except IdempotencyConflict as e:
+                return jsonify({'error': str(e)}), e.status
+            if stored:
+                response = app.response_class(stored['body'], status=stored['status'], mimetype=stored['mimetype'])
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+
+            try:
+                response = app.make_response(f(*args, **kwargs))
+            except Exception:
+                idempotency.abandon(key)
+                raise
+            if 200 <= response.status_code < 300:
+                idempotency.finish(key, fingerprint, response.status_code, response.get_data(as_text=True), response.mimetype)
+            else:
+                idempotency.abandon(key)
+            return response
+        return wrapper
+    return decorator
+
 @app.route('/api/orders/create', methods=['POST'])
 @login_required
+@idempotent('orders.create')
 def create_order():
     try:
         user = get_current_user()
@@ -2159,104 +3222,111 @@ def create_order():
             
         data = request.get_json()
         
-        print(f"DEBUG: Received order data: {data}")  # Debug log
-        
         # Handle different payload formats from frontend
         products = data.get('products', data.get('items', []))
-        total_amount = data.get('totalAmount', data.get('total', 0))
         address = data.get('address', 'Not provided')
         
-        print(f"DEBUG: Parsed - products: {products}, total: {total_amount}, address: {address}")  # Debug log
-        
         if not products:
             return jsonify({'error': 'Products/items are required'}), 400
-        
-        if not total_amount or total_amount <= 0:
-            return jsonify({'error': 'Valid total amount is required'}), 400
-        
-        # Check stock availability and update stock for each item
-        for item in products:
-            product_id = item.get('id') or item.get('_id')
-            quantity = item.get('quantity', 1)
-            
-            if not check_stock_and_notify(product_id, quantity):
-                product = products_collection.find_one({'_id': ObjectId(product_id)})
-                product_name = product.get('name', 'Unknown') if product else 'Unknown'
-                return jsonify({
-                    'error': f'Insufficient stock for {product_name}. Please update your cart.'
-                }), 400
-        
+
+        # Price and check the cart from one snapshot of its products; the
+        # client's prices and total are never trusted
+        try:
+            lines = merge_lines(products)
+            snapshot = {
+                str(p['_id']): p
+                for p in products_collection.find({'_id': {'$in': [ObjectId(pid) for pid in lines]}}, ORDER_PRODUCT_PROJECTION)
+            }
+            items = order_items(lines, snapshot)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        totals = order_totals(items)
+        total_amount = totals['total']
+
+        payment_method = data.get('paymentMethod', 'razorpay')
+        if payment_method != 'cod' and not razorpay_client:
+            return jsonify({'error': 'Razorpay is not configured on server'}), 500
+
+        # Take the stock now, atomically for the whole cart. Online payments
+        # hold it until verify_payment commits it or the hold expires.
+        order_id = ObjectId()
+        try:
+            reserved_until = stock_reservations.reserve(str(order_id), lines, hold=payment_method != 'cod')
+        except InsufficientStock as e:
+            return jsonify({'error': str(e)}), 400
+
         # Create order document
         order_doc = {
+            '_id': order_id,
             'userId': str(user['_id']),
             'userName': user.get('name', 'Unknown'),
             'userEmail': user.get('email', ''),
-            'items': products,
-            'total': total_amount,
+            'items': items,
+            **totals,
             'address': address,
+            **zone_fields(address),
             'status': 'pending',
             'paymentStatus': 'Pending',
             'deliveryStatus': 'Pending',
             'created_at': datetime.datetime.utcnow(),
             'updated_at': datetime.datetime.utcnow()
         }
-        
-        print(f"DEBUG: Creating order with document: {order_doc}")
+        if payment_method == 'cod':
+            order_doc.update({
+                'status': 'confirmed',
+                'paymentStatus': 'Cash on Delivery',
+                'paymentMethod': 'cod',
+                'stockReservation': 'committed',
+            })
+        else:
+            order_doc.update({'stockReservation': 'held', 'reservedUntil': reserved_until})
         
         # Insert order
-        result = orders_collection.insert_one(order_doc)
+        try:
+            result = orders_collection.insert_one(order_doc)
+        except Exception:
+            # COD stock is already committed, so release() alone would keep it
+            stock_reservations.cancel(str(order_id))
+            raise
         
-        # Debug logging
-        print(f"DEBUG: Order created with ID: {result.inserted_id}")
-        
-        payment_method = data.get('paymentMethod', 'razorpay')
+        track_zone(order_doc['zone'], None, order_doc['deliveryStatus'])
         
         if payment_method == 'cod':
-            # Update order for COD
-            orders_collection.update_one(
-                {'_id': result.inserted_id},
-                {'$set': {
-                    'status': 'confirmed',
-                    'paymentStatus': 'Cash on Delivery',
-                    'paymentMethod': 'cod'
-                }}
-            )
+            record_sale(result.inserted_id)
             return jsonify({
                 'orderId': str(result.inserted_id),
                 'status': 'success',
                 'paymentMethod': 'cod',
+                'total': total_amount,
                 'message': 'Order placed successfully (Cash on Delivery)'
             }), 201
 
         # Create Razorpay order
         rzp_order_id = None
-        amount_paise = int(total_amount * 100)
-        if razorpay_client:
-            try:
-                rzp_order_data = {
-                    'amount': amount_paise,  # in paise
-                    'currency': 'INR',
-                    'receipt': str(result.inserted_id),
-                    'payment_capture': 1,
-                }
-                order = getattr(razorpay_client, 'order', None)
-                if order and hasattr(order, 'create'):
-                    rzp_order = order.create(rzp_order_data)
-                    rzp_order_id = rzp_order.get('id')
-                else:
-                    return jsonify({'error': 'Razorpay order creation not available'}), 500
-            except Exception as e:
-                return jsonify({'error': f'Failed to create Razorpay order: {str(e)}'}), 500
-        else:
-            return jsonify({'error': 'Razorpay is not configured on server'}), 500
+        amount_paise = int(round(total_amount * 100))
+        try:
+            rzp_order_data = {
+                'amount': amount_paise,  # in paise
+                'currency': 'INR',
+                'receipt': str(result.inserted_id),
+                'payment_capture': 1,
+            }
+            order = getattr(razorpay_client, 'order', None)
+            if order and hasattr(order, 'create'):
+                rzp_order = order.create(rzp_order_data)
+                rzp_order_id = rzp_order.get('id')
+            else:
+                release_order_stock(result.inserted_id)
+                return jsonify({'error': 'Razorpay order creation not available'}), 500
+        except Exception as e:
+            release_order_stock(result.inserted_id)
+            return jsonify({'error': f'Failed to create Razorpay order: {str(e)}'}), 500
 
         # Save Razorpay order id
         orders_collection.update_one(
             {'_id': result.inserted_id},
             {'$set': {'razorpay_order_id': rzp_order_id}}
         )
-        
-        print(f"DEBUG: Razorpay order ID saved: {rzp_order_id}")
 
         return jsonify({
             'orderId': str(result.inserted_id),
@@ -2264,6 +3334,7 @@ def create_order():
             'razorpayOrderId': rzp_order_id,
             'amount': amount_paise,
             'currency': 'INR',
+            'total': total_amount,
             'status': 'success',
             'message': 'Order created successfully'
         }), 201
@@ -2274,6 +3345,8 @@ def create_order():
 
 @app.route('/api/orders/verify', methods=['POST'])
 @login_required
+# A Razorpay payment is verified once, so its ID doubles as the key
+@idempotent('orders.verify', key_from=lambda data: data.get('razorpay_payment_id'))
 def verify_payment():
     try:
         data = request.get_json()
@@ -2306,17 +3379,18 @@ def verify_payment():
         except Exception as e:
             return jsonify({'success': False, 'error': f'Signature verification failed: {str(e)}'}), 400
 
+        # The stock held at checkout becomes permanent
+        paid = {'paymentStatus': 'Success', 'deliveryStatus': 'Confirmed', 'razorpay_payment_id': razorpay_payment_id}
+        paid.update(commit_order_stock(order_id))
+
         # Mark order as paid
         print(f"DEBUG: Updating order {order_id} status to Success/Confirmed")
-        orders_collection.update_one(
-            {'_id': ObjectId(order_id)},
-            {'$set': {'paymentStatus': 'Success', 'deliveryStatus': 'Confirmed', 'razorpay_payment_id': razorpay_payment_id}}
+        before = orders_collection.find_one_and_update(
+            {'_id': ObjectId(order_id)}, {'$set': paid}, projection={'zone': 1, 'deliveryStatus': 1}
         )
-
-        # Reduce stock after payment is confirmed
-        order = orders_collection.find_one({'_id': ObjectId(order_id)})
-        if order and 'items' in order:
-            reduce_stock_after_order(order['items'])
+        if before:
+            track_zone(before.get('zone'), before.get('deliveryStatus'), paid['deliveryStatus'])
+        record_sale(order_id)
 
         return jsonify({'success': True, 'message': 'Payment verified successfully'})
 
@@ -2325,74 +3399,71 @@ def verify_payment():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # Stock Management Functions
-def check_stock_and_notify(product_id, quantity_ordered):
-    """Check stock levels without reducing them"""
+# Stock is taken atomically when an order is placed (see stock_reservations)
+# and admins get one coalesced alert per product and level (see stock_alerts)
+stock_alerts = StockAlerts(
+    notifications_collection,
+    # Serverless instances may not live to see a timer fire
+    flush_interval=0 if os.getenv('VERCEL') else FLUSH_INTERVAL
+)
+
+def on_stock_change(product_ids):
+    # Stock is part of the public listing
+    bump_catalog_version()
+    notify_stock_levels(product_ids)
+
+stock_reservations = StockReservations(products_collection, db.stock_reservations, on_change=on_stock_change)
+if not os.getenv('VERCEL'):
+    stock_reservations.start_sweeper()
+    stock_alerts.start_flusher()
+
+def notify_stock_levels(product_ids):
+    """Record the stock of products an order or release has changed for admin alerts"""
     try:
-        product = products_collection.find_one({'_id': ObjectId(product_id)})
-        if not product:
-            return False
-        
-        current_stock = product.get('stock', 0)
-        # Check if enough stock is available WITHOUT reducing it
-        available = current_stock >= quantity_ordered
-        
-        # Send notification if stock is low (but don't reduce stock yet)
-        if available and current_stock - quantity_ordered <= 0:
-            send_admin_notification(
-                'OUT_OF_STOCK',
-                f"Product '{product.get('name', 'Unknown')}' will be out of stock after this order!",
-                {'productId': product_id, 'productName': product.get('name')}
-            )
-        elif available and current_stock - quantity_ordered <= 5:  # Low stock threshold
-            send_admin_notification(
-                'LOW_STOCK',
-                f"Product '{product.get('name', 'Unknown')}' will have only {current_stock - quantity_ordered} items left after this order!",
-                {'productId': product_id, 'productName': product.get('name'), 'remainingStock': current_stock - quantity_ordered}
-            )
-        
-        return available
+        stock_alerts.observe(products_collection.find(
+            {'_id': {'$in': [ObjectId(pid) for pid in product_ids]}},
+            {'name': 1, 'stock': 1}
+        ))
     except Exception as e:
-        print(f"Error in stock check: {e}")
-        return False
+        print(f"Error recording stock levels: {e}")
 
-def reduce_stock_after_order(products):
-    """Reduce stock after order is confirmed"""
+def release_order_stock(order_id):
+    """Give back the stock held for an order whose payment cannot go ahead"""
+    if stock_reservations.release(str(order_id)):
+        orders_collection.update_one({'_id': ObjectId(order_id)}, {'$set': {'stockReservation': 'released'}})
+
+def commit_order_stock(order_id):
+    """Commit an order's held stock; returns order fields describing the outcome"""
+    order = orders_collection.find_one(
+        {'_id': ObjectId(order_id)}, {'items': 1, 'stockReservation': 1, 'paymentStatus': 1}
+    )
+    if not order:
+        return {}
+    # A replayed verification, possibly after the reservation record was
+    # purged: the stock was taken when the order was first paid
+    if order.get('stockReservation') in ('committed', 'conflict') or order.get('paymentStatus') == 'Success':
+        return {}
+    if stock_reservations.commit(str(order_id)):
+        return {'stockReservation': 'committed'}
+
+    # The hold expired before payment arrived (or the order predates
+    # reservations): take the stock again if it is still there
+    if order.get('stockReservation') not in (None, 'held', 'released') or not order.get('items'):
+        return {}
     try:
-        for item in products:
-            product_id = item.get('id') or item.get('_id')
-            quantity = item.get('quantity', 1)
-            
-            product = products_collection.find_one({'_id': ObjectId(product_id)})
-            if not product:
-                continue
-            
-            current_stock = product.get('stock', 0)
-            new_stock = current_stock - quantity
-            
-            # Update stock
-            products_collection.update_one(
-                {'_id': ObjectId(product_id)},
-                {'$set': {'stock': max(0, new_stock)}}
-            )
-            
-            # Send notification if stock is low or out
-            if new_stock <= 0:
-                send_admin_notification(
-                    'OUT_OF_STOCK',
-                    f"Product '{product.get('name', 'Unknown')}' is now out of stock!",
-                    {'productId': product_id, 'productName': product.get('name')}
-                )
-            elif new_stock <= 5:  # Low stock threshold
-                send_admin_notification(
-                    'LOW_STOCK',
-                    f"Product '{product.get('name', 'Unknown')}' has only {new_stock} items left in stock!",
-                    {'productId': product_id, 'productName': product.get('name'), 'remainingStock': new_stock}
-                )
-        
-        return True
-    except Exception as e:
-        print(f"Error reducing stock: {e}")
-        return False
+        lines = merge_lines(order['items'])
+        stock_reservations.reserve(str(order_id), lines, hold=False)
+        return {'stockReservation': 'committed'}
+    except DuplicateKeyError:
+        # A concurrent verification of the same order got there first
+        return {'stockReservation': 'committed'}
+    except (InsufficientStock, ValueError) as e:
+        send_admin_notification(
+            'STOCK_CONFLICT',
+            f"Order {order_id} was paid after its stock hold expired: {e}",
+            {'orderId': str(order_id)}
+        )
+        return {'stockReservation': 'conflict', 'stockIssue': str(e)}
 
 def send_admin_notification(notification_type, message, data=None):
     """Send notification to admin"""
@@ -2465,7 +3536,7 @@ def get_low_stock():
                 'name': product.get('name', 'Unknown'),
                 'stock': product.get('stock', 0),
                 'category': product.get('category', ''),
-                'imageUrl': product.get('imageUrl', product.get('image', ''))
+                'imageUrl': product.get('image', '')
             })
         
         return jsonify({
@@ -2483,14 +3554,6 @@ def get_admin_notifications():
     try:
         notifications = list(notifications_collection.find().sort('created_at', -1).limit(50))
         
-        for notification in notifications:
-            notification['_id'] = str(notification['_id'])
-            created_at = notification.get('created_at')
-            if created_at and hasattr(created_at, 'isoformat'):
-                notification['created_at'] = created_at.isoformat()
-            else:
-                notification['created_at'] = None
-        
         return jsonify({
             'success': True,
             'notifications': notifications
@@ -2574,12 +3637,8 @@ def mark_user_notification_read(notification_id):
 @admin_required
 def clear_product_cache():
     try:
-        if redis_client:
-            cache_key = "products_list"
-            redis_client.delete(cache_key)
-            return jsonify({'success': True, 'message': 'Product cache cleared'})
-        else:
-            return jsonify({'success': False, 'message': 'Redis not configured'}), 500
+        bump_catalog_version()
+        return jsonify({'success': True, 'message': 'Product cache cleared'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -2604,26 +3663,22 @@ def upload_to_cloudinary():
         if not isinstance(image_data, str) or not image_data.startswith('data:image'):
             return jsonify({'error': 'Invalid image format. Expected base64 string.'}), 400
         
-        # Upload image to Cloudinary
-        upload_result = cloudinary.uploader.upload(
-            image_data,
-            folder="greencart_uploads",
-            use_filename=True,
-            unique_filename=False
+        # Stage the decoded image and hand the Cloudinary upload to a job
+        header, _, encoded = image_data.partition(',')
+        mime = header[len('data:'):].split(';')[0].lower()
+        ext = mimetypes.guess_extension(mime) or '.jpg'
+        if ext not in ALLOWED_IMAGE_EXTENSIONS:
+            return jsonify({'error': 'Invalid image format. Expected base64 string.'}), 400
+        staged_path, provisional_url, sha256 = stage_upload(io.BytesIO(base64.b64decode(encoded)), ext)
+
+        job = start_upload_job(
+            staged_path, provisional_url, sha256,
+            folder='greencart_uploads',
+            discard_staged=not provisional_url,
         )
-        
-        # Debug: Print the upload result
-        print(f"Cloudinary upload result: {upload_result}")
-        
-        # Check if secure_url is in the result
-        if 'secure_url' not in upload_result:
-            return jsonify({'error': f'Upload failed: secure_url not found in response. Full response: {upload_result}'}), 500
-        
-        # Return the secure URL of the uploaded image
-        return jsonify({
-            'success': True,
-            'url': upload_result['secure_url']
-        }), 200
+        if job['status'] == 'failed':
+            return jsonify({'error': f"Upload failed: {job.get('error')}"}), 500
+        return upload_job_response(job)
         
     except Exception as e:
         # Handle general errors
@@ -2956,12 +4011,6 @@ def get_feedback(current_user=None):
                            .skip(skip)
                            .limit(limit))
         
-        # Convert ObjectId to string for JSON serialization
-        for feedback in feedback_list:
-            feedback['_id'] = str(feedback['_id'])
-            if feedback.get('userId'):
-                feedback['userId'] = str(feedback['userId'])
-        
         return jsonify({
             'feedback': feedback_list,
             'total': total,
@@ -3060,21 +4109,15 @@ def get_blog_posts():
                 # If token is invalid, continue without user
                 pass
         
-        # Convert ObjectId to string for JSON serialization and add like status
+        # Like status for the whole page in one query
+        liked_ids = set()
+        if current_user and posts:
+            liked_ids = {like['post_id'] for like in db.blog_likes.find({
+                'post_id': {'$in': [str(post['_id']) for post in posts]},
+                'user_id': str(current_user['_id'])
+            }, {'post_id': 1})}
         for post in posts:
-            post['_id'] = str(post['_id'])
-            if post.get('author_id'):
-                post['author_id'] = str(post['author_id'])
-            
-            # Add like status if user is logged in
-            if current_user:
-                existing_like = db.blog_likes.find_one({
-                    'post_id': str(post['_id']),
-                    'user_id': str(current_user['_id'])
-                })
-                post['liked'] = existing_like is not None
-            else:
-                post['liked'] = False
+            post['liked'] = str(post['_id']) in liked_ids
         
         return jsonify({
             'posts': posts,
@@ -3089,6 +4132,7 @@ def get_blog_posts():
 
 @app.route('/api/blog/posts', methods=['POST'])
 @token_required
+@invalidates('blog_posts')
 def create_blog_post(current_user=None):
     try:
         print(f"DEBUG: create_blog_post called with current_user: {current_user}")
@@ -3116,11 +4160,13 @@ def create_blog_post(current_user=None):
             'likes': 0,
             'comments_count': 0
         }
+        post_doc.update(image_variant_fields(post_doc['image_url']))
         
         print(f"DEBUG: Creating post with document: {post_doc}")
         
         # Insert into database
         result = db.blog_posts.insert_one(post_doc)
+        track_upload_refs('blog_posts', after=post_doc)
         
         # Add the inserted ID to the response
         post_doc['_id'] = str(result.inserted_id)
@@ -3149,21 +4195,10 @@ def get_blog_post(post_id):
         if not post:
             return jsonify({'error': 'Post not found'}), 404
         
-        # Convert ObjectId to string for JSON serialization
-        post['_id'] = str(post['_id'])
-        if post.get('author_id'):
-            post['author_id'] = str(post['author_id'])
-        
         # Get comments for this post
         comments = list(db.blog_comments.find({'post_id': post_id})
                        .sort('created_at', 1))
         
-        # Convert ObjectId to string for JSON serialization
-        for comment in comments:
-            comment['_id'] = str(comment['_id'])
-            if comment.get('author_id'):
-                comment['author_id'] = str(comment['author_id'])
-        
         return jsonify({
             'post': post,
             'comments': comments
@@ -3174,6 +4209,7 @@ def get_blog_post(post_id):
 
 @app.route('/api/blog/posts/<post_id>', methods=['PUT'])
 @token_required
+@invalidates('blog_posts')
 def update_blog_post(post_id):
     try:
         # Get user from token
@@ -3213,9 +4249,12 @@ def update_blog_post(post_id):
             'image_url': data.get('image_url', post['image_url']),
             'updated_at': datetime.datetime.utcnow()
         }
+        if update_doc['image_url'] != post.get('image_url'):
+            update_doc.update(image_variant_fields(update_doc['image_url'], replace=True))
         
         # Update the post
         db.blog_posts.update_one({'_id': ObjectId(post_id)}, {'$set': update_doc})
+        track_upload_refs('blog_posts', before=post, after=update_doc)
         
         return jsonify({
             'success': True,
@@ -3228,6 +4267,7 @@ def update_blog_post(post_id):
 
 @app.route('/api/blog/posts/<post_id>', methods=['DELETE'])
 @token_required
+@invalidates('blog_posts')
 def delete_blog_post(post_id, current_user=None):
     try:
         if not current_user:
@@ -3243,6 +4283,7 @@ def delete_blog_post(post_id, current_user=None):
             
         # Delete the post
         db.blog_posts.delete_one({'_id': ObjectId(post_id)})
+        track_upload_refs('blog_posts', before=post)
         
         return jsonify({
             'success': True,
@@ -3254,6 +4295,7 @@ def delete_blog_post(post_id, current_user=None):
 
 @app.route('/api/blog/posts/<post_id>/comments', methods=['POST'])
 @token_required
+@invalidates('blog_posts')
 def add_blog_comment(post_id, current_user=None):
     try:
         if not current_user:
@@ -3316,6 +4358,7 @@ def add_blog_comment(post_id, current_user=None):
 
 @app.route('/api/blog/comments/<comment_id>', methods=['DELETE'])
 @token_required
+@invalidates('blog_posts')
 def delete_blog_comment(comment_id, current_user=None):
     try:
         if not current_user:
@@ -3349,6 +4392,7 @@ def delete_blog_comment(comment_id, current_user=None):
 
 @app.route('/api/blog/posts/<post_id>/like', methods=['POST'])
 @token_required
+@invalidates('blog_posts')
 def like_blog_post(post_id, current_user=None):
     try:
         if not current_user:
@@ -3384,12 +4428,20 @@ def like_blog_post(post_id, current_user=None):
                 'liked': False
             })
         else:
-            # Like the post
-            db.blog_likes.insert_one({
-                'post_id': post_id,
-                'user_id': str(current_user['_id']),
-                'created_at': datetime.datetime.utcnow()
-            })
+            # Like the post; the unique (post_id, user_id) index rejects a
+            # concurrent duplicate like so the counter is only bumped once
+            try:
+                db.blog_likes.insert_one({
+                    'post_id': post_id,
+                    'user_id': str(current_user['_id']),
+                    'created_at': datetime.datetime.utcnow()
+                })
+            except DuplicateKeyError:
+                return jsonify({
+                    'success': True,
+                    'message': 'Post liked',
+                    'liked': True
+                })
             
             # Increment likes count
             db.blog_posts.update_one(
@@ -3420,6 +4472,7 @@ def like_blog_post(post_id, current_user=None):
 
 @app.route('/api/blog/comments/<comment_id>', methods=['PUT'])
 @token_required
+@invalidates('blog_posts')
 def update_blog_comment(comment_id, current_user=None):
     try:
         if not current_user:
@@ -3524,6 +4577,7 @@ def admin_list_blog_posts():
 
 @app.route('/api/admin/blog/posts/<post_id>', methods=['DELETE'])
 @admin_required
+@invalidates('blog_posts')
 def admin_delete_blog_post(post_id):
     try:
         # Check if post exists
@@ -3533,6 +4587,7 @@ def admin_delete_blog_post(post_id):
             
         # Delete the post
         db.blog_posts.delete_one({'_id': ObjectId(post_id)})
+        track_upload_refs('blog_posts', before=post)
         
         # Delete all comments for this post
         db.blog_comments.delete_many({'post_id': post_id})
@@ -3550,6 +4605,7 @@ def admin_delete_blog_post(post_id):
 
 @app.route('/api/admin/blog/comments/<comment_id>', methods=['DELETE'])
 @admin_required
+@invalidates('blog_posts')
 def admin_delete_blog_comment(comment_id):
     try:
         # Check if comment exists
@@ -3702,15 +4758,24 @@ def get_events():
         ).sort('date', 1))
         print(f"Found {len(events)} upcoming events")
         
+        # Attendee totals for every listed event in one aggregation
+        totals = {}
+        if events:
+            totals = {row['_id']: row for row in db.event_registrations.aggregate([
+                {'$match': {'event_id': {'$in': [str(event['_id']) for event in events]}}},
+                {'$group': {
+                    '_id': '$event_id',
+                    'attendees': {'$sum': {'$ifNull': ['$quantity', 1]}},
+                    'count': {'$sum': 1},
+                }},
+            ])}
+        
         for event in events:
-            event['_id'] = str(event['_id'])
-            event_id = event['_id']
-            
             # Calculate total attendees and check if event is full
-            registrations = list(db.event_registrations.find({'event_id': event_id}))
-            total_attendees = sum(reg.get('quantity', 1) for reg in registrations)
+            event_totals = totals.get(str(event['_id']), {})
+            total_attendees = event_totals.get('attendees', 0)
             event['total_attendees'] = total_attendees
-            event['registration_count'] = len(registrations)
+            event['registration_count'] = event_totals.get('count', 0)
             
             # Check if event is full
             max_attendees = event.get('max_attendees', 0)
@@ -3720,10 +4785,6 @@ def get_events():
             else:
                 event['is_full'] = False
                 event['available_slots'] = None
-            
-            # Convert datetime to string for JSON serialization
-            if isinstance(event.get('date'), datetime.datetime):
-                event['date'] = event['date'].isoformat()
             print(f"Event: {event['title']} - {event['date']}")
         
         return jsonify(events)
@@ -3762,6 +4823,7 @@ def admin_get_events(current_user=None):
 
 @app.route('/api/admin/events', methods=['POST'])
 @admin_required
+@invalidates('events')
 def create_event(current_user=None):
     """Create a new event (admin only)"""
     try:
@@ -3813,6 +4875,7 @@ def create_event(current_user=None):
 
 @app.route('/api/admin/events/<event_id>', methods=['PUT'])
 @admin_required
+@invalidates('events')
 def update_event(event_id, current_user=None):
     """Update an existing event (admin only)"""
     try:
@@ -3881,6 +4944,7 @@ def update_event(event_id, current_user=None):
 
 @app.route('/api/admin/events/<event_id>', methods=['DELETE'])
 @admin_required
+@invalidates('events')
 def delete_event(event_id, current_user=None):
     """Delete an event (admin only)"""
     try:
@@ -3895,6 +4959,7 @@ def delete_event(event_id, current_user=None):
 
 @app.route('/api/events/<event_id>/register', methods=['POST'])
 @token_required
+@invalidates('events')
 def register_event(event_id, current_user=None):
     """Register for an event"""
     try:
@@ -4012,30 +5077,147 @@ def admin_get_registrations(current_user=None):
         # Get all registrations with event and user details
         registrations = list(db.event_registrations.find().sort('registration_date', -1))
         
-        # Enrich with event and user details
-        enriched_registrations = []
+        # Enrich with event and user details, loaded once per collection
+        event_ids = {ObjectId(reg['event_id']) for reg in registrations if ObjectId.is_valid(reg.get('event_id'))}
+        user_ids = {ObjectId(reg['user_id']) for reg in registrations if ObjectId.is_valid(reg.get('user_id'))}
+        events = {str(e['_id']): e for e in db.events.find({'_id': {'$in': list(event_ids)}}, {'title': 1, 'date': 1})}
+        users = {str(u['_id']): u for u in db.users.find({'_id': {'$in': list(user_ids)}}, {'name': 1, 'email': 1})}
+        
         for reg in registrations:
-            reg['_id'] = str(reg['_id'])
-            
-            # Get event details
-            event = db.events.find_one({'_id': ObjectId(reg['event_id'])})
+            event = events.get(str(reg.get('event_id')))
             if event:
                 reg['event_title'] = event.get('title', 'Unknown Event')
                 reg['event_date'] = event.get('date')
             
-            # Get user details
-            user = db.users.find_one({'_id': ObjectId(reg['user_id'])})
+            user = users.get(str(reg.get('user_id')))
             if user:
                 reg['user_name'] = user.get('name', 'Unknown User')
                 reg['user_email'] = user.get('email', '')
-            
-            enriched_registrations.append(reg)
         
-        return jsonify(enriched_registrations)
+        return jsonify(registrations)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+# Streaming exports
+# Each export walks a Mongo cursor in batches and writes rows as they come
+# (see exports), so month-end exports no longer build the whole list in memory.
+ORDER_EXPORT_COLUMNS = [
+    'id', 'createdAt', 'customerName', 'customerEmail', 'userId', 'items',
+    'subtotal', 'discount', 'shipping', 'tax', 'total',
+    'paymentMethod', 'paymentStatus', 'deliveryStatus', 'razorpayPaymentId', 'address',
+]
+USER_EXPORT_COLUMNS = ['id', 'name', 'email', 'phone', 'role', 'active', 'created_at']
+REGISTRATION_EXPORT_COLUMNS = [
+    'id', 'registration_date', 'event_id', 'event_title', 'event_date',
+    'user_id', 'user_name', 'user_email', 'status',
+]
+
+def export_response(name, rows, columns):
+    """Stream rows as the ?format= requested (csv by default) as a download"""
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    response = app.response_class(export_chunks(rows, columns, fmt, encode=app.json.dumps_bytes), mimetype=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{export_filename(name, fmt)}"'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def export_date_range(field):
+    """Condition on field from the optional ?from= and ?to= ISO dates (to is exclusive)"""
+    bounds = {}
+    for param, op in (('from', '$gte'), ('to', '$lt')):
+        if request.args.get(param):
+            try:
+                bounds[op] = datetime.datetime.fromisoformat(request.args[param])
+            except ValueError:
+                raise ValueError(f'{param} must be an ISO date, e.g. 2024-01-31')
+    return {field: bounds} if bounds else {}
+
+def export_order_rows(query):
+    cursor = orders_collection.find(query).sort([('created_at', -1), ('_id', -1)]).batch_size(EXPORT_BATCH_SIZE)
+    for o in cursor:
+        yield {
+            **format_order_summary(o),
+            # One cell per order: "Tulsi x2; Neem x1"
+            'items': '; '.join(f"{item.get('name', 'Unknown')} x{item.get('quantity', 1)}" for item in o.get('items', [])),
+            'subtotal': o.get('subtotal'),
+            'discount': o.get('discount'),
+            'shipping': o.get('shipping'),
+            'tax': o.get('tax'),
+            'total': o.get('total'),
+            'paymentMethod': o.get('paymentMethod', 'razorpay'),
+            'address': o.get('address'),
+        }
+
+def export_user_rows():
+    projection = {'name': 1, 'email': 1, 'phone': 1, 'role': 1, 'active': 1, 'created_at': 1}
+    for user in users_collection.find({}, projection).batch_size(EXPORT_BATCH_SIZE):
+        yield {
+            'id': str(user['_id']),
+            'name': user.get('name'),
+            'email': user.get('email'),
+            'phone': user.get('phone'),
+            'role': user.get('role', 'user'),
+            'active': user.get('active', True),
+            'created_at': user.get('created_at'),
+        }
+
+def export_registration_rows(query):
+    cursor = db.event_registrations.find(query).sort('registration_date', -1).batch_size(EXPORT_BATCH_SIZE)
+    for batch in batched(cursor):
+        # Event and user details are looked up once per batch
+        event_ids = {ObjectId(reg['event_id']) for reg in batch if ObjectId.is_valid(reg.get('event_id'))}
+        user_ids = {ObjectId(reg['user_id']) for reg in batch if ObjectId.is_valid(reg.get('user_id'))}
+        events = {str(e['_id']): e for e in db.events.find({'_id': {'$in': list(event_ids)}}, {'title': 1, 'date': 1})}
+        users = {str(u['_id']): u for u in db.users.find({'_id': {'$in': list(user_ids)}}, {'name': 1, 'email': 1})}
+        for reg in batch:
+            event = events.get(str(reg.get('event_id')), {})
+            user = users.get(str(reg.get('user_id')), {})
+            yield {
+                **{key: value for key, value in reg.items() if key != '_id'},
+                'id': str(reg['_id']),
+                'event_title': event.get('title', 'Unknown Event'),
+                'event_date': event.get('date'),
+                'user_name': user.get('name', 'Unknown User'),
+                'user_email': user.get('email', ''),
+            }
+
+@app.route('/api/admin/exports/orders', methods=['GET'])
+@store_manager_required
+def export_orders():
+    try:
+        query = export_date_range('created_at')
+        for param in ('paymentStatus', 'deliveryStatus', 'userId'):
+            if request.args.get(param):
+                query[param] = request.args.get(param)
+        return export_response('orders', export_order_rows(query), ORDER_EXPORT_COLUMNS)
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/exports/users', methods=['GET'])
+@admin_required
+def export_users():
+    try:
+        return export_response('users', export_user_rows(), USER_EXPORT_COLUMNS)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/admin/exports/registrations', methods=['GET'])
+@admin_required
+def export_registrations():
+    try:
+        query = export_date_range('registration_date')
+        if request.args.get('eventId'):
+            query['event_id'] = request.args.get('eventId')
+        return export_response('registrations', export_registration_rows(query), REGISTRATION_EXPORT_COLUMNS)
+    except ValueError as ve:
+        return jsonify({'error': str(ve)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # --- Weather-Based Crop Recommendation ---
 
 OPENWEATHER_API_KEY = os.getenv('OPENWEATHERMAP_API_KEY')
@@ -4191,6 +5373,7 @@ def recommend_crops():
         # Fetch all crops to rank them (dataset is small enough)
         all_crops = list(crops_collection.find())
         recommended_crops = []
+        search_index = ensure_search_index()
         
         for crop in all_crops:
             crop['id'] = str(crop['_id'])
@@ -4243,20 +5426,23 @@ def recommend_crops():
                 else:
                     crop['suitability'] = "Moderately Suitable"
 
-                # Check directly if a matching product exists
-                product = products_collection.find_one({
-                    'name': {'$regex': f'{crop["name"]}', '$options': 'i'},
-                    'category': 'Seeds'
-                })
-                
-                if product:
-                    crop['productId'] = str(product['_id'])
-                    crop['isAvailable'] = int(product.get('stock', 0)) > 0
-                else:
-                    crop['productId'] = None
-                    crop['isAvailable'] = False
+                # Match a seed product by name through the search index
+                match = search_index.search(crop['name'], limit=1, category='Seeds', fuzzy=False, require_all=True)
+                crop['productId'] = match[0][0] if match else None
+                crop['isAvailable'] = False
 
                 recommended_crops.append(crop)
+        
+        # One stock lookup for every matched seed product
+        product_ids = [ObjectId(c['productId']) for c in recommended_crops if c['productId']]
+        if product_ids:
+            in_stock = {
+                str(p['_id'])
+                for p in products_collection.find({'_id': {'$in': product_ids}}, {'stock': 1})
+                if int(p.get('stock', 0)) > 0
+            }
+            for crop in recommended_crops:
+                crop['isAvailable'] = crop['productId'] in in_stock
                 
         # Generate explanations for the top crops (Batch Request)
         if recommended_crops:
@@ -4318,13 +5504,12 @@ def recommend_crops():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/weather/crops', methods=['GET'])
+@cached_view('crops')
 def get_all_crop_suitability():
     try:
-        crops = list(crops_collection.find())
-        for crop in crops:
-            crop['id'] = str(crop['_id'])
-            del crop['_id']
-        return jsonify(crops)
+        # Rename _id to id on the server so the cursor can be returned as is
+        crops = crops_collection.aggregate([{'$set': {'id': '$_id'}}, {'$unset': '_id'}])
+        return jsonify(list(crops))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Credit orders delivered before drivers were recorded.
+
+Deliveries made before the claim-based queue carry no deliveredBy. This
+marks them as delivered by LEGACY_COURIER, so they stay in every driver's
+delivery history as they were in the old shared list. Run it once after
+deploying the delivery queue; running it again is harmless.
+
+Usage:
+    python backfill_deliveries.py
+"""
+
+import argparse
+import os
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from delivery_queue import DeliveryQueue
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+DB_NAME = "greencart"
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description=__doc__.split('\n\n')[0]).parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+    credited = DeliveryQueue(db.orders, db.delivery_couriers).backfill_legacy()
+    print(f"✓ Marked {credited} earlier delivery(ies) as legacy")
+    client.close()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Rebuild the sales rollups from orders.
+
+Day and product rollups are recomputed with aggregation pipelines that
+$merge into sales_rollups, and every counted order is flagged so the live
+$inc path does not add it again. Run it once after deploying rollups, or to
+repair a date range.
+
+Usage:
+    python backfill_rollups.py                    # rebuild every day
+    python backfill_rollups.py --since 2024-01-01 # rebuild from a day onwards
+"""
+
+import argparse
+import datetime
+import os
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from sales_rollups import SalesRollups
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+DB_NAME = "greencart"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--since', type=datetime.datetime.fromisoformat, default=None,
+                        help='first day to rebuild (YYYY-MM-DD); defaults to all time')
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+    days, products = SalesRollups(db.sales_rollups, db.orders).rebuild(since=args.since)
+    print(f"✓ Rebuilt {days} day rollup(s) and {products} product rollup(s)"
+          f"{' since ' + args.since.date().isoformat() if args.since else ''}")
+    client.close()
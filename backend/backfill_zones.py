@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Tag orders with delivery zones and rebuild the zone summary.
+
+Orders placed before zones existed get the pincode and zone fields from
+their address, then the per-zone status counts in delivery_zones are
+recomputed with an aggregation pipeline. Run it once after deploying zones,
+or whenever the counts need repairing.
+
+Usage:
+    python backfill_zones.py
+"""
+
+import argparse
+import os
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from delivery_zones import ZoneSummary
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+DB_NAME = "greencart"
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description=__doc__.split('\n\n')[0]).parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+    summary = ZoneSummary(db.delivery_zones, db.orders)
+    tagged = summary.rebuild()
+    zones = summary.summary()
+    print(f"✓ Tagged {tagged} order(s); {len(zones)} zone(s), "
+          f"{sum(zone['open'] for zone in zones)} open order(s)")
+    client.close()
@@ -0,0 +1,407 @@
+"""
+Namespaced two-tier cache for GreenCart.
+
+Every cached value belongs to a namespace ('products', 'categories', ...).
+Each namespace has a generation counter and every key embeds the current
+generation, so bumping the counter orphans all keys derived from it in
+O(1). Orphaned entries are never read again and age out through their TTL,
+so invalidation never needs SCAN/DEL or FLUSHDB.
+
+Reads go through a bounded per-process LRU first and Redis second. Misses
+for the same key are coalesced into a single loader (per process, and
+across processes through a short Redis lock). Entries that are past their
+TTL but inside the stale window are served immediately while one worker
+refreshes them in the background.
+
+Payloads are stored with pre-compressed variants (see compression.py) so
+they are compressed once per build rather than once per response.
+
+Each bump also records when the namespace last changed, which HTTP
+handlers use as Last-Modified.
+
+Generations are shared through Redis when it is configured and kept per
+process otherwise. Without Redis a bump in one process never reaches the
+others, so local entries are then kept for LOCAL_ONLY_TTL seconds at most.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import redis
+
+from compression import precompress
+
+# Namespaces written by the backend and its maintenance scripts
+NAMESPACES = (
+    'products',          # public catalog payloads (prices, stock, images)
+    'product_search',    # search index text (name, category, description)
+    'categories',
+    'remedies',
+    'remedy_categories',
+    'crops',
+    'reviews',
+    'blog_posts',        # posts, comments and likes
+    'events',            # events and their registrations
+)
+
+GENERATION_KEY = 'cache:gen:{namespace}'
+CHANGED_KEY = 'cache:changed:{namespace}'
+VALUE_KEY = 'cache:{namespace}:{generation}:{name}'
+LOCK_KEY = 'cache:lock:{key}'
+
+# How long a worker trusts its last read of a Redis generation. Bumps made
+# by this process are visible immediately; bumps from other workers within
+# this window.
+GENERATION_TTL = 1.0
+LOCK_TTL_MS = 10000
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
+# Fresh and stale lifetimes of entries when there is no Redis to share
+# generations through; they bound how long another process's write can go
+# unseen
+LOCAL_ONLY_TTL = 3.0
+LOCAL_ONLY_STALE_TTL = 2.0
+
+
+class LocalLRU:
+    """Thread-safe LRU bounded by entry count and total body size"""
+
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        size = entry.size
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.size
+            self._entries[key] = entry
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+
+
+class CacheEntry:
+    """A serialized payload with its freshness window"""
+
+    __slots__ = ('etag', 'body', 'variants', 'fresh_until', 'stale_until')
+
+    def __init__(self, etag, body, fresh_until, stale_until, variants=None):
+        self.etag = etag
+        self.body = body
+        self.variants = variants or {}
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(v) for v in self.variants.values())
+
+    @property
+    def payload(self):
+        return self.etag, self.body
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one execution"""
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+class NamespacedCache:
+    """Generation-counted, two-tier cache on top of an optional Redis client"""
+
+    def __init__(self, redis_client=None, max_entries=512, max_bytes=64 * 1024 * 1024):
+        self.redis = redis_client
+        # Payload bodies are binary (compressed variants), so they go through
+        # a client that does not decode responses
+        self.payload_redis = binary_client(redis_client)
+        self.lru = LocalLRU(max_entries, max_bytes)
+        self._local = {}
+        self._changed = {}
+        self._generations = {}   # namespace -> (token, changed_at, read_at)
+        self.started_at = time.time()
+        self._flight = SingleFlight()
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        """Whether generations are shared with other processes"""
+        return self.redis is not None
+
+    def _state(self, namespace):
+        """Return (generation token, changed_at) for the namespace"""
+        if self.redis:
+            memo = self._generations.get(namespace)
+            if memo and time.monotonic() - memo[2] < GENERATION_TTL:
+                return memo[0], memo[1]
+            try:
+                generation, changed_at = self.redis.mget(
+                    GENERATION_KEY.format(namespace=namespace),
+                    CHANGED_KEY.format(namespace=namespace),
+                )
+                token = f"r{int(generation or 0)}"
+                changed_at = float(changed_at) if changed_at else self.started_at
+                self._generations[namespace] = (token, changed_at, time.monotonic())
+                return token, changed_at
+            except Exception as e:
+                print(f"Redis generation read error for {namespace}: {e}")
+        return f"l{self._local.get(namespace, 0)}", self._changed.get(namespace, self.started_at)
+
+    def generation(self, namespace):
+        """Return the namespace's current generation token"""
+        return self._state(namespace)[0]
+
+    def changed_at(self, namespace):
+        """Return the epoch time of the namespace's last bump (or of process start)"""
+        return self._state(namespace)[1]
+
+    def bump(self, namespace):
+        """Invalidate every key in the namespace and return (previous, current) tokens"""
+        now = time.time()
+        with self._lock:
+            self._local[namespace] = self._local.get(namespace, 0) + 1
+            self._changed[namespace] = now
+            local = self._local[namespace]
+        if self.redis:
+            try:
+                pipe = self.redis.pipeline()
+                pipe.incr(GENERATION_KEY.format(namespace=namespace))
+                pipe.set(CHANGED_KEY.format(namespace=namespace), now)
+                current = int(pipe.execute()[0])
+                self._generations[namespace] = (f"r{current}", now, time.monotonic())
+                return f"r{current - 1}", f"r{current}"
+            except Exception as e:
+                self._generations.pop(namespace, None)
+                print(f"Redis generation bump error for {namespace}: {e}")
+        return f"l{local - 1}", f"l{local}"
+
+    def invalidate(self, *namespaces):
+        """Bump several namespaces at once"""
+        for namespace in namespaces:
+            self.bump(namespace)
+
+    def key(self, namespace, name, generation=None):
+        """Build the cache key for name under the namespace's generation"""
+        return VALUE_KEY.format(
+            namespace=namespace,
+            generation=generation or self.generation(namespace),
+            name=name,
+        )
+
+    def fetch(self, namespace, name, loader, ttl, stale_ttl=0):
+        """Return the (etag, body) payload for name; see fetch_entry"""
+        return self.fetch_entry(namespace, name, loader, ttl, stale_ttl).payload
+
+    def fetch_entry(self, namespace, name, loader, ttl, stale_ttl=0):
+        """
+        Return the CacheEntry for name, calling loader() -> (etag, body) on a
+        miss. Within stale_ttl seconds after expiry the old entry is returned
+        while a single background refresh runs.
+        """
+        if not self.shared:
+            ttl, stale_ttl = min(ttl, LOCAL_ONLY_TTL), min(stale_ttl, LOCAL_ONLY_STALE_TTL)
+        key = self.key(namespace, name)
+        now = time.time()
+
+        entry = self.lru.get(key)
+        if entry is None or entry.fresh_until <= now:
+            remote = self._read_remote(key)
+            if remote is not None and (entry is None or remote.fresh_until > entry.fresh_until):
+                entry = remote
+                self.lru.set(key, entry)
+
+        if entry is not None:
+            if entry.fresh_until > now:
+                return entry
+            if entry.stale_until > now:
+                self._refresh_in_background(key, loader, ttl, stale_ttl)
+                return entry
+
+        return self._flight.do(key, lambda: self._load(key, loader, ttl, stale_ttl))
+
+    def _load(self, key, loader, ttl, stale_ttl, wait_for_peer=True):
+        """Run the loader once across processes and store the result in both tiers"""
+        token = self._acquire_lock(key)
+        if token is None and wait_for_peer:
+            # Another worker is already loading this key; give it a moment
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL)
+                entry = self._read_remote(key)
+                if entry is not None and entry.fresh_until > time.time():
+                    self.lru.set(key, entry)
+                    return entry
+        try:
+            etag, body = loader()
+            now = time.time()
+            entry = CacheEntry(etag, body, now + ttl, now + ttl + stale_ttl, precompress(body))
+            self.lru.set(key, entry)
+            self._write_remote(key, entry, ttl + stale_ttl)
+            return entry
+        finally:
+            if token is not None:
+                self._release_lock(key, token)
+
+    def _refresh_in_background(self, key, loader, ttl, stale_ttl):
+        if self._flight.in_flight(key):
+            return
+
+        def refresh():
+            try:
+                self._flight.do(key, lambda: self._load(key, loader, ttl, stale_ttl, wait_for_peer=False))
+            except Exception as e:
+                print(f"Background cache refresh failed for {key}: {e}")
+
+        threading.Thread(target=refresh, name='cache-refresh', daemon=True).start()
+
+    def _read_remote(self, key):
+        if not self.payload_redis:
+            return None
+        try:
+            cached = self.payload_redis.hgetall(key)
+            if cached and b'etag' in cached and b'body' in cached:
+                fresh_until = float(cached.get(b'fresh_until', 0))
+                stale_until = float(cached.get(b'stale_until', fresh_until))
+                variants = {
+                    field[len(b'enc:'):].decode('ascii'): value
+                    for field, value in cached.items() if field.startswith(b'enc:')
+                }
+                return CacheEntry(cached[b'etag'].decode('ascii'), cached[b'body'],
+                                  fresh_until, stale_until, variants)
+        except Exception as e:
+            print(f"Redis cache read error for {key}: {e}")
+        return None
+
+    def _write_remote(self, key, entry, expire_seconds):
+        if not self.payload_redis:
+            return
+        try:
+            mapping = {
+                'etag': entry.etag,
+                'body': entry.body,
+                'fresh_until': entry.fresh_until,
+                'stale_until': entry.stale_until,
+            }
+            for encoding, data in entry.variants.items():
+                mapping[f'enc:{encoding}'] = data
+            pipe = self.payload_redis.pipeline()
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, max(1, int(expire_seconds)))
+            pipe.execute()
+        except Exception as e:
+            print(f"Redis cache write error for {key}: {e}")
+
+    def _acquire_lock(self, key):
+        """Take the cross-process loader lock; returns a token or None if held elsewhere"""
+        if not self.redis:
+            return 'local'
+        token = uuid.uuid4().hex
+        try:
+            if self.redis.set(LOCK_KEY.format(key=key), token, nx=True, px=LOCK_TTL_MS):
+                return token
+            return None
+        except Exception as e:
+            print(f"Redis cache lock error for {key}: {e}")
+            return 'local'
+
+    def _release_lock(self, key, token):
+        if not self.redis or token == 'local':
+            return
+        try:
+            lock_key = LOCK_KEY.format(key=key)
+            if self.redis.get(lock_key) == token:
+                self.redis.delete(lock_key)
+        except Exception as e:
+            print(f"Redis cache unlock error for {key}: {e}")
+
+
+def binary_client(client):
+    """Return a client sharing client's connection settings without response decoding"""
+    if client is None:
+        return None
+    try:
+        kwargs = dict(client.connection_pool.connection_kwargs)
+        if not kwargs.get('decode_responses'):
+            return client
+        kwargs['decode_responses'] = False
+        return redis.Redis(connection_pool=redis.ConnectionPool(
+            connection_class=client.connection_pool.connection_class, **kwargs
+        ))
+    except Exception as e:
+        print(f"Redis payload client error: {e}")
+        return None
+
+
+def redis_from_env():
+    """Connect to Redis from REDIS_* environment variables, or return None"""
+    host = os.getenv('REDIS_HOST')
+    if not host:
+        return None
+    try:
+        client = redis.Redis(
+            host=host,
+            port=int(os.getenv('REDIS_PORT', 6379)),
+            db=int(os.getenv('REDIS_DB', 0)),
+            password=os.getenv('REDIS_PASSWORD', None),
+            decode_responses=True
+        )
+        client.ping()
+        return client
+    except Exception as e:
+        print(f"Redis connection failed: {e}")
+        return None
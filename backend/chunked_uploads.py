@@ -0,0 +1,245 @@
+"""
+Resumable chunked uploads.
+
+A client initiates an upload session, PUTs numbered parts in any order
+(retrying any that fail), and completes the session once every part is
+stored. Parts are streamed to disk in CHUNK_SIZE pieces, so memory use per
+request stays bounded however large the file is, and each part and the
+assembled file can be checked against a SHA-256 supplied by the client.
+
+Sessions live in the `upload_sessions` collection and expire after
+SESSION_TTL; their part files are swept from disk by sweep_expired_parts().
+"""
+
+import datetime
+import hashlib
+import math
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+
+from upload_storage import CHUNK_SIZE, publish
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+MIN_PART_SIZE = 256 * 1024
+MAX_PART_SIZE = 64 * 1024 * 1024
+MAX_UPLOAD_SIZE = 1024 * 1024 * 1024
+SESSION_TTL = datetime.timedelta(hours=24)
+PARTS_DIRNAME = '.parts'
+# Session ids are uuid4().hex; anything else never reaches the filesystem
+UPLOAD_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+
+class UploadNotFound(LookupError):
+    """The session does not exist, has expired or is already completed"""
+
+
+def _sha256_or_none(value, label):
+    if value is None or value == '':
+        return None
+    value = str(value).strip().lower()
+    if len(value) != 64 or any(c not in '0123456789abcdef' for c in value):
+        raise ValueError(f'{label} must be a hex SHA-256 digest')
+    return value
+
+
+class ChunkedUploadStore:
+    """Upload sessions in Mongo, part files under <upload_dir>/.parts/<upload_id>/"""
+
+    def __init__(self, collection, upload_dir):
+        self.collection = collection
+        self.upload_dir = upload_dir
+        self.parts_root = os.path.join(upload_dir, PARTS_DIRNAME)
+
+    @staticmethod
+    def _checked_id(upload_id):
+        if not isinstance(upload_id, str) or not UPLOAD_ID_PATTERN.fullmatch(upload_id):
+            raise UploadNotFound('Upload session not found or expired')
+        return upload_id
+
+    def _session_dir(self, upload_id):
+        return os.path.join(self.parts_root, self._checked_id(upload_id))
+
+    def _part_path(self, upload_id, number):
+        return os.path.join(self._session_dir(upload_id), f"{number:05d}.part")
+
+    def _open_session(self, upload_id):
+        session = self.collection.find_one({'_id': self._checked_id(upload_id), 'status': 'open'})
+        if not session or session['expires_at'] < datetime.datetime.utcnow():
+            raise UploadNotFound('Upload session not found or expired')
+        return session
+
+    def initiate(self, filename, ext, size, sha256=None, part_size=None, user_id=None, content_type=None):
+        """Create a session and return it"""
+        try:
+            size = int(size)
+            part_size = int(part_size or DEFAULT_PART_SIZE)
+        except (TypeError, ValueError):
+            raise ValueError('size and partSize must be integers')
+        if size <= 0 or size > MAX_UPLOAD_SIZE:
+            raise ValueError(f'size must be between 1 and {MAX_UPLOAD_SIZE} bytes')
+        if not MIN_PART_SIZE <= part_size <= MAX_PART_SIZE:
+            raise ValueError(f'partSize must be between {MIN_PART_SIZE} and {MAX_PART_SIZE} bytes')
+
+        now = datetime.datetime.utcnow()
+        session = {
+            '_id': uuid.uuid4().hex,
+            'filename': filename,
+            'ext': ext,
+            'content_type': content_type,
+            'size': size,
+            'sha256': _sha256_or_none(sha256, 'sha256'),
+            'part_size': part_size,
+            'total_parts': max(1, math.ceil(size / part_size)),
+            'parts': {},
+            'status': 'open',
+            'created_by': user_id,
+            'created_at': now,
+            'expires_at': now + SESSION_TTL,
+        }
+        os.makedirs(self._session_dir(session['_id']), exist_ok=True)
+        self.collection.insert_one(session)
+        return session
+
+    def expected_part_size(self, session, number):
+        if number < session['total_parts']:
+            return session['part_size']
+        return session['size'] - session['part_size'] * (session['total_parts'] - 1)
+
+    def write_part(self, upload_id, number, stream, sha256=None):
+        """Stream one part to disk, verify it, and return {'size', 'sha256'}"""
+        session = self._open_session(upload_id)
+        if not 1 <= number <= session['total_parts']:
+            raise ValueError(f"part number must be between 1 and {session['total_parts']}")
+        expected_sha = _sha256_or_none(sha256, 'Part SHA-256')
+        expected_size = self.expected_part_size(session, number)
+
+        digest = hashlib.sha256()
+        received = 0
+        fd, temp_path = tempfile.mkstemp(dir=self._session_dir(upload_id), prefix='.incoming-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    received += len(chunk)
+                    if received > expected_size:
+                        raise ValueError(f'Part {number} is larger than {expected_size} bytes')
+                    digest.update(chunk)
+                    out.write(chunk)
+            if received != expected_size:
+                raise ValueError(f'Part {number} must be {expected_size} bytes, got {received}')
+            actual_sha = digest.hexdigest()
+            if expected_sha and actual_sha != expected_sha:
+                raise ValueError(f'Part {number} checksum mismatch')
+            # Retries of the same part simply replace the earlier copy
+            os.replace(temp_path, self._part_path(upload_id, number))
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        part = {'size': received, 'sha256': actual_sha}
+        self.collection.update_one(
+            {'_id': upload_id, 'status': 'open'},
+            {'$set': {f'parts.{number}': part}}
+        )
+        return part
+
+    def status(self, upload_id):
+        """Return progress for a session: received and missing part numbers"""
+        session = self.collection.find_one({'_id': self._checked_id(upload_id)})
+        if not session:
+            raise UploadNotFound('Upload session not found or expired')
+        received = sorted(int(n) for n in session.get('parts', {}))
+        missing = [n for n in range(1, session['total_parts'] + 1) if n not in set(received)]
+        return {
+            'uploadId': upload_id,
+            'status': session['status'],
+            'size': session['size'],
+            'partSize': session['part_size'],
+            'totalParts': session['total_parts'],
+            'receivedParts': received,
+            'missingParts': missing,
+            'url': session.get('url'),
+            'expiresAt': session['expires_at'],
+        }
+
+    def complete(self, upload_id):
+        """
+        Assemble the parts into the uploads directory under the content hash
+        and return (filename, sha256, size). Only one caller can complete a
+        session.
+        """
+        session = self._open_session(upload_id)
+        missing = [n for n in range(1, session['total_parts'] + 1) if str(n) not in session.get('parts', {})]
+        if missing:
+            raise ValueError(f'Missing parts: {missing[:20]}')
+
+        claimed = self.collection.find_one_and_update(
+            {'_id': upload_id, 'status': 'open'},
+            {'$set': {'status': 'assembling'}}
+        )
+        if not claimed:
+            raise UploadNotFound('Upload session is already being completed')
+
+        digest = hashlib.sha256()
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=self.upload_dir, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for number in range(1, session['total_parts'] + 1):
+                    with open(self._part_path(upload_id, number), 'rb') as part:
+                        while True:
+                            chunk = part.read(CHUNK_SIZE)
+                            if not chunk:
+                                break
+                            digest.update(chunk)
+                            size += len(chunk)
+                            out.write(chunk)
+            sha256 = digest.hexdigest()
+            if size != session['size']:
+                raise ValueError(f"Assembled size {size} does not match declared size {session['size']}")
+            if session.get('sha256') and sha256 != session['sha256']:
+                raise ValueError('File checksum mismatch')
+            filename = publish(temp_path, self.upload_dir, sha256, session['ext'])
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            self.collection.update_one({'_id': upload_id}, {'$set': {'status': 'open'}})
+            raise
+
+        shutil.rmtree(self._session_dir(upload_id), ignore_errors=True)
+        self.collection.update_one({'_id': upload_id}, {'$set': {
+            'status': 'complete', 'stored_as': filename, 'sha256': sha256,
+            'completed_at': datetime.datetime.utcnow(),
+        }})
+        return filename, sha256, size
+
+    def record_url(self, upload_id, url):
+        self.collection.update_one({'_id': self._checked_id(upload_id)}, {'$set': {'url': url}})
+
+    def abort(self, upload_id):
+        """Discard a session and its parts"""
+        session_dir = self._session_dir(upload_id)
+        result = self.collection.delete_one({'_id': upload_id, 'status': {'$in': ['open', 'complete']}})
+        if not result.deleted_count:
+            raise UploadNotFound('Upload session not found or expired')
+        shutil.rmtree(session_dir, ignore_errors=True)
+
+    def sweep_expired_parts(self, max_age=SESSION_TTL):
+        """Delete part directories older than the session lifetime; returns how many were removed"""
+        if not os.path.isdir(self.parts_root):
+            return 0
+        cutoff = time.time() - max_age.total_seconds()
+        removed = 0
+        for name in os.listdir(self.parts_root):
+            path = os.path.join(self.parts_root, name)
+            if os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
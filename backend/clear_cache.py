@@ -12,16 +12,12 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 def clear_redis_cache():
     """Clear Redis cache if it exists"""
     try:
-        from app import redis_client
+        from cache import NAMESPACES, NamespacedCache, redis_from_env
+        redis_client = redis_from_env()
         if redis_client:
-            cache_key = "products_list"
-            result = redis_client.delete(cache_key)
-            if result:
-                print("✓ Redis cache cleared successfully")
-            else:
-                print("• No cache found to clear")
+            NamespacedCache(redis_client).invalidate(*NAMESPACES)
+            print(f"✓ Invalidated cache namespaces: {', '.join(NAMESPACES)}")
             return True
-    except ImportError:
         print("• Redis not configured in the application")
     except Exception as e:
         print(f"✗ Error clearing Redis cache: {e}")
@@ -8,6 +8,8 @@ import os
 import sys
 from dotenv import load_dotenv
 
+from cache import NAMESPACES, NamespacedCache
+
 # Load environment variables
 load_dotenv()
 
@@ -33,13 +35,9 @@ def clear_redis_cache():
         redis_client.ping()
         print(f"✓ Connected to Redis at {REDIS_HOST}:{REDIS_PORT}")
         
-        # Clear the products cache
-        cache_key = "products_list"
-        result = redis_client.delete(cache_key)
-        if result:
-            print("✓ Redis cache cleared successfully")
-        else:
-            print("• No cache found to clear")
+        # Bump every namespace generation; old entries expire through their TTL
+        NamespacedCache(redis_client).invalidate(*NAMESPACES)
+        print(f"✓ Invalidated cache namespaces: {', '.join(NAMESPACES)}")
         return True
     except Exception as e:
         print(f"Note: Could not clear Redis cache: {e}")
@@ -0,0 +1,71 @@
+"""
+Response compression for GreenCart.
+
+Cached payloads are compressed once when they are built and stored next to
+the raw body, so hot responses never pay for compression per request. Other
+JSON/text responses above COMPRESS_MIN_SIZE are compressed on the way out.
+Brotli (`brotli` in requirements.txt) is used when the client accepts it;
+gzip otherwise, or if the package is missing from a local environment.
+"""
+
+import gzip
+
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Bodies smaller than this rarely shrink enough to pay for the CPU
+COMPRESS_MIN_SIZE = 1024
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/javascript',
+    'image/svg+xml',
+}
+
+# Cached payloads are compressed once, so they get the slower, denser levels
+PRECOMPRESS_LEVELS = {'br': 9, 'gzip': 9}
+DYNAMIC_LEVELS = {'br': 4, 'gzip': 6}
+
+
+def supported_encodings():
+    return ('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)
+
+
+def compress(body, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def precompress(body):
+    """Return {encoding: bytes} for every supported encoding worth storing"""
+    if len(body) < COMPRESS_MIN_SIZE:
+        return {}
+    variants = {}
+    for encoding in supported_encodings():
+        encoded = compress(body, encoding, PRECOMPRESS_LEVELS[encoding])
+        if len(encoded) < len(body):
+            variants[encoding] = encoded
+    return variants
+
+
+def negotiate(accept_encodings, available=None):
+    """
+    Pick the best encoding from a werkzeug Accept header object. Only
+    encodings in available (default: all supported) are considered;
+    returns None for identity.
+    """
+    best, best_quality = None, 0
+    for encoding in supported_encodings():
+        if available is not None and encoding not in available:
+            continue
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_MIMETYPES)
@@ -0,0 +1,198 @@
+"""
+Index registry for the GreenCart MongoDB database.
+
+Every query shape the backend issues is backed by an index declared here.
+ensure_indexes() is idempotent: creating an index that already exists with
+the same keys and options is a no-op, so it is safe to run on every startup
+or from manage_indexes.py.
+"""
+
+import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import ConnectionFailure, PyMongoError
+
+INDEX_REGISTRY = {
+    'users': [
+        IndexModel([('email', ASCENDING)], name='email_unique', unique=True),
+    ],
+    'products': [
+        IndexModel([('category', ASCENDING), ('subcategory', ASCENDING), ('_id', DESCENDING)], name='category_subcategory_newest'),
+        IndexModel([('category', ASCENDING), ('price', ASCENDING), ('_id', ASCENDING)], name='category_price'),
+        IndexModel([('price', ASCENDING), ('_id', ASCENDING)], name='price'),
+        IndexModel([('name', ASCENDING), ('_id', ASCENDING)], name='name'),
+        IndexModel([('stock', ASCENDING)], name='stock'),
+        IndexModel([('image', ASCENDING)], name='image'),
+    ],
+    'orders': [
+        # Order listings are keyset-paginated on (created_at, _id)
+        IndexModel([('userId', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], name='user_created'),
+        IndexModel([('created_at', DESCENDING), ('_id', DESCENDING)], name='created'),
+        IndexModel([('paymentStatus', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], name='payment_status_created'),
+        IndexModel([('deliveryStatus', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)], name='delivery_status_created'),
+        # Delivery queue: a driver's claimed orders and their delivery history
+        IndexModel([('courierId', ASCENDING), ('deliveryStatus', ASCENDING), ('created_at', ASCENDING)], name='courier_status_created'),
+        IndexModel([('deliveredBy', ASCENDING), ('delivered_at', DESCENDING)], name='delivered_by_delivered', sparse=True),
+        # Zone batches: open orders in a pincode zone, in route order
+        IndexModel([('zone', ASCENDING), ('deliveryStatus', ASCENDING), ('pincode', ASCENDING), ('created_at', ASCENDING)], name='zone_status_pincode'),
+    ],
+    'notifications': [
+        IndexModel([('userId', ASCENDING), ('createdAt', DESCENDING)], name='user_created'),
+        IndexModel([('created_at', DESCENDING)], name='created'),
+        # At most one active stock alert per product and level
+        IndexModel(
+            [('data.productId', ASCENDING), ('type', ASCENDING)], name='active_stock_alert_unique',
+            unique=True, partialFilterExpression={'active': True}
+        ),
+    ],
+    'otp_verifications': [
+        IndexModel([('email', ASCENDING), ('expires_at', DESCENDING)], name='email_expires'),
+        # TTL: Mongo removes OTP documents once expires_at has passed
+        IndexModel([('expires_at', ASCENDING)], name='expires_ttl', expireAfterSeconds=0),
+    ],
+    'reviews': [
+        IndexModel([('productId', ASCENDING)], name='product'),
+        IndexModel([('userId', ASCENDING), ('productId', ASCENDING)], name='user_product'),
+    ],
+    'blog_posts': [
+        IndexModel([('created_at', DESCENDING)], name='created'),
+        IndexModel([('category', ASCENDING), ('created_at', DESCENDING)], name='category_created'),
+        IndexModel([('likes', DESCENDING), ('created_at', DESCENDING)], name='likes_created'),
+        IndexModel([('author_id', ASCENDING), ('created_at', DESCENDING)], name='author_created'),
+    ],
+    'blog_comments': [
+        IndexModel([('post_id', ASCENDING), ('created_at', ASCENDING)], name='post_created'),
+    ],
+    'blog_likes': [
+        IndexModel([('post_id', ASCENDING), ('user_id', ASCENDING)], name='post_user_unique', unique=True),
+    ],
+    'blog_notifications': [
+        IndexModel([('user_id', ASCENDING), ('created_at', DESCENDING)], name='user_created'),
+    ],
+    'events': [
+        IndexModel([('date', ASCENDING)], name='date'),
+    ],
+    'event_registrations': [
+        IndexModel([('event_id', ASCENDING)], name='event'),
+        IndexModel([('registration_date', DESCENDING)], name='registered'),
+    ],
+    'feedback': [
+        IndexModel([('status', ASCENDING), ('createdAt', DESCENDING)], name='status_created'),
+        IndexModel([('createdAt', DESCENDING)], name='created'),
+    ],
+    'image_variants': [
+        IndexModel([('url', ASCENDING)], name='url_unique', unique=True),
+    ],
+    'upload_sessions': [
+        # TTL: abandoned chunked uploads disappear after their expiry
+        IndexModel([('expires_at', ASCENDING)], name='expires_ttl', expireAfterSeconds=0),
+    ],
+    'stock_reservations': [
+        IndexModel([('status', ASCENDING), ('expires_at', ASCENDING)], name='status_expires'),
+        # TTL: committed and released reservations are purged after a retention period
+        IndexModel([('purge_at', ASCENDING)], name='purge_ttl', expireAfterSeconds=0),
+    ],
+    'upload_blobs': [
+        IndexModel([('urls', ASCENDING)], name='urls'),
+        IndexModel([('refcount', ASCENDING), ('last_uploaded_at', ASCENDING)], name='refcount_uploaded'),
+    ],
+    'upload_jobs': [
+        IndexModel([('status', ASCENDING), ('updated_at', ASCENDING)], name='status_updated'),
+        IndexModel([('expires_at', ASCENDING)], name='expires_ttl', expireAfterSeconds=0),
+    ],
+    'sales_rollups': [
+        IndexModel([('kind', ASCENDING), ('day', ASCENDING)], name='kind_day'),
+    ],
+    'idempotency_keys': [
+        # Looked up by _id (scope:user:key); TTL: stored responses expire after a day
+        IndexModel([('expires_at', ASCENDING)], name='expires_ttl', expireAfterSeconds=0),
+    ],
+}
+
+# Representative query shapes issued by app.py: (label, collection, filter, sort).
+# The values are placeholders; only the shape matters to the query planner.
+QUERY_SHAPES = [
+    ('login / signup by email', 'users', {'email': 'user@example.com'}, None),
+    ('product listing by category', 'products', {'category': 'Seeds', 'subcategory': 'Vegetable'}, [('_id', DESCENDING)]),
+    ('product listing by price', 'products', {'category': 'Seeds', 'price': {'$gte': 10}}, [('price', ASCENDING), ('_id', ASCENDING)]),
+    ('admin low-stock report', 'products', {'stock': {'$lt': 10, '$exists': True}}, None),
+    ('user order history', 'orders', {'userId': 'user-id'}, [('created_at', DESCENDING), ('_id', DESCENDING)]),
+    ('admin order list', 'orders', {'paymentStatus': 'Success'}, [('created_at', DESCENDING), ('_id', DESCENDING)]),
+    ('delivery claim', 'orders', {'deliveryStatus': {'$in': ['Confirmed', 'Shipped']}, '$or': [{'courierId': None}, {'leaseExpiresAt': {'$lte': datetime.datetime(2000, 1, 1)}}]}, [('created_at', ASCENDING), ('_id', ASCENDING)]),
+    ('driver deliveries', 'orders', {'courierId': 'user-id', 'deliveryStatus': {'$in': ['Confirmed', 'Shipped']}}, [('created_at', ASCENDING), ('_id', ASCENDING)]),
+    ('driver delivery history', 'orders', {'deliveredBy': {'$in': ['user-id', 'legacy']}}, [('delivered_at', DESCENDING)]),
+    ('zone delivery batch', 'orders', {'zone': '686', 'deliveryStatus': {'$in': ['Confirmed', 'Shipped']}, '$or': [{'courierId': None}, {'leaseExpiresAt': {'$lte': datetime.datetime(2000, 1, 1)}}]}, [('pincode', ASCENDING), ('created_at', ASCENDING), ('_id', ASCENDING)]),
+    ('user notifications', 'notifications', {'userId': 'user-id'}, [('createdAt', DESCENDING)]),
+    ('admin notifications', 'notifications', {}, [('created_at', DESCENDING)]),
+    ('OTP verification', 'otp_verifications', {'email': 'user@example.com', 'otp': '123456', 'used': False, 'expires_at': {'$gt': datetime.datetime(2000, 1, 1)}}, None),
+    ('product reviews', 'reviews', {'productId': 'product-id'}, None),
+    ('existing review check', 'reviews', {'userId': 'user-id', 'productId': 'product-id'}, None),
+    ('blog feed', 'blog_posts', {'category': 'General'}, [('created_at', DESCENDING)]),
+    ('my blog posts', 'blog_posts', {'author_id': 'user-id'}, [('created_at', DESCENDING)]),
+    ('blog comments', 'blog_comments', {'post_id': 'post-id'}, [('created_at', ASCENDING)]),
+    ('blog like lookup', 'blog_likes', {'post_id': 'post-id', 'user_id': 'user-id'}, None),
+    ('blog notifications', 'blog_notifications', {'user_id': 'user-id'}, [('created_at', DESCENDING)]),
+    ('upcoming events', 'events', {'date': {'$gte': datetime.datetime(2000, 1, 1)}}, [('date', ASCENDING)]),
+    ('event registrations', 'event_registrations', {'event_id': str(ObjectId())}, None),
+    ('admin feedback', 'feedback', {'status': 'new'}, [('createdAt', DESCENDING)]),
+    ('products using an image', 'products', {'image': '/uploads/photo.jpg'}, None),
+    ('image variant manifest', 'image_variants', {'url': '/uploads/photo.jpg', 'status': 'ready'}, None),
+    ('expired stock holds', 'stock_reservations', {'status': 'held', 'expires_at': {'$lt': datetime.datetime(2000, 1, 1)}}, None),
+    ('upload reference counting', 'upload_blobs', {'urls': {'$in': ['/uploads/photo.jpg']}}, None),
+    ('unreferenced uploads', 'upload_blobs', {'refcount': {'$lte': 0}, 'last_uploaded_at': {'$lt': datetime.datetime(2000, 1, 1)}}, None),
+    ('active stock alerts', 'notifications', {'data.productId': 'product-id', 'type': {'$in': ['LOW_STOCK']}, 'active': True}, None),
+    ('sales analytics', 'sales_rollups', {'kind': 'product', 'day': {'$gte': '2024-01-01', '$lte': '2024-01-31'}}, None),
+    ('stalled upload jobs', 'upload_jobs', {'status': {'$in': ['queued', 'uploading']}, 'updated_at': {'$lt': datetime.datetime(2000, 1, 1)}}, None),
+]
+
+
+def ensure_indexes(db, registry=None):
+    """Create every registered index and return a list of (collection, index, status) rows"""
+    results = []
+    for collection_name, models in (registry or INDEX_REGISTRY).items():
+        collection = db[collection_name]
+        for model in models:
+            name = model.document['name']
+            try:
+                collection.create_indexes([model])
+                results.append((collection_name, name, 'ok'))
+            except ConnectionFailure as e:
+                # No point trying the rest against an unreachable server
+                results.append((collection_name, name, f'failed: {e}'))
+                return results
+            except PyMongoError as e:
+                # Typically duplicate keys blocking a unique index, or an
+                # existing index with the same keys but different options
+                results.append((collection_name, name, f'failed: {e}'))
+    return results
+
+
+def _plan_stages(plan):
+    """Yield every stage name in a winning plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if 'stage' in plan:
+        yield plan['stage']
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from _plan_stages(child)
+
+
+def explain_query_shapes(db, shapes=None):
+    """Explain each registered query shape and return (label, collection, stages, flagged) rows"""
+    report = []
+    for label, collection_name, query, sort in (shapes or QUERY_SHAPES):
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+            stages = list(_plan_stages(plan))
+        except PyMongoError as e:
+            report.append((label, collection_name, [f'error: {e}'], True))
+            continue
+        report.append((label, collection_name, stages, 'COLLSCAN' in stages))
+    return report
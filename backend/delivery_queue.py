@@ -0,0 +1,229 @@
+"""
+Claim-based delivery queue.
+
+Confirmed and shipped orders form a shared pool. A delivery driver claims
+the next orders from it, oldest first, and from then on only that driver
+sees and delivers them:
+
+- every claim is one find_one_and_update that sets courierId and a lease
+  (leaseExpiresAt) on an order nobody holds, so two drivers never get the
+  same order however many claim at once;
+- one driver's claims run one at a time under a short lock, a conditional
+  upsert on their document in delivery_couriers, so two requests from the
+  same driver cannot both pass the MAX_ACTIVE_CLAIMS check;
+- listing one's orders renews the leases on them, so an active driver keeps
+  their batch;
+- a lease that runs out returns its order to the pool. Nothing has to sweep
+  expired claims: the claim filter treats them as free, and the next claim
+  simply takes the order over;
+- delivering is a single find_one_and_update on an order the driver still
+  holds, which also returns the fields the customer notification needs;
+- a status set by the store (set_status) takes an order that leaves the
+  deliverable statuses out of any driver's hands. Marking it Delivered
+  credits the driver holding it, or else the store user.
+
+Orders delivered before claims existed have no driver on record.
+backfill_deliveries.py marks them LEGACY_COURIER, and every driver's history
+lists them, as the shared history did before.
+
+Orders carry a pincode and zone (see delivery_zones), so a batch is claimed
+from one zone and worked through in PIN code order.
+"""
+
+import datetime
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+DELIVERABLE_STATUSES = ['Confirmed', 'Shipped']
+CLAIM_LEASE = datetime.timedelta(minutes=30)
+CLAIM_BATCH = 5
+# Most orders one driver may hold at a time
+MAX_ACTIVE_CLAIMS = 10
+# A claim lock left by a crashed request is taken over after this long
+CLAIM_LOCK_TTL = datetime.timedelta(seconds=10)
+HISTORY_LIMIT = 50
+# deliveredBy of orders delivered before drivers were recorded
+LEGACY_COURIER = 'legacy'
+CLAIM_FIELDS = ('courierId', 'claimedAt', 'leaseExpiresAt')
+
+DELIVERY_PROJECTION = {
+    'userName': 1, 'userEmail': 1, 'userPhone': 1, 'address': 1, 'shippingAddress': 1,
+    'total': 1, 'deliveryStatus': 1, 'created_at': 1, 'delivered_at': 1,
+    'courierId': 1, 'leaseExpiresAt': 1, 'zone': 1, 'pincode': 1,
+}
+
+
+class DeliveryQueue:
+    def __init__(self, orders, couriers, lease=CLAIM_LEASE, max_active=MAX_ACTIVE_CLAIMS):
+        self.orders = orders
+        self.couriers = couriers
+        self.lease = lease
+        self.max_active = max_active
+
+    @staticmethod
+    def _held_by(courier_id):
+        return {'courierId': courier_id, 'deliveryStatus': {'$in': DELIVERABLE_STATUSES}}
+
+    def active_count(self, courier_id):
+        return self.orders.count_documents(self._held_by(courier_id))
+
+    @staticmethod
+    def _claimable(now, zone=None):
+        query = {
+            'deliveryStatus': {'$in': DELIVERABLE_STATUSES},
+            '$or': [{'courierId': None}, {'leaseExpiresAt': {'$lte': now}}],
+        }
+        if zone:
+            query['zone'] = zone
+        return query
+
+    @staticmethod
+    def _route_order(zone=None):
+        # Within a zone, neighbouring PIN codes are visited together
+        if zone:
+            return [('pincode', ASCENDING), ('created_at', ASCENDING), ('_id', ASCENDING)]
+        return [('created_at', ASCENDING), ('_id', ASCENDING)]
+
+    def claim(self, courier_id, count=CLAIM_BATCH, now=None, zone=None):
+        """
+        Claim up to count free orders; returns the claimed documents. With a
+        zone only its orders are claimed, in route order. Without one the
+        oldest free order is claimed first and the batch is filled from its
+        zone, falling back to the oldest orders elsewhere once that runs out.
+        """
+        now = now or datetime.datetime.utcnow()
+        locked_until = self._lock(courier_id, now)
+        if locked_until is None:
+            # Another claim by this driver is running; it fills their batch
+            return []
+        try:
+            return self._claim(courier_id, count, now, zone)
+        finally:
+            self.couriers.update_one(
+                {'_id': courier_id, 'claimingUntil': locked_until},
+                {'$unset': {'claimingUntil': ''}}
+            )
+
+    def _lock(self, courier_id, now):
+        """Take the driver's claim lock; returns its expiry, or None if it is held"""
+        until = now + CLAIM_LOCK_TTL
+        try:
+            # Matches a free or expired lock; otherwise the upsert collides on _id
+            self.couriers.update_one(
+                {'_id': courier_id, '$or': [{'claimingUntil': None}, {'claimingUntil': {'$lte': now}}]},
+                {'$set': {'claimingUntil': until}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return None
+        return until
+
+    def _claim(self, courier_id, count, now, zone):
+        count = min(count, self.max_active - self.active_count(courier_id))
+        claimed = []
+        batch_zone = zone
+        while len(claimed) < count:
+            order = self.orders.find_one_and_update(
+                self._claimable(now, batch_zone),
+                {'$set': {'courierId': courier_id, 'claimedAt': now, 'leaseExpiresAt': now + self.lease}},
+                sort=self._route_order(batch_zone),
+                projection=DELIVERY_PROJECTION,
+                return_document=ReturnDocument.AFTER
+            )
+            if not order:
+                if batch_zone and not zone:
+                    batch_zone = None
+                    continue
+                break
+            if not batch_zone and not zone and not claimed:
+                batch_zone = order.get('zone')
+            claimed.append(order)
+        return claimed
+
+    def available(self, zone, limit=CLAIM_BATCH, now=None):
+        """Free orders in a zone, in route order, without claiming them"""
+        now = now or datetime.datetime.utcnow()
+        return list(
+            self.orders.find(self._claimable(now, zone), DELIVERY_PROJECTION)
+            .sort(self._route_order(zone))
+            .limit(limit)
+        )
+
+    def mine(self, courier_id, now=None):
+        """The driver's undelivered orders in route order; renews their leases"""
+        now = now or datetime.datetime.utcnow()
+        held = self._held_by(courier_id)
+        # Orders another driver has taken over no longer match courierId
+        self.orders.update_many(held, {'$set': {'leaseExpiresAt': now + self.lease}})
+        return list(
+            self.orders.find(held, DELIVERY_PROJECTION)
+            .sort([('zone', ASCENDING)] + self._route_order(zone=True))
+        )
+
+    def history(self, courier_id, limit=HISTORY_LIMIT):
+        return list(
+            self.orders.find({'deliveredBy': {'$in': [courier_id, LEGACY_COURIER]}}, DELIVERY_PROJECTION)
+            .sort('delivered_at', DESCENDING)
+            .limit(limit)
+        )
+
+    def release(self, order_id, courier_id):
+        """Hand an undelivered order back to the pool; False if the driver does not hold it"""
+        result = self.orders.update_one(
+            {'_id': order_id, **self._held_by(courier_id)},
+            {'$unset': {field: '' for field in CLAIM_FIELDS}}
+        )
+        return result.modified_count == 1
+
+    def deliver(self, order_id, courier_id, now=None, any_courier=False):
+        """
+        Mark an order delivered in one write. Unless any_courier is set the
+        driver must still hold it. Returns the order's userId, zone and
+        deliveryStatus as they were before delivery, or None.
+        """
+        now = now or datetime.datetime.utcnow()
+        query = {'_id': order_id, 'deliveryStatus': {'$in': DELIVERABLE_STATUSES}}
+        if not any_courier:
+            query['courierId'] = courier_id
+        return self.orders.find_one_and_update(
+            query,
+            {
+                '$set': {'deliveryStatus': 'Delivered', 'delivered_at': now, 'deliveredBy': courier_id},
+                '$unset': {'leaseExpiresAt': ''},
+            },
+            projection={'userId': 1, 'zone': 1, 'deliveryStatus': 1},
+            return_document=ReturnDocument.BEFORE
+        )
+
+    def set_status(self, order_id, status, user_id, now=None):
+        """
+        Set an order's delivery status on behalf of the store. Returns its
+        userId, zone and deliveryStatus as they were before, or None.
+        """
+        now = now or datetime.datetime.utcnow()
+        update = {'$set': {'deliveryStatus': status}}
+        if status not in DELIVERABLE_STATUSES:
+            # A driver can no longer deliver it, so the claim goes
+            update['$unset'] = {field: '' for field in CLAIM_FIELDS}
+        if status == 'Delivered':
+            update['$set']['delivered_at'] = now
+        previous = self.orders.find_one_and_update(
+            {'_id': order_id},
+            update,
+            projection={'userId': 1, 'zone': 1, 'deliveryStatus': 1, 'courierId': 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if previous and status == 'Delivered' and previous.get('deliveryStatus') != 'Delivered':
+            self.orders.update_one(
+                {'_id': order_id, 'deliveryStatus': 'Delivered'},
+                {'$set': {'deliveredBy': previous.get('courierId') or user_id}}
+            )
+        return previous
+
+    def backfill_legacy(self):
+        """Mark delivered orders with no driver on record as LEGACY_COURIER's; returns how many"""
+        return self.orders.update_many(
+            {'deliveryStatus': 'Delivered', 'deliveredBy': {'$exists': False}},
+            {'$set': {'deliveredBy': LEGACY_COURIER}}
+        ).modified_count
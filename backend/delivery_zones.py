@@ -0,0 +1,112 @@
+"""
+Pincode delivery zones.
+
+Every order is tagged with the 6-digit PIN code found in its address and a
+zone, the code's first three digits (the postal sorting district). Orders
+in one zone are close together, and sorting them by PIN code gives a rough
+route through it. Orders without a recognisable PIN code get zone None.
+
+ZoneSummary keeps one document per zone in the delivery_zones collection,
+with order counts per delivery status:
+
+    {'_id': '686', 'counts': {'Pending': 3, 'Confirmed': 5, 'Shipped': 1, ...}}
+
+The counts are moved with $inc as each order is created or changes status,
+so the delivery dashboard never has to count orders. rebuild() tags older
+orders and recomputes every count (see backfill_zones.py).
+"""
+
+import datetime
+import re
+
+from pymongo import UpdateOne
+
+from delivery_queue import DELIVERABLE_STATUSES
+from exports import batched
+
+# Summary _id for orders whose address has no PIN code
+UNZONED = 'unzoned'
+ZONE_PREFIX_LENGTH = 3
+ADDRESS_PINCODE_FIELDS = ('pincode', 'pinCode', 'zipCode', 'zip', 'postalCode')
+# Indian PIN codes never start with 0 and are sometimes written '686 001'
+PINCODE_PATTERN = re.compile(r'(?<!\d)([1-9]\d{2})\s?(\d{3})(?!\d)')
+TAG_BATCH_SIZE = 500
+
+
+def address_pincode(address):
+    """The PIN code in an address string or dict, or None"""
+    if isinstance(address, dict):
+        for field in ADDRESS_PINCODE_FIELDS:
+            if address.get(field):
+                return address_pincode(str(address[field]))
+        address = ', '.join(str(value) for value in address.values() if isinstance(value, (str, int)))
+    if not isinstance(address, str):
+        return None
+    # The PIN code comes last in an address; earlier digits may be a house number
+    matches = PINCODE_PATTERN.findall(address)
+    return ''.join(matches[-1]) if matches else None
+
+
+def zone_fields(address):
+    """The pincode and zone fields stored on an order"""
+    pincode = address_pincode(address)
+    return {'pincode': pincode, 'zone': pincode[:ZONE_PREFIX_LENGTH] if pincode else None}
+
+
+class ZoneSummary:
+    def __init__(self, zones, orders):
+        self.zones = zones
+        self.orders = orders
+
+    def move(self, zone, old_status=None, new_status=None):
+        """Count an order leaving old_status and entering new_status; either may be None"""
+        if old_status == new_status:
+            return
+        inc = {}
+        if old_status:
+            inc[f'counts.{old_status}'] = -1
+        if new_status:
+            inc[f'counts.{new_status}'] = 1
+        self.zones.update_one(
+            {'_id': zone or UNZONED},
+            {'$inc': inc, '$set': {'updated_at': datetime.datetime.utcnow()}},
+            upsert=True
+        )
+
+    def summary(self):
+        """Zones with their status counts and open (deliverable) orders, busiest first"""
+        zones = []
+        for doc in self.zones.find():
+            counts = {status: count for status, count in doc.get('counts', {}).items() if count}
+            zones.append({
+                'zone': doc['_id'],
+                'counts': counts,
+                'open': sum(counts.get(status, 0) for status in DELIVERABLE_STATUSES),
+                'updatedAt': doc.get('updated_at'),
+            })
+        zones.sort(key=lambda zone: (-zone['open'], zone['zone']))
+        return zones
+
+    def rebuild(self):
+        """Tag orders that predate zones and recompute every count; returns orders tagged"""
+        tagged = 0
+        untagged = self.orders.find({'zone': {'$exists': False}}, {'address': 1, 'shippingAddress': 1})
+        for batch in batched(untagged, TAG_BATCH_SIZE):
+            self.orders.bulk_write([
+                UpdateOne({'_id': o['_id']}, {'$set': zone_fields(o.get('address', o.get('shippingAddress')))})
+                for o in batch
+            ], ordered=False)
+            tagged += len(batch)
+
+        self.zones.delete_many({})
+        self.orders.aggregate([
+            {'$match': {'deliveryStatus': {'$type': 'string'}}},
+            {'$group': {'_id': {'zone': '$zone', 'status': '$deliveryStatus'}, 'count': {'$sum': 1}}},
+            {'$group': {
+                '_id': {'$ifNull': ['$_id.zone', UNZONED]},
+                'counts': {'$push': {'k': '$_id.status', 'v': '$count'}},
+            }},
+            {'$project': {'counts': {'$arrayToObject': '$counts'}, 'updated_at': '$$NOW'}},
+            {'$merge': {'into': self.zones.name, 'whenMatched': 'replace'}},
+        ])
+        return tagged
@@ -0,0 +1,90 @@
+"""
+Streaming exports.
+
+Rows are read from Mongo cursors in batches of EXPORT_BATCH_SIZE and encoded
+as they arrive, as CSV or newline-delimited JSON, then handed to the
+response in chunks of about CHUNK_SIZE bytes. Nothing holds the whole
+export, so worker memory stays flat however many rows are written and the
+client starts receiving data straight away.
+"""
+
+import csv
+import datetime
+import io
+import json
+from itertools import islice
+
+from json_provider import bson_default
+
+EXPORT_BATCH_SIZE = 500
+CHUNK_SIZE = 64 * 1024
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+# Spreadsheet apps evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def batched(iterable, size=EXPORT_BATCH_SIZE):
+    """Yield lists of up to size items, e.g. to enrich a cursor batch by batch"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def csv_value(value):
+    """Render a value for a CSV cell"""
+    if value is None:
+        return ''
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=bson_default, separators=(',', ':'))
+    if not isinstance(value, (str, int, float, bool)):
+        value = bson_default(value)
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_chunks(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([csv_value(row.get(column)) for column in columns])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(rows, encode=None):
+    encode = encode or (lambda row: json.dumps(row, default=bson_default, separators=(',', ':')).encode('utf-8'))
+    chunk = bytearray()
+    for row in rows:
+        chunk += encode(row)
+        chunk += b'\n'
+        if len(chunk) >= CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+    if chunk:
+        yield bytes(chunk)
+
+
+def export_chunks(rows, columns, fmt, encode=None):
+    """Encode rows (dicts) as fmt; CSV keeps only columns, NDJSON writes rows whole"""
+    if fmt == 'csv':
+        return csv_chunks(rows, columns)
+    if fmt == 'ndjson':
+        return ndjson_chunks(rows, encode)
+    raise ValueError(f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+
+def export_filename(name, fmt, now=None):
+    stamp = (now or datetime.datetime.utcnow()).strftime('%Y%m%d-%H%M%S')
+    return f'{name}-{stamp}.{fmt}'
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Deduplicate and garbage-collect uploads.
+
+Reference counts in upload_blobs are rebuilt from every collection listed in
+upload_blobs.REFERENCE_FIELDS. Blobs that are still unreferenced once the
+grace period has passed lose their local file, their image variants and
+their Cloudinary copy.
+
+With --adopt, files stored before uploads were content-addressed (timestamp
+names) are hashed first: duplicates collapse onto one <hash>.<ext> file and
+every document pointing at an old name is rewritten to the hashed one.
+Files that the source tree itself names (seed data, static pages) are left
+where they are, and they count as referenced.
+
+Usage:
+    python gc_uploads.py                  # recount and delete unreferenced uploads
+    python gc_uploads.py --adopt          # also fold legacy files into the hashed store
+    python gc_uploads.py --dry-run        # only report what would change
+    python gc_uploads.py --grace-hours 72 # keep unreferenced uploads for longer
+"""
+
+import argparse
+import datetime
+import hashlib
+import os
+import re
+from collections import Counter
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from cache import NamespacedCache, redis_from_env
+from upload_blobs import GC_GRACE, REFERENCE_FIELDS, UploadBlobIndex, reference_projection, referenced_urls
+from upload_storage import CHUNK_SIZE, hashed_name, is_content_hashed
+
+try:
+    import cloudinary
+    import cloudinary.api
+    CLOUDINARY_AVAILABLE = True
+except ImportError:
+    CLOUDINARY_AVAILABLE = False
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+DB_NAME = "greencart"
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+UPLOADS_PREFIX = '/uploads/'
+BATCH_SIZE = 500
+# Source that may hard-code upload paths, e.g. seed.py and frontend/public pages
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_ROOTS = [
+    os.path.dirname(os.path.abspath(__file__)),
+    os.path.join(REPO_ROOT, 'frontend', 'src'),
+    os.path.join(REPO_ROOT, 'frontend', 'public'),
+]
+SOURCE_EXTENSIONS = ('.py', '.js', '.jsx', '.ts', '.tsx', '.json', '.html', '.css')
+SKIPPED_DIRS = {'uploads', 'node_modules', '__pycache__', '.git', 'build'}
+HARDCODED_UPLOAD = re.compile(r'/uploads/([\w.-]+\.\w+)')
+
+# Cache namespaces to bump when documents in a collection are rewritten
+COLLECTION_NAMESPACES = {
+    'products': 'products',
+    'categories': 'categories',
+    'remedies': 'remedies',
+    'remedy_categories': 'remedy_categories',
+    'blog_posts': 'blog_posts',
+    'events': 'events',
+    'reviews': 'reviews',
+}
+
+
+def configure_cloudinary():
+    """Configure Cloudinary from the environment; returns False when it cannot be used"""
+    if not CLOUDINARY_AVAILABLE:
+        return False
+    credentials = {key: os.getenv(env, '').strip() for key, env in (
+        ('cloud_name', 'CLOUD_NAME'), ('api_key', 'CLOUD_API_KEY'), ('api_secret', 'CLOUD_API_SECRET'))}
+    if not all(credentials.values()):
+        return False
+    cloudinary.config(**credentials)
+    return True
+
+
+def hardcoded_upload_urls(roots=SOURCE_ROOTS):
+    """Upload URLs written literally in source files under roots"""
+    urls = set()
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d not in SKIPPED_DIRS]
+            for filename in filenames:
+                if not filename.endswith(SOURCE_EXTENSIONS):
+                    continue
+                with open(os.path.join(dirpath, filename), encoding='utf-8', errors='ignore') as f:
+                    urls.update(UPLOADS_PREFIX + name for name in HARDCODED_UPLOAD.findall(f.read()))
+    return urls
+
+
+def count_references(db, pinned=()):
+    """{url: number of documents referring to it} across REFERENCE_FIELDS, plus one per pinned URL"""
+    counts = Counter(pinned)
+    for name in REFERENCE_FIELDS:
+        for doc in db[name].find({}, reference_projection(name)).batch_size(BATCH_SIZE):
+            counts.update(referenced_urls(doc, name))
+    return counts
+
+
+def _replace_url(value, old_url, new_url):
+    if isinstance(value, list):
+        return [_replace_url(v, old_url, new_url) for v in value]
+    if isinstance(value, dict):
+        return {k: _replace_url(v, old_url, new_url) for k, v in value.items()}
+    return new_url if value == old_url else value
+
+
+def rewrite_references(db, old_url, new_url):
+    """Point every document referring to old_url at new_url; returns the collections changed"""
+    changed = set()
+    for name, fields in REFERENCE_FIELDS.items():
+        projection = reference_projection(name)
+        for doc in db[name].find({'$or': [{field: old_url} for field in fields]}, projection):
+            update = {field: _replace_url(doc[field], old_url, new_url) for field in projection if field in doc}
+            db[name].update_one({'_id': doc['_id']}, {'$set': update})
+            changed.add(name)
+    return changed
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def adopt_legacy_files(db, blobs, upload_dir, dry_run=False, pinned=()):
+    """
+    Fold timestamp-named uploads into the hashed store, except the pinned
+    URLs that source code refers to; returns (adopted, duplicates, collections changed)
+    """
+    adopted = duplicates = 0
+    changed = set()
+    for name in sorted(os.listdir(upload_dir)):
+        path = os.path.join(upload_dir, name)
+        if name.startswith('.') or not os.path.isfile(path) or is_content_hashed(name):
+            continue
+        if UPLOADS_PREFIX + name in pinned:
+            print(f"  Keeping {name}: referenced outside the database")
+            continue
+        ext = os.path.splitext(name)[1].lower()
+        sha256 = file_sha256(path)
+        target = hashed_name(sha256, ext)
+        duplicate = os.path.exists(os.path.join(upload_dir, target))
+        print(f"{'Would fold' if dry_run else '✓ Folding'} {name} -> {target}{' (duplicate)' if duplicate else ''}")
+        adopted += 1
+        duplicates += duplicate
+        if dry_run:
+            continue
+        if duplicate:
+            os.remove(path)
+        else:
+            os.replace(path, os.path.join(upload_dir, target))
+        new_url = UPLOADS_PREFIX + target
+        blobs.register(sha256, new_url, size=os.path.getsize(os.path.join(upload_dir, target)), ext=ext)
+        changed |= rewrite_references(db, UPLOADS_PREFIX + name, new_url)
+    return adopted, duplicates, changed
+
+
+def blob_files(db, blob, upload_dir):
+    """Local paths belonging to a blob: the original and its derived variants"""
+    local_url = blob.get('local_url')
+    if not local_url:
+        return []
+    urls = [local_url]
+    manifest = db.image_variants.find_one({'url': local_url}, {'variants': 1})
+    if manifest:
+        urls += [variant['url'] for variant in manifest.get('variants', [])]
+    return [os.path.join(upload_dir, url[len(UPLOADS_PREFIX):]) for url in urls]
+
+
+def collect_garbage(db, blobs, upload_dir, dry_run=False, grace=GC_GRACE, remote=False, pinned=()):
+    """Recount references and delete unreferenced blobs; returns how many were removed"""
+    counts = count_references(db, pinned)
+    if dry_run:
+        cutoff = datetime.datetime.utcnow() - grace
+        candidates = [
+            blob for blob in db.upload_blobs.find({'last_uploaded_at': {'$lt': cutoff}})
+            if sum(counts.get(url, 0) for url in blob.get('urls', [])) == 0
+        ]
+    else:
+        recounted = blobs.recount(counts)
+        print(f"✓ Recounted references ({recounted} blob(s) corrected)")
+        candidates = list(blobs.unreferenced(grace))
+
+    removed = 0
+    for blob in candidates:
+        print(f"{'Would delete' if dry_run else '✓ Deleting'} {blob.get('remote_url') or blob.get('local_url') or blob['_id']}")
+        if dry_run:
+            removed += 1
+            continue
+        # A document saved since the recount has raised the count again
+        if not db.upload_blobs.find_one_and_delete({'_id': blob['_id'], 'refcount': {'$lte': 0}}):
+            continue
+        for path in blob_files(db, blob, upload_dir):
+            if os.path.exists(path):
+                os.remove(path)
+        if blob.get('local_url'):
+            db.image_variants.delete_one({'url': blob['local_url']})
+        if remote and blob.get('public_id') and (blob.get('remote_url') or '').startswith('http'):
+            try:
+                cloudinary.api.delete_resources([blob['public_id']], resource_type=blob.get('resource_type', 'image'))
+            except Exception as e:
+                print(f"  Could not delete Cloudinary copy {blob['public_id']}: {e}")
+        removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dry-run', action='store_true', help='only report what would change')
+    parser.add_argument('--adopt', action='store_true', help='fold legacy timestamp-named files into the hashed store')
+    parser.add_argument('--grace-hours', type=float, default=GC_GRACE.total_seconds() / 3600,
+                        help='keep unreferenced uploads at least this long')
+    args = parser.parse_args()
+
+    client = MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+    blobs = UploadBlobIndex(db.upload_blobs)
+    pinned = hardcoded_upload_urls()
+
+    if args.adopt and os.path.isdir(UPLOAD_DIR):
+        adopted, duplicates, changed = adopt_legacy_files(db, blobs, UPLOAD_DIR, dry_run=args.dry_run, pinned=pinned)
+        print(f"\n{adopted} legacy file(s) {'to fold' if args.dry_run else 'folded'}, {duplicates} of them duplicates")
+        namespaces = [COLLECTION_NAMESPACES[name] for name in changed if name in COLLECTION_NAMESPACES]
+        if namespaces:
+            cache = NamespacedCache(redis_from_env())
+            for namespace in namespaces:
+                cache.bump(namespace)
+            print(f"✓ Cache invalidated: {', '.join(sorted(namespaces))}")
+
+    removed = collect_garbage(
+        db, blobs, UPLOAD_DIR,
+        dry_run=args.dry_run,
+        grace=datetime.timedelta(hours=args.grace_hours),
+        remote=configure_cloudinary(),
+        pinned=pinned,
+    )
+    print(f"\n{removed} unreferenced upload(s) {'would be' if args.dry_run else 'were'} deleted")
+    client.close()
@@ -0,0 +1,157 @@
+"""
+Idempotency keys for requests that must not run twice.
+
+A client sends the same Idempotency-Key with every retry of one logical
+request. The first request claims the key with a short-lived "pending"
+marker; when it succeeds its response is stored under the key, and every
+retry gets that response back without running the handler again. A retry
+that arrives while the first is still running gets KeyInUse, and reusing a
+key for a different request body gets KeyReused.
+
+Keys live in Redis (SET NX) when it is available and fall back to a Mongo
+collection with a unique _id and a TTL index on expires_at.
+"""
+
+import datetime
+import hashlib
+import json
+
+from pymongo.errors import DuplicateKeyError
+
+KEY_TTL = datetime.timedelta(hours=24)
+# A pending marker outliving this is from a request that died; the key can be claimed again
+LOCK_TTL = datetime.timedelta(seconds=60)
+MAX_KEY_LENGTH = 255
+REDIS_PREFIX = 'idempotency:'
+
+
+class IdempotencyConflict(Exception):
+    """The key cannot be used for this request; status is the HTTP status to answer with"""
+    status = 409
+
+
+class KeyInUse(IdempotencyConflict):
+    def __init__(self):
+        super().__init__('A request with this Idempotency-Key is still being processed. Retry shortly.')
+
+
+class KeyReused(IdempotencyConflict):
+    status = 422
+
+    def __init__(self):
+        super().__init__('This Idempotency-Key was already used for a different request.')
+
+
+def request_fingerprint(method, path, body):
+    """Hash of what a request asks for; JSON bodies are compared by content, not formatting"""
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(',', ':')).encode('utf-8')
+    except (TypeError, ValueError):
+        body = body or b''
+    digest = hashlib.sha256(f'{method} {path}\n'.encode('utf-8'))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class IdempotencyLedger:
+    def __init__(self, redis_client=None, collection=None, ttl=KEY_TTL, lock_ttl=LOCK_TTL):
+        self.redis = redis_client
+        self.collection = collection
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+
+    @staticmethod
+    def _replay(record, fingerprint):
+        if record.get('fingerprint') != fingerprint:
+            raise KeyReused()
+        if record.get('state') != 'done':
+            raise KeyInUse()
+        return record['response']
+
+    def begin(self, key, fingerprint):
+        """
+        Claim key for a request. Returns None when the caller should run it, or
+        the stored response of an earlier identical request.
+        """
+        if self.redis is not None:
+            try:
+                return self._begin_redis(key, fingerprint)
+            except IdempotencyConflict:
+                raise
+            except Exception as e:
+                print(f"Idempotency Redis error, falling back to MongoDB: {e}")
+        return self._begin_mongo(key, fingerprint)
+
+    def finish(self, key, fingerprint, status, body, mimetype):
+        """Store a completed response so retries replay it"""
+        record = {
+            'state': 'done',
+            'fingerprint': fingerprint,
+            'response': {'status': status, 'body': body, 'mimetype': mimetype},
+        }
+        if self.redis is not None:
+            try:
+                self.redis.set(REDIS_PREFIX + key, json.dumps(record), ex=int(self.ttl.total_seconds()))
+                return
+            except Exception as e:
+                print(f"Idempotency Redis error, falling back to MongoDB: {e}")
+        if self.collection is not None:
+            self.collection.replace_one(
+                {'_id': key},
+                {**record, 'expires_at': datetime.datetime.utcnow() + self.ttl},
+                upsert=True
+            )
+
+    def abandon(self, key):
+        """Drop a pending claim so the request can be retried, e.g. after an error"""
+        if self.redis is not None:
+            try:
+                self.redis.delete(REDIS_PREFIX + key)
+            except Exception as e:
+                print(f"Idempotency Redis error: {e}")
+        if self.collection is not None:
+            self.collection.delete_one({'_id': key, 'state': 'pending'})
+
+    def _begin_redis(self, key, fingerprint):
+        name = REDIS_PREFIX + key
+        marker = json.dumps({'state': 'pending', 'fingerprint': fingerprint})
+        for _ in range(3):
+            if self.redis.set(name, marker, nx=True, px=int(self.lock_ttl.total_seconds() * 1000)):
+                return None
+            raw = self.redis.get(name)
+            if raw is not None:
+                return self._replay(json.loads(raw), fingerprint)
+            # The marker expired between SET and GET; try to claim it again
+        raise KeyInUse()
+
+    def _begin_mongo(self, key, fingerprint):
+        if self.collection is None:
+            return None
+        for _ in range(3):
+            now = datetime.datetime.utcnow()
+            try:
+                self.collection.insert_one({
+                    '_id': key,
+                    'state': 'pending',
+                    'fingerprint': fingerprint,
+                    'locked_until': now + self.lock_ttl,
+                    'expires_at': now + self.ttl,
+                })
+                return None
+            except DuplicateKeyError:
+                pass
+            # Take over the claim of an identical request that died mid-way
+            if self.collection.find_one_and_update(
+                {'_id': key, 'state': 'pending', 'fingerprint': fingerprint, 'locked_until': {'$lt': now}},
+                {'$set': {'locked_until': now + self.lock_ttl}}
+            ):
+                return None
+            record = self.collection.find_one({'_id': key})
+            if record is None:
+                continue
+            if record['expires_at'] < now:
+                # Expired, but the TTL monitor has not removed it yet
+                self.collection.delete_one({'_id': key, 'expires_at': record['expires_at']})
+                continue
+            return self._replay(record, fingerprint)
+        raise KeyInUse()
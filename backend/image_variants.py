@@ -0,0 +1,174 @@
+"""
+Responsive image derivatives for uploaded images.
+
+Local uploads are resized in a background thread pool into fixed-width WebP
+(and AVIF, when the installed Pillow can write it) variants stored next to
+the original. Each upload gets a manifest in the `image_variants` collection.
+When the variants are ready they are copied onto the products, blog posts
+and categories that use the image, so list endpoints can return srcset
+options without extra lookups.
+
+Cloudinary URLs need no processing: their variants are delivery
+transformations built into the URL.
+
+Pillow is optional; without it uploads are stored as before and no variants
+are produced.
+"""
+
+import datetime
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    print("Warning: Pillow not available, responsive image variants are disabled")
+    PIL_AVAILABLE = False
+
+if PIL_AVAILABLE:
+    try:
+        import pillow_avif  # noqa: F401  registers the AVIF plugin on older Pillow
+    except ImportError:
+        pass
+    Image.init()
+    AVIF_AVAILABLE = '.avif' in Image.registered_extensions()
+else:
+    AVIF_AVAILABLE = False
+
+VARIANT_WIDTHS = (160, 320, 640, 1280)
+VARIANT_QUALITY = {'webp': 80, 'avif': 55}
+# Formats Pillow cannot resize meaningfully (vector, animated, or unreadable)
+SKIPPED_EXTENSIONS = {'.svg', '.gif', '.heic', '.heif'}
+UPLOADS_PREFIX = '/uploads/'
+
+
+def variant_formats():
+    return ('avif', 'webp') if AVIF_AVAILABLE else ('webp',)
+
+
+def target_widths(original_width):
+    """Widths to generate: every preset below the original, plus the original capped at the largest preset"""
+    widths = [w for w in VARIANT_WIDTHS if w < original_width]
+    widths.append(min(original_width, VARIANT_WIDTHS[-1]))
+    return sorted(set(widths))
+
+
+def variant_name(filename, width, fmt):
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}.w{width}.{fmt}"
+
+
+def derive_variants(upload_dir, filename):
+    """
+    Write resized variants of upload_dir/filename and return a manifest
+    {'width', 'height', 'variants': [{'url', 'width', 'format'}]}, or None
+    when the file type is not resizable.
+    """
+    if os.path.splitext(filename)[1].lower() in SKIPPED_EXTENSIONS:
+        return None
+    with Image.open(os.path.join(upload_dir, filename)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+        width, height = image.size
+
+        variants = []
+        for target in target_widths(width):
+            resized = image if target == width else image.resize(
+                (target, max(1, round(height * target / width))), Image.LANCZOS
+            )
+            for fmt in variant_formats():
+                name = variant_name(filename, target, fmt)
+                resized.save(os.path.join(upload_dir, name), fmt.upper(), quality=VARIANT_QUALITY[fmt])
+                variants.append({'url': UPLOADS_PREFIX + name, 'width': target, 'format': fmt})
+    return {'width': width, 'height': height, 'variants': variants}
+
+
+def cloudinary_variants(url):
+    """Variants for a Cloudinary delivery URL, expressed as URL transformations"""
+    if '/image/upload/' not in url:
+        return []
+    head, tail = url.split('/image/upload/', 1)
+    return [
+        {'url': f"{head}/image/upload/w_{width},c_limit,f_{fmt},q_auto/{tail}", 'width': width, 'format': fmt}
+        for width in VARIANT_WIDTHS for fmt in ('avif', 'webp')
+    ]
+
+
+def srcset(variants):
+    """Group variants into srcset strings keyed by format"""
+    grouped = {}
+    for variant in sorted(variants, key=lambda v: v['width']):
+        grouped.setdefault(variant['format'], []).append(f"{variant['url']} {variant['width']}w")
+    return {fmt: ', '.join(entries) for fmt, entries in grouped.items()}
+
+
+def variant_fields(variants):
+    """Fields stored on a document that uses the image"""
+    return {'imageVariants': variants, 'imageSrcset': srcset(variants)}
+
+
+class ImageVariantWorker:
+    """Background pool that derives variants for uploads and records them"""
+
+    def __init__(self, upload_dir, collection, on_ready=None, max_workers=2):
+        self.upload_dir = upload_dir
+        self.collection = collection
+        self.on_ready = on_ready
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='image-variants')
+
+    def enqueue(self, url):
+        """Queue derivative generation for a local upload URL; returns the job future or None"""
+        if not PIL_AVAILABLE or not url or not url.startswith(UPLOADS_PREFIX):
+            return None
+        filename = url[len(UPLOADS_PREFIX):]
+        try:
+            if self.collection.find_one({'url': url, 'status': 'ready'}, {'_id': 1}):
+                # Content-hashed uploads repeat for identical files
+                return None
+            self.collection.update_one(
+                {'url': url},
+                {'$set': {'status': 'pending', 'updated_at': datetime.datetime.utcnow()}},
+                upsert=True
+            )
+        except Exception as e:
+            # The upload itself succeeded; it just goes without variants
+            print(f"Could not queue image variants for {url}: {e}")
+            return None
+        return self._executor.submit(self._run, url, filename)
+
+    def _run(self, url, filename):
+        try:
+            manifest = derive_variants(self.upload_dir, filename)
+        except Exception as e:
+            print(f"Image variant generation failed for {url}: {e}")
+            self.collection.update_one({'url': url}, {'$set': {
+                'status': 'failed', 'error': str(e), 'updated_at': datetime.datetime.utcnow(),
+            }})
+            return None
+
+        if manifest is None:
+            self.collection.update_one({'url': url}, {'$set': {
+                'status': 'skipped', 'updated_at': datetime.datetime.utcnow(),
+            }})
+            return None
+
+        self.collection.update_one({'url': url}, {'$set': {
+            **manifest, 'status': 'ready', 'updated_at': datetime.datetime.utcnow(),
+        }})
+        if self.on_ready:
+            self.on_ready(url, manifest['variants'])
+        return manifest
+
+    def lookup(self, url):
+        """Return variant fields for url if they are known, else {}"""
+        if not url:
+            return {}
+        if 'res.cloudinary.com' in url:
+            variants = cloudinary_variants(url)
+            return variant_fields(variants) if variants else {}
+        if not url.startswith(UPLOADS_PREFIX):
+            return {}
+        manifest = self.collection.find_one({'url': url, 'status': 'ready'}, {'variants': 1})
+        return variant_fields(manifest['variants']) if manifest else {}
@@ -7,6 +7,8 @@ This script adds stock information to products that don't have it.
 from pymongo import MongoClient
 import random
 
+from cache import NamespacedCache, redis_from_env
+
 # MongoDB Configuration
 MONGO_URI = "mongodb://localhost:27017/"
 DB_NAME = "greencart"
@@ -42,6 +44,10 @@ def init_stock_data():
         
         print(f"\nStock initialization complete!")
         print(f"Updated {updated_count} products with stock data")
+        if updated_count:
+            redis_client = redis_from_env()
+            if redis_client:
+                NamespacedCache(redis_client).invalidate('products', 'product_search')
         
         # Show summary
         total_products = products_collection.count_documents({})
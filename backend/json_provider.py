@@ -0,0 +1,68 @@
+"""
+JSON provider that understands Mongo documents.
+
+ObjectId is written as its hex string, datetime/date as ISO 8601 (the same
+format the handlers used to produce by hand with .isoformat()) and
+Decimal128 as a number, so cursor results can be passed to jsonify as they
+are. Encoding goes through `orjson` (in requirements.txt); the standard
+library encoder is the fallback when it is missing from a local
+environment.
+"""
+
+import datetime
+
+from bson import Decimal128, ObjectId
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+
+def bson_default(o):
+    """Convert BSON and date types that JSON has no native form for"""
+    if isinstance(o, ObjectId):
+        return str(o)
+    if isinstance(o, (datetime.datetime, datetime.date)):
+        return o.isoformat()
+    if isinstance(o, Decimal128):
+        return float(o.to_decimal())
+    return DefaultJSONProvider.default(o)
+
+
+class MongoJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider with BSON support and an orjson fast path"""
+
+    default = staticmethod(bson_default)
+
+    def _orjson_options(self):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps_bytes(self, obj):
+        """Encode obj to compact UTF-8 JSON bytes"""
+        if ORJSON_AVAILABLE:
+            try:
+                return orjson.dumps(obj, default=bson_default, option=self._orjson_options())
+            except TypeError:
+                # e.g. integers beyond 64 bits; the stdlib encoder copes
+                pass
+        return super().dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if ORJSON_AVAILABLE and not kwargs:
+            try:
+                return orjson.dumps(obj, default=bson_default, option=self._orjson_options()).decode('utf-8')
+            except TypeError:
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        if ORJSON_AVAILABLE:
+            return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+        return super().response(*args, **kwargs)
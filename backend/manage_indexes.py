@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Apply the GreenCart index registry and report query plans.
+
+Usage:
+    python manage_indexes.py            # create/verify every registered index
+    python manage_indexes.py report     # flag query shapes that still COLLSCAN
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from db_indexes import ensure_indexes, explain_query_shapes
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+DB_NAME = "greencart"
+
+def apply_indexes(db):
+    """Create every registered index and print the outcome"""
+    failures = 0
+    for collection_name, index_name, status in ensure_indexes(db):
+        failed = status.startswith('failed')
+        marker = "✗" if failed else "✓"
+        if failed:
+            failures += 1
+        print(f"{marker} {collection_name}.{index_name}: {status}")
+    print(f"\nIndexes applied with {failures} failure(s)")
+    return failures == 0
+
+def report_query_plans(db):
+    """Explain each known query shape and flag collection scans"""
+    flagged = 0
+    for label, collection_name, stages, is_flagged in explain_query_shapes(db):
+        marker = "✗ COLLSCAN" if is_flagged else "✓"
+        if is_flagged:
+            flagged += 1
+        print(f"{marker} {label} ({collection_name}): {' <- '.join(stages)}")
+    print(f"\n{flagged} query shape(s) fall back to a collection scan")
+    return flagged == 0
+
+if __name__ == "__main__":
+    client = MongoClient(MONGO_URI)
+    db = client[DB_NAME]
+    command = sys.argv[1] if len(sys.argv) > 1 else 'apply'
+
+    if command == 'report':
+        ok = report_query_plans(db)
+    elif command == 'apply':
+        ok = apply_indexes(db)
+    else:
+        print(__doc__)
+        ok = False
+
+    client.close()
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Rewrite product images into the canonical `image` + `gallery` fields.
+
+Legacy fields (imageUrl, imagePath, image_path, photo, thumbnail, images)
+are folded into `image`/`gallery` and removed, and local paths get their
+/uploads/ prefix, so the API never has to do this per request.
+
+Usage:
+    python migrate_product_images.py            # migrate every product
+    python migrate_product_images.py --dry-run  # only report what would change
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+
+from cache import NamespacedCache, redis_from_env
+from product_images import LEGACY_GALLERY_FIELDS, LEGACY_IMAGE_FIELDS, migration_update, needs_migration
+
+# Load environment variables
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
+MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
+DB_NAME = "greencart"
+BATCH_SIZE = 500
+
+IMAGE_PROJECTION = {field: 1 for field in ('name', 'image', 'gallery') + LEGACY_IMAGE_FIELDS + LEGACY_GALLERY_FIELDS}
+
+def migrate_product_images(db, dry_run=False):
+    """Rewrite products in batches and return how many changed"""
+    pending = []
+    changed = 0
+    for doc in db.products.find({}, IMAGE_PROJECTION).batch_size(BATCH_SIZE):
+        if not needs_migration(doc):
+            continue
+        update = migration_update(doc)
+        changed += 1
+        print(f"{'Would update' if dry_run else '✓ Updating'} {doc.get('name', doc['_id'])}: {update['$set']['image'] or '(no image)'}")
+        if not dry_run:
+            pending.append(UpdateOne({'_id': doc['_id']}, update))
+        if len(pending) >= BATCH_SIZE:
+            db.products.bulk_write(pending, ordered=False)
+            pending = []
+    if pending:
+        db.products.bulk_write(pending, ordered=False)
+    return changed
+
+if __name__ == "__main__":
+    dry_run = '--dry-run' in sys.argv[1:]
+    client = MongoClient(MONGO_URI)
+    changed = migrate_product_images(client[DB_NAME], dry_run=dry_run)
+
+    if changed and not dry_run:
+        NamespacedCache(redis_from_env()).invalidate('products', 'product_search')
+        print("✓ Product cache invalidated")
+    print(f"\n{changed} product(s) {'need' if dry_run else 'were'} migrated")
+    client.close()
@@ -0,0 +1,65 @@
+"""
+Server-side order pricing.
+
+Orders are priced from a snapshot of the products they reference, loaded in
+one query, never from the prices or totals the client sends. The rules match
+the checkout summary shown by the frontend (Checkout.calculateOrderTotal).
+"""
+
+FREE_SHIPPING_MIN = 499
+SHIPPING_FEE = 49
+# Orders strictly above this subtotal get DISCOUNT_RATE off
+DISCOUNT_MIN = 999
+DISCOUNT_RATE = 0.10
+TAX_RATE = 0.08
+
+# Product fields an order needs
+ORDER_PRODUCT_PROJECTION = {'name': 1, 'price': 1, 'stock': 1, 'category': 1, 'image': 1}
+
+
+class OrderProductError(ValueError):
+    """A line refers to a product that is missing or cannot cover its quantity"""
+
+
+def order_items(lines, snapshot):
+    """
+    Build order items from {product_id: quantity} and {product_id: product}.
+    Stock is checked here, in memory, so a cart that cannot be covered is
+    rejected before anything is written.
+    """
+    missing = [pid for pid in lines if pid not in snapshot]
+    if missing:
+        raise OrderProductError(f"Product not found: {', '.join(missing)}")
+    short = [snapshot[pid].get('name', 'Unknown') for pid, qty in lines.items() if snapshot[pid].get('stock', 0) < qty]
+    if short:
+        raise OrderProductError(f"Insufficient stock for {', '.join(short)}. Please update your cart.")
+
+    items = []
+    for pid, qty in lines.items():
+        product = snapshot[pid]
+        price = round(float(product.get('price', 0)), 2)
+        items.append({
+            'id': pid,
+            'name': product.get('name', 'Unknown'),
+            'category': product.get('category', ''),
+            'image': product.get('image', ''),
+            'price': price,
+            'quantity': qty,
+            'lineTotal': round(price * qty, 2),
+        })
+    return items
+
+
+def order_totals(items):
+    """Subtotal, discount, shipping, tax and total for priced items"""
+    subtotal = sum(item['price'] * item['quantity'] for item in items)
+    shipping = 0 if subtotal >= FREE_SHIPPING_MIN else SHIPPING_FEE
+    discount = subtotal * DISCOUNT_RATE if subtotal > DISCOUNT_MIN else 0
+    tax = (subtotal - discount) * TAX_RATE
+    return {
+        'subtotal': round(subtotal, 2),
+        'discount': round(discount, 2),
+        'shipping': shipping,
+        'tax': round(tax, 2),
+        'total': round(subtotal - discount + shipping + tax, 2),
+    }
@@ -0,0 +1,57 @@
+"""
+Canonical product image fields.
+
+Products store one `image` URL and an optional `gallery` list. Both are
+normalized when written, so readers use them as they are. Older documents
+may still carry the legacy field names below until migrate_product_images.py
+has been run.
+"""
+
+LEGACY_IMAGE_FIELDS = ('imageUrl', 'imagePath', 'image_path', 'photo', 'thumbnail')
+LEGACY_GALLERY_FIELDS = ('images',)
+
+
+def normalize_image_url(url):
+    """Return an absolute URL, or a /uploads/ path for locally stored files"""
+    url = (url or '').strip() if isinstance(url, str) else ''
+    if not url or url.startswith(('http://', 'https://', 'data:', '/uploads/')):
+        return url
+    return '/uploads/' + url.lstrip('/')
+
+
+def canonical_images(data):
+    """
+    Build {'image': ..., 'gallery': [...]} from a product payload or document
+    that may use any of the legacy field names.
+    """
+    image = ''
+    for field in ('image',) + LEGACY_IMAGE_FIELDS:
+        image = normalize_image_url(data.get(field))
+        if image:
+            break
+
+    gallery = []
+    for field in ('gallery',) + LEGACY_GALLERY_FIELDS:
+        if isinstance(data.get(field), list):
+            gallery = data[field]
+            break
+    gallery = [url for url in dict.fromkeys(normalize_image_url(u) for u in gallery) if url and url != image]
+
+    return {'image': image, 'gallery': gallery}
+
+
+def needs_migration(doc):
+    """True when a stored product still differs from its canonical image fields"""
+    if any(field in doc for field in LEGACY_IMAGE_FIELDS + LEGACY_GALLERY_FIELDS):
+        return True
+    canonical = canonical_images(doc)
+    return doc.get('image', '') != canonical['image'] or doc.get('gallery', []) != canonical['gallery']
+
+
+def migration_update(doc):
+    """Mongo update document that rewrites doc into the canonical shape"""
+    update = {'$set': canonical_images(doc)}
+    legacy = [field for field in LEGACY_IMAGE_FIELDS + LEGACY_GALLERY_FIELDS if field in doc]
+    if legacy:
+        update['$unset'] = {field: '' for field in legacy}
+    return update
@@ -0,0 +1,227 @@
+"""
+In-process product search for GreenCart.
+
+ProductSearchIndex keeps an inverted index (term -> weighted postings) over
+product name, category, subcategory and description, plus a trigram index
+over the vocabulary. Query terms are expanded to exact, prefix and
+near-miss (typo) vocabulary terms through the trigram index, and documents
+are ranked with field-weighted TF-IDF.
+
+The index is rebuilt when its version falls behind the shared search
+version, and updated one product at a time for writes made in this process.
+age() lets callers also rebuild it on a timer when the version is not shared.
+"""
+
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'category': 2.0,
+    'subcategory': 2.0,
+    'description': 1.0,
+}
+STOPWORDS = {'a', 'an', 'and', 'for', 'in', 'of', 'on', 'the', 'to', 'with'}
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+# Relevance multipliers for how a query term reached an indexed term
+EXACT_MATCH = 1.0
+PREFIX_MATCH = 0.75
+FUZZY_MATCH = 0.55
+
+
+def normalize_term(token):
+    """Fold simple plurals so 'seeds' and 'seed' share a posting list"""
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Split text into normalized search terms"""
+    if not text:
+        return []
+    return [normalize_term(t) for t in TOKEN_RE.findall(str(text).lower()) if t not in STOPWORDS]
+
+
+def trigrams(term):
+    """Padded character trigrams; the leading padding makes prefixes share grams"""
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance, giving up early once it must exceed limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ca != cb),
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def max_typos(term):
+    """Allowed edits for a query term: none for short terms, then one, then two"""
+    if len(term) <= 3:
+        return 0
+    if len(term) <= 6:
+        return 1
+    return 2
+
+
+class ProductSearchIndex:
+    """Inverted + trigram index over the product catalog"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.version = None
+        self.built_at = None
+        self._reset()
+
+    def _reset(self):
+        self._postings = defaultdict(dict)   # term -> {product_id: weight}
+        self._doc_terms = {}                 # product_id -> set(terms)
+        self._doc_meta = {}                  # product_id -> {'category': ...}
+        self._grams = defaultdict(set)       # trigram -> set(terms)
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def age(self):
+        """Seconds since the last full build (infinite before the first)"""
+        if self.built_at is None:
+            return math.inf
+        return time.monotonic() - self.built_at
+
+    def build(self, products, version=None):
+        """Replace the whole index from an iterable of product documents"""
+        with self._lock:
+            self._reset()
+            for product in products:
+                self._add(product)
+            self.version = version
+            self.built_at = time.monotonic()
+
+    def apply(self, product_id, product, previous_version, current_version):
+        """
+        Apply one product write made in this process. product is the new
+        document, or None for a delete. If the index had already fallen
+        behind previous_version it is left stale for the next full rebuild.
+        """
+        with self._lock:
+            if self.version != previous_version:
+                self.version = None
+                return
+            self._remove(str(product_id))
+            if product is not None:
+                self._add(dict(product, _id=product_id))
+            self.version = current_version
+
+    def _add(self, product):
+        product_id = str(product['_id'])
+        weights = defaultdict(float)
+        for field, field_weight in FIELD_WEIGHTS.items():
+            for term in tokenize(product.get(field)):
+                weights[term] += field_weight
+        for term, weight in weights.items():
+            if term not in self._postings:
+                for gram in trigrams(term):
+                    self._grams[gram].add(term)
+            # Saturate repeated mentions so long descriptions do not dominate
+            self._postings[term][product_id] = weight / (1.0 + 0.1 * weight)
+        self._doc_terms[product_id] = set(weights)
+        self._doc_meta[product_id] = {'category': product.get('category')}
+
+    def _remove(self, product_id):
+        terms = self._doc_terms.pop(product_id, None)
+        self._doc_meta.pop(product_id, None)
+        if not terms:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                for gram in trigrams(term):
+                    self._grams[gram].discard(term)
+                    if not self._grams[gram]:
+                        del self._grams[gram]
+
+    def _expand(self, term, fuzzy, prefix):
+        """Return {indexed_term: multiplier} for one query term"""
+        expansions = {}
+        if term in self._postings:
+            expansions[term] = EXACT_MATCH
+        if not (fuzzy or prefix):
+            return expansions
+
+        query_grams = trigrams(term)
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for candidate in self._grams.get(gram, ()):
+                shared[candidate] += 1
+
+        typos = max_typos(term) if fuzzy else 0
+        min_shared = max(1, int(len(query_grams) * 0.4))
+        for candidate, count in shared.items():
+            if candidate == term or count < min_shared:
+                continue
+            if prefix and candidate.startswith(term):
+                expansions[candidate] = max(expansions.get(candidate, 0), PREFIX_MATCH)
+            elif typos:
+                distance = edit_distance(term, candidate, typos)
+                if distance <= typos:
+                    multiplier = FUZZY_MATCH / distance
+                    expansions[candidate] = max(expansions.get(candidate, 0), multiplier)
+        return expansions
+
+    def search(self, query, limit=20, category=None, fuzzy=True, prefix=True, require_all=False):
+        """Return [(product_id, score)] ranked by relevance"""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        with self._lock:
+            total_docs = max(len(self._doc_terms), 1)
+            scores = defaultdict(float)
+            matched = defaultdict(int)
+            for term in dict.fromkeys(terms):
+                term_scores = {}
+                for indexed_term, multiplier in self._expand(term, fuzzy, prefix).items():
+                    postings = self._postings[indexed_term]
+                    idf = math.log(1.0 + total_docs / len(postings))
+                    for product_id, weight in postings.items():
+                        score = multiplier * idf * weight
+                        if score > term_scores.get(product_id, 0):
+                            term_scores[product_id] = score
+                for product_id, score in term_scores.items():
+                    scores[product_id] += score
+                    matched[product_id] += 1
+
+            unique_terms = len(dict.fromkeys(terms))
+            results = []
+            for product_id, score in scores.items():
+                if category and self._doc_meta[product_id].get('category') != category:
+                    continue
+                if require_all and matched[product_id] < unique_terms:
+                    continue
+                # Documents matching every query term rank above partial matches
+                coverage = matched[product_id] / unique_terms
+                results.append((product_id, round(score * coverage * coverage, 4)))
+
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:limit] if limit else results
@@ -0,0 +1,201 @@
+"""
+Incrementally maintained sales rollups.
+
+The sales_rollups collection holds two kinds of documents per UTC day:
+
+- kind 'day', _id 'YYYY-MM-DD': orders, revenue (order totals) and items sold;
+- kind 'product', _id 'YYYY-MM-DD:<productId>': quantity, revenue (line
+  totals) and orders for one product.
+
+An order is added with $inc when it is placed (cash on delivery) or paid
+(verified online payment). The order is flagged `rolledUp` first, so a
+retried verification never counts it twice. Analytics then read a few
+dozen small documents instead of scanning orders.
+
+rebuild() recomputes the rollups from orders with aggregation pipelines
+(see backfill_rollups.py).
+"""
+
+import datetime
+
+from pymongo import ASCENDING, UpdateOne
+
+# Orders that count as sales
+COUNTED_ORDERS = {'$or': [{'paymentStatus': 'Success'}, {'paymentMethod': 'cod'}]}
+ROLLUP_ORDER_PROJECTION = {'items': 1, 'total': 1, 'created_at': 1}
+DAY_FORMAT = '%Y-%m-%d'
+
+
+def rollup_day(moment):
+    return moment.strftime(DAY_FORMAT)
+
+
+def line_product_id(item):
+    return str(item.get('id') or item.get('productId') or item.get('_id') or 'unknown')
+
+
+def line_revenue(item):
+    if 'lineTotal' in item:
+        return float(item['lineTotal'])
+    return float(item.get('price', 0)) * int(item.get('quantity', 1))
+
+
+def rollup_ops(order):
+    """$inc updates adding one order to its day and product rollups"""
+    day = rollup_day(order.get('created_at') or datetime.datetime.utcnow())
+    items = order.get('items', [])
+    ops = [UpdateOne(
+        {'_id': day},
+        {
+            '$inc': {
+                'orders': 1,
+                'revenue': float(order.get('total', 0)),
+                'items': sum(int(item.get('quantity', 1)) for item in items),
+            },
+            '$setOnInsert': {'kind': 'day', 'day': day},
+        },
+        upsert=True
+    )]
+    products = {}
+    for item in items:
+        line = products.setdefault(line_product_id(item), {'quantity': 0, 'revenue': 0.0, 'item': item})
+        line['quantity'] += int(item.get('quantity', 1))
+        line['revenue'] += line_revenue(item)
+    for product_id, line in products.items():
+        ops.append(UpdateOne(
+            {'_id': f'{day}:{product_id}'},
+            {
+                '$inc': {'orders': 1, 'quantity': line['quantity'], 'revenue': line['revenue']},
+                '$set': {'name': line['item'].get('name', 'Unknown'), 'category': line['item'].get('category', '')},
+                '$setOnInsert': {'kind': 'product', 'day': day, 'productId': product_id},
+            },
+            upsert=True
+        ))
+    return ops
+
+
+class SalesRollups:
+    def __init__(self, rollups, orders):
+        self.rollups = rollups
+        self.orders = orders
+
+    def record(self, order_id):
+        """Add a placed or paid order to the rollups once; returns False if it was already counted"""
+        order = self.orders.find_one_and_update(
+            {'_id': order_id, 'rolledUp': {'$ne': True}},
+            {'$set': {'rolledUp': True}},
+            projection=ROLLUP_ORDER_PROJECTION
+        )
+        if not order:
+            return False
+        self.rollups.bulk_write(rollup_ops(order), ordered=False)
+        return True
+
+    def revenue_series(self, start, end):
+        """One {day, orders, revenue, items} entry per day from start to end inclusive, zeros included"""
+        found = {
+            doc['day']: doc
+            for doc in self.rollups.find({'kind': 'day', 'day': {'$gte': rollup_day(start), '$lte': rollup_day(end)}})
+        }
+        series = []
+        day = start
+        while day.date() <= end.date():
+            doc = found.get(rollup_day(day), {})
+            series.append({
+                'day': rollup_day(day),
+                'orders': doc.get('orders', 0),
+                'revenue': round(doc.get('revenue', 0), 2),
+                'items': doc.get('items', 0),
+            })
+            day += datetime.timedelta(days=1)
+        return series
+
+    def top_products(self, start, end, limit=10, by='revenue'):
+        """Best sellers between start and end inclusive, by 'revenue' or 'quantity'"""
+        pipeline = [
+            {'$match': {'kind': 'product', 'day': {'$gte': rollup_day(start), '$lte': rollup_day(end)}}},
+            {'$sort': {'day': ASCENDING}},
+            {'$group': {
+                '_id': '$productId',
+                'name': {'$last': '$name'},
+                'category': {'$last': '$category'},
+                'quantity': {'$sum': '$quantity'},
+                'revenue': {'$sum': '$revenue'},
+                'orders': {'$sum': '$orders'},
+            }},
+            {'$sort': {by: -1, '_id': 1}},
+            {'$limit': limit},
+        ]
+        return [
+            {
+                'productId': doc['_id'],
+                'name': doc.get('name'),
+                'category': doc.get('category'),
+                'quantity': doc['quantity'],
+                'revenue': round(doc['revenue'], 2),
+                'orders': doc['orders'],
+            }
+            for doc in self.rollups.aggregate(pipeline)
+        ]
+
+    def rebuild(self, since=None):
+        """
+        Recompute rollups from orders, for every day or from since's day on.
+        Returns (day documents, product documents) written.
+        """
+        match = COUNTED_ORDERS
+        if since:
+            since = datetime.datetime(since.year, since.month, since.day)
+            match = {'$and': [COUNTED_ORDERS, {'created_at': {'$gte': since}}]}
+        # Orders counted here must not be added again by record()
+        self.orders.update_many({'$and': [match, {'rolledUp': {'$ne': True}}]}, {'$set': {'rolledUp': True}})
+        self.rollups.delete_many({'day': {'$gte': rollup_day(since)}} if since else {})
+
+        day = {'$dateToString': {'format': DAY_FORMAT, 'date': '$created_at'}}
+        merge = {'$merge': {'into': self.rollups.name, 'whenMatched': 'replace'}}
+        self.orders.aggregate([
+            {'$match': match},
+            {'$group': {
+                '_id': day,
+                'orders': {'$sum': 1},
+                'revenue': {'$sum': {'$ifNull': ['$total', 0]}},
+                'items': {'$sum': {'$sum': '$items.quantity'}},
+            }},
+            {'$set': {'kind': 'day', 'day': '$_id'}},
+            merge,
+        ])
+        self.orders.aggregate([
+            {'$match': match},
+            {'$unwind': '$items'},
+            {'$group': {
+                '_id': {
+                    'day': day,
+                    'productId': {'$toString': {'$ifNull': ['$items.id', {'$ifNull': ['$items.productId', '$items._id']}]}},
+                },
+                'name': {'$last': '$items.name'},
+                'category': {'$last': '$items.category'},
+                'quantity': {'$sum': {'$ifNull': ['$items.quantity', 1]}},
+                'revenue': {'$sum': {'$ifNull': [
+                    '$items.lineTotal',
+                    {'$multiply': [{'$ifNull': ['$items.price', 0]}, {'$ifNull': ['$items.quantity', 1]}]},
+                ]}},
+                'orders': {'$sum': 1},
+            }},
+            {'$project': {
+                '_id': {'$concat': ['$_id.day', ':', {'$ifNull': ['$_id.productId', 'unknown']}]},
+                'kind': 'product',
+                'day': '$_id.day',
+                'productId': {'$ifNull': ['$_id.productId', 'unknown']},
+                'name': 1,
+                'category': 1,
+                'quantity': 1,
+                'revenue': 1,
+                'orders': 1,
+            }},
+            merge,
+        ])
+        scope = {'day': {'$gte': rollup_day(since)}} if since else {}
+        return (
+            self.rollups.count_documents({**scope, 'kind': 'day'}),
+            self.rollups.count_documents({**scope, 'kind': 'product'}),
+        )
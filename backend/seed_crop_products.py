@@ -3,6 +3,9 @@ import os
 from dotenv import load_dotenv
 from bson import ObjectId
 
+from cache import NamespacedCache, redis_from_env
+from product_images import LEGACY_IMAGE_FIELDS
+
 load_dotenv()
 
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
@@ -21,7 +24,7 @@ def seed_crop_products():
             "price": 45,
             "stock": 100,
             "description": "High-quality organic tomato seeds. Perfect for home gardening.",
-            "imageUrl": "https://images.unsplash.com/photo-1592841200221-a6898f307baa?auto=format&fit=crop&w=300&q=80",
+            "image": "https://images.unsplash.com/photo-1592841200221-a6898f307baa?auto=format&fit=crop&w=300&q=80",
             "rating": 4.5,
             "reviews": 12
         },
@@ -31,7 +34,7 @@ def seed_crop_products():
             "price": 35,
             "stock": 80,
             "description": "Sweet and crunchy carrot seeds. Easy to grow.",
-            "imageUrl": "https://images.unsplash.com/photo-1445282768818-728615cc8d07?auto=format&fit=crop&w=300&q=80",
+            "image": "https://images.unsplash.com/photo-1445282768818-728615cc8d07?auto=format&fit=crop&w=300&q=80",
             "rating": 4.2,
             "reviews": 8
         },
@@ -41,7 +44,7 @@ def seed_crop_products():
             "price": 30,
             "stock": 150,
             "description": "Fast-growing Okra seeds for a bountiful harvest.",
-            "imageUrl": "https://images.unsplash.com/photo-1550989460-5250499738d8?auto=format&fit=crop&w=300&q=80",  # Placeholder
+            "image": "https://images.unsplash.com/photo-1550989460-5250499738d8?auto=format&fit=crop&w=300&q=80",  # Placeholder
             "rating": 4.0,
             "reviews": 5
         },
@@ -51,7 +54,7 @@ def seed_crop_products():
             "price": 55,
             "stock": 40,
             "description": "Aromatic Italian Basil seeds. Essential for your herb garden.",
-            "imageUrl": "https://images.unsplash.com/photo-1618331835717-801e976710b2?auto=format&fit=crop&w=300&q=80",
+            "image": "https://images.unsplash.com/photo-1618331835717-801e976710b2?auto=format&fit=crop&w=300&q=80",
             "rating": 4.8,
             "reviews": 24
         },
@@ -61,7 +64,7 @@ def seed_crop_products():
             "price": 25,
             "stock": 200,
             "description": "Nutrient-rich spinach seeds. fast growing leafy green.",
-            "imageUrl": "https://images.unsplash.com/photo-1576045057995-568f588f82fb?auto=format&fit=crop&w=300&q=80",
+            "image": "https://images.unsplash.com/photo-1576045057995-568f588f82fb?auto=format&fit=crop&w=300&q=80",
             "rating": 4.3,
             "reviews": 15
         },
@@ -71,7 +74,7 @@ def seed_crop_products():
             "price": 40,
             "stock": 60,
             "description": "Giant sunflower seeds. Bring sunshine to your garden.",
-            "imageUrl": "https://images.unsplash.com/photo-1471193945509-9adadd0974ce?auto=format&fit=crop&w=300&q=80",
+            "image": "https://images.unsplash.com/photo-1471193945509-9adadd0974ce?auto=format&fit=crop&w=300&q=80",
             "rating": 4.7,
             "reviews": 30
         }
@@ -82,7 +85,7 @@ def seed_crop_products():
         # Update if exists, insert if not (Upsert)
         result = products_collection.update_one(
             {"name": prod["name"]},
-            {"$set": prod},
+            {"$set": prod, "$unset": {field: "" for field in LEGACY_IMAGE_FIELDS}},
             upsert=True
         )
         
@@ -97,5 +100,10 @@ def seed_crop_products():
 
     print(f"Seeding complete. Added {count} new products.")
 
+    # Retire cached listings and the servers' search indexes
+    redis_client = redis_from_env()
+    if redis_client:
+        NamespacedCache(redis_client).invalidate('products', 'product_search')
+
 if __name__ == "__main__":
     seed_crop_products()
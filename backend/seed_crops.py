@@ -3,6 +3,8 @@ import datetime
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
+from cache import NamespacedCache, redis_from_env
+
 # Load environment variables
 backend_dir = os.path.dirname(os.path.abspath(__file__))
 env_path = os.path.join(backend_dir, '.env')
@@ -110,5 +112,10 @@ def seed_crops():
     result = crops_collection.insert_many(crops_data)
     print(f"Successfully seeded {len(result.inserted_ids)} crops.")
 
+    # Retire cached crop listings
+    redis_client = redis_from_env()
+    if redis_client:
+        NamespacedCache(redis_client).bump('crops')
+
 if __name__ == "__main__":
     seed_crops()
@@ -2,6 +2,8 @@ from pymongo import MongoClient
 import os
 from dotenv import load_dotenv
 
+from cache import NamespacedCache, redis_from_env
+
 load_dotenv()
 
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
@@ -250,5 +252,10 @@ def seed_expanded_crops():
     result = crops_collection.insert_many(crops)
     print(f"Successfully seeded {len(result.inserted_ids)} crops into MongoDB.")
 
+    # Retire cached crop listings
+    redis_client = redis_from_env()
+    if redis_client:
+        NamespacedCache(redis_client).bump('crops')
+
 if __name__ == "__main__":
     seed_expanded_crops()
@@ -0,0 +1,139 @@
+"""
+Coalesced stock alerts for admins.
+
+Instead of inserting a LOW_STOCK or OUT_OF_STOCK notification for every order
+that touches a low product, StockAlerts keeps one active alert per product and
+level. Observed stock levels are buffered in memory (the latest one wins) and
+flush() writes them in a single bulk write:
+
+- a product that keeps selling while low updates its existing alert;
+- a new, unread alert appears only when a product crosses a threshold, into
+  low stock or from low stock into out of stock;
+- alerts are resolved (active: False) once the product is restocked, so the
+  next crossing raises a fresh one.
+
+A unique partial index on active alerts keeps concurrent flushes from
+different processes from creating duplicates.
+"""
+
+import datetime
+import threading
+import time
+
+from pymongo import UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError
+
+LOW_STOCK_THRESHOLD = 5
+FLUSH_INTERVAL = 60.0
+LOW_STOCK = 'LOW_STOCK'
+OUT_OF_STOCK = 'OUT_OF_STOCK'
+ALERT_TYPES = (LOW_STOCK, OUT_OF_STOCK)
+
+
+def stock_level(stock, threshold=LOW_STOCK_THRESHOLD):
+    """OUT_OF_STOCK, LOW_STOCK or None for a stock count"""
+    if stock <= 0:
+        return OUT_OF_STOCK
+    if stock <= threshold:
+        return LOW_STOCK
+    return None
+
+
+def alert_message(level, name, stock):
+    if level == OUT_OF_STOCK:
+        return f"Product '{name}' is now out of stock!"
+    return f"Product '{name}' has only {stock} items left in stock!"
+
+
+class StockAlerts:
+    def __init__(self, notifications, threshold=LOW_STOCK_THRESHOLD, flush_interval=FLUSH_INTERVAL):
+        self.notifications = notifications
+        self.threshold = threshold
+        self.flush_interval = flush_interval
+        # product_id -> (name, stock), latest observation only
+        self.pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def observe(self, products):
+        """Buffer the current stock of products (documents with _id, name and stock)"""
+        with self._lock:
+            for product in products:
+                self.pending[str(product['_id'])] = (product.get('name', 'Unknown'), int(product.get('stock', 0)))
+        self.maybe_flush()
+
+    def _ops(self, product_id, name, stock, now):
+        level = stock_level(stock, self.threshold)
+        stale = [alert_type for alert_type in ALERT_TYPES if alert_type != level]
+        ops = [UpdateMany(
+            {'data.productId': product_id, 'type': {'$in': stale}, 'active': True},
+            {'$set': {'active': False, 'resolved_at': now}}
+        )]
+        if level:
+            ops.append(UpdateOne(
+                {'data.productId': product_id, 'type': level, 'active': True},
+                {
+                    '$set': {
+                        'message': alert_message(level, name, stock),
+                        'data.productName': name,
+                        'data.remainingStock': stock,
+                        'updated_at': now,
+                    },
+                    '$setOnInsert': {'read': False, 'created_at': now},
+                },
+                upsert=True
+            ))
+        return ops
+
+    def flush(self):
+        """Write buffered observations; returns how many products were flushed"""
+        with self._lock:
+            pending, self.pending = self.pending, {}
+        self._last_flush = time.monotonic()
+        if not pending:
+            return 0
+        now = datetime.datetime.utcnow()
+        ops = [op for product_id, (name, stock) in pending.items() for op in self._ops(product_id, name, stock, now)]
+        try:
+            self.notifications.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Another process raised the same alert first; every other op still applied
+            if any(error.get('code') != 11000 for error in e.details.get('writeErrors', [])):
+                self._requeue(pending)
+                raise
+        except Exception:
+            self._requeue(pending)
+            raise
+        return len(pending)
+
+    def _requeue(self, pending):
+        """Put back observations that could not be written, unless newer ones arrived"""
+        with self._lock:
+            for product_id, observation in pending.items():
+                self.pending.setdefault(product_id, observation)
+
+    def maybe_flush(self):
+        """flush(), at most once per flush_interval per process"""
+        if time.monotonic() - self._last_flush < self.flush_interval or not self._flush_lock.acquire(blocking=False):
+            return 0
+        try:
+            return self.flush()
+        except Exception as e:
+            print(f"Stock alert flush failed: {e}")
+            return 0
+        finally:
+            self._flush_lock.release()
+
+    def start_flusher(self, interval=None):
+        """Flush buffered alerts in a daemon thread, even when no more orders arrive"""
+        interval = interval or self.flush_interval
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                self._last_flush = 0.0
+                self.maybe_flush()
+        thread = threading.Thread(target=loop, name='stock-alert-flusher', daemon=True)
+        thread.start()
+        return thread
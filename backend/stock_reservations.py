@@ -0,0 +1,211 @@
+"""
+Atomic stock reservations.
+
+Placing an order decrements stock for every line in one bulk write of
+conditional updates ({'stock': {'$gte': qty}}), so concurrent checkouts can
+never take stock below zero. Each decrement also tags the product with the
+reservation ID in `stockHolds`; that tag is what makes compensation exact
+and idempotent, since stock is only given back where the tag is still present.
+
+Online payments hold their stock for RESERVATION_TTL. A hold that is not
+committed by a verified payment in time is released by release_expired(),
+which runs from a background sweeper and opportunistically before new
+reservations. Finished reservation records are purged by a TTL index.
+"""
+
+import datetime
+import threading
+import time
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+RESERVATION_TTL = datetime.timedelta(minutes=15)
+# Committed and released records are kept this long for support queries
+RECORD_RETENTION = datetime.timedelta(days=7)
+SWEEP_INTERVAL = 30.0
+MAX_LINE_QUANTITY = 1000
+
+
+class InsufficientStock(Exception):
+    """Some lines could not be reserved; carries the affected product names"""
+
+    def __init__(self, products):
+        self.products = products
+        super().__init__(f"Insufficient stock for {', '.join(products)}. Please update your cart.")
+
+
+def merge_lines(items):
+    """Sum cart lines into {product_id: quantity}, rejecting malformed ones"""
+    lines = {}
+    for item in items:
+        product_id = str(item.get('id') or item.get('_id') or item.get('productId') or '')
+        if not ObjectId.is_valid(product_id):
+            raise ValueError(f'Invalid product id: {product_id!r}')
+        try:
+            quantity = int(item.get('quantity', 1))
+        except (TypeError, ValueError):
+            raise ValueError(f'Invalid quantity for product {product_id}')
+        if quantity <= 0 or quantity > MAX_LINE_QUANTITY:
+            raise ValueError(f'Quantity for product {product_id} must be between 1 and {MAX_LINE_QUANTITY}')
+        lines[product_id] = lines.get(product_id, 0) + quantity
+    return lines
+
+
+class StockReservations:
+    def __init__(self, products, reservations, ttl=RESERVATION_TTL, on_change=None):
+        self.products = products
+        self.reservations = reservations
+        self.ttl = ttl
+        # Called after stock changes, e.g. to invalidate cached listings
+        self.on_change = on_change
+        self._last_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+
+    def _decrement(self, reservation_id, lines):
+        ops = [
+            UpdateOne(
+                {'_id': ObjectId(pid), 'stock': {'$gte': qty}, 'stockHolds': {'$ne': reservation_id}},
+                {'$inc': {'stock': -qty}, '$push': {'stockHolds': reservation_id}}
+            )
+            for pid, qty in lines.items()
+        ]
+        return self.products.bulk_write(ops, ordered=False).modified_count
+
+    def _restore(self, reservation_id, lines):
+        """Give back stock for every line that still carries the reservation tag"""
+        ops = [
+            UpdateOne(
+                {'_id': ObjectId(pid), 'stockHolds': reservation_id},
+                {'$inc': {'stock': qty}, '$pull': {'stockHolds': reservation_id}}
+            )
+            for pid, qty in lines.items()
+        ]
+        return self.products.bulk_write(ops, ordered=False).modified_count
+
+    def _untag(self, reservation_id, lines):
+        ops = [
+            UpdateOne({'_id': ObjectId(pid), 'stockHolds': reservation_id}, {'$pull': {'stockHolds': reservation_id}})
+            for pid in lines
+        ]
+        self.products.bulk_write(ops, ordered=False)
+
+    def _changed(self, product_ids):
+        if self.on_change:
+            self.on_change(product_ids)
+
+    def _short_products(self, lines):
+        """Names of products that cannot cover their line right now"""
+        docs = self.products.find({'_id': {'$in': [ObjectId(pid) for pid in lines]}}, {'name': 1, 'stock': 1})
+        found = {str(doc['_id']): doc for doc in docs}
+        return [
+            found[pid].get('name', 'Unknown') if pid in found else 'Unknown product'
+            for pid, qty in lines.items()
+            if pid not in found or found[pid].get('stock', 0) < qty
+        ] or ['some items']
+
+    def reserve(self, reservation_id, lines, hold=True):
+        """
+        Atomically take stock for every line or for none of them.
+        With hold=False the stock is committed at once (cash on delivery).
+        Raises InsufficientStock when any line cannot be covered.
+        """
+        self.maybe_release_expired()
+        now = datetime.datetime.utcnow()
+        # Recorded first, so a crash mid-reservation is still released by the
+        # sweeper. A released record may be reused; a live one raises
+        # DuplicateKeyError instead of reserving twice.
+        self.reservations.replace_one({'_id': reservation_id, 'status': 'released'}, {
+            'lines': [{'productId': pid, 'quantity': qty} for pid, qty in lines.items()],
+            'status': 'held',
+            'created_at': now,
+            'expires_at': now + self.ttl,
+        }, upsert=True)
+        if self._decrement(reservation_id, lines) < len(lines):
+            self._restore(reservation_id, lines)
+            self.reservations.delete_one({'_id': reservation_id})
+            raise InsufficientStock(self._short_products(lines))
+        self._changed(list(lines))
+        if not hold:
+            self.commit(reservation_id)
+        return now + self.ttl
+
+    def commit(self, reservation_id):
+        """Make a held reservation permanent; returns False if it was already released or unknown"""
+        now = datetime.datetime.utcnow()
+        reservation = self.reservations.find_one_and_update(
+            {'_id': reservation_id, 'status': 'held'},
+            {'$set': {'status': 'committed', 'committed_at': now, 'purge_at': now + RECORD_RETENTION}}
+        )
+        if not reservation:
+            committed = self.reservations.find_one({'_id': reservation_id, 'status': 'committed'}, {'_id': 1})
+            return bool(committed)
+        self._untag(reservation_id, {line['productId']: line['quantity'] for line in reservation['lines']})
+        return True
+
+    def release(self, reservation_id):
+        """Return held stock; safe to call more than once"""
+        now = datetime.datetime.utcnow()
+        reservation = self.reservations.find_one_and_update(
+            {'_id': reservation_id, 'status': 'held'},
+            {'$set': {'status': 'released', 'released_at': now, 'purge_at': now + RECORD_RETENTION}}
+        )
+        if not reservation:
+            return False
+        lines = {line['productId']: line['quantity'] for line in reservation['lines']}
+        if self._restore(reservation_id, lines):
+            self._changed(list(lines))
+        return True
+
+    def cancel(self, reservation_id):
+        """
+        Return the stock of a reservation whose order was never placed, held
+        or already committed (cash on delivery); safe to call more than once.
+        """
+        if self.release(reservation_id):
+            return True
+        now = datetime.datetime.utcnow()
+        # Committed lines carry no tag any more, so the status flip alone
+        # makes sure only one caller gives the stock back
+        reservation = self.reservations.find_one_and_update(
+            {'_id': reservation_id, 'status': 'committed'},
+            {'$set': {'status': 'released', 'released_at': now, 'purge_at': now + RECORD_RETENTION}}
+        )
+        if not reservation:
+            return False
+        lines = {line['productId']: line['quantity'] for line in reservation['lines']}
+        self.products.bulk_write([
+            UpdateOne({'_id': ObjectId(pid)}, {'$inc': {'stock': qty}})
+            for pid, qty in lines.items()
+        ], ordered=False)
+        self._changed(list(lines))
+        return True
+
+    def release_expired(self, now=None):
+        """Release every hold past its expiry; returns how many were released"""
+        now = now or datetime.datetime.utcnow()
+        expired = self.reservations.find({'status': 'held', 'expires_at': {'$lt': now}}, {'_id': 1})
+        return sum(1 for reservation in expired if self.release(reservation['_id']))
+
+    def maybe_release_expired(self):
+        """release_expired(), at most once per SWEEP_INTERVAL per process"""
+        if time.monotonic() - self._last_sweep < SWEEP_INTERVAL or not self._sweep_lock.acquire(blocking=False):
+            return 0
+        try:
+            self._last_sweep = time.monotonic()
+            return self.release_expired()
+        except Exception as e:
+            print(f"Stock reservation sweep failed: {e}")
+            return 0
+        finally:
+            self._sweep_lock.release()
+
+    def start_sweeper(self, interval=SWEEP_INTERVAL):
+        """Release expired holds in a daemon thread, even when nobody is checking out"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                self.maybe_release_expired()
+        thread = threading.Thread(target=loop, name='stock-reservation-sweeper', daemon=True)
+        thread.start()
+        return thread
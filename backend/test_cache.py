@@ -0,0 +1,98 @@
+import threading
+import time
+
+from cache import LOCAL_ONLY_STALE_TTL, LOCAL_ONLY_TTL, CacheEntry, LocalLRU, NamespacedCache
+
+
+def test_bump_retires_derived_keys():
+    cache = NamespacedCache()
+    before = cache.key('products', 'page:abc')
+
+    previous, current = cache.bump('products')
+    assert previous == 'l0' and current == 'l1'
+    assert cache.key('products', 'page:abc') != before
+    print("PASS: a bump moves every key in the namespace to a new generation")
+
+
+def test_namespaces_are_independent():
+    cache = NamespacedCache()
+    categories = cache.generation('categories')
+    cache.invalidate('products', 'remedies')
+    assert cache.generation('categories') == categories
+    assert cache.generation('remedies') == 'l1'
+    print("PASS: invalidating one namespace leaves the others untouched")
+
+
+def test_concurrent_misses_load_once():
+    cache = NamespacedCache()
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(1)
+        release.wait(2)
+        return 'etag', b'[]'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.fetch('remedies', 'all', loader, 60)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert results == [('etag', b'[]')] * 8
+    print("PASS: concurrent misses share a single loader call")
+
+
+def test_stale_entries_refresh_in_background():
+    cache = NamespacedCache()
+    versions = iter([b'"v1"', b'"v2"'])
+    loader = lambda: ('etag', next(versions))
+
+    assert cache.fetch('crops', 'all', loader, ttl=0, stale_ttl=60) == ('etag', b'"v1"')
+    # Expired but inside the stale window: served at once, refreshed behind the scenes
+    assert cache.fetch('crops', 'all', loader, ttl=0, stale_ttl=60) == ('etag', b'"v1"')
+    for _ in range(50):
+        if cache.lru.get(cache.key('crops', 'all')).body == b'"v2"':
+            break
+        time.sleep(0.02)
+    assert cache.lru.get(cache.key('crops', 'all')).body == b'"v2"'
+    print("PASS: stale entries are served while one refresh runs")
+
+
+def test_local_only_entries_expire_quickly():
+    cache = NamespacedCache()
+    assert not cache.shared
+    start = time.time()
+    entry = cache.fetch_entry('products', 'all', lambda: ('etag', b'[]'), ttl=3600, stale_ttl=600)
+    # Another process's bump cannot reach this one, so the entry must not outlive the cap
+    assert entry.fresh_until <= time.time() + LOCAL_ONLY_TTL
+    assert entry.stale_until - entry.fresh_until <= LOCAL_ONLY_STALE_TTL
+    assert entry.stale_until - start <= LOCAL_ONLY_TTL + LOCAL_ONLY_STALE_TTL + 1
+    print("PASS: without Redis, cached entries live for seconds, not the requested TTL")
+
+
+def test_lru_is_bounded():
+    lru = LocalLRU(max_entries=2, max_bytes=10)
+    lru.set('a', CacheEntry('a', b'1234', 0, 0))
+    lru.set('b', CacheEntry('b', b'1234', 0, 0))
+    lru.get('a')
+    lru.set('c', CacheEntry('c', b'1234', 0, 0))
+    assert lru.get('b') is None and lru.get('a') is not None
+    lru.set('d', CacheEntry('d', b'12345678', 0, 0))
+    assert len(lru) == 1
+    lru.set('e', CacheEntry('e', b'1234', 0, 0, {'gzip': b'12345678'}))
+    assert len(lru) == 1
+    print("PASS: the local tier evicts least recently used entries by count and size, variants included")
+
+
+if __name__ == "__main__":
+    test_bump_retires_derived_keys()
+    test_namespaces_are_independent()
+    test_concurrent_misses_load_once()
+    test_stale_entries_refresh_in_background()
+    test_local_only_entries_expire_quickly()
+    test_lru_is_bounded()
@@ -0,0 +1,341 @@
+import gzip
+import time
+from contextlib import contextmanager
+
+import app as backend
+import cache as cache_module
+from bson import ObjectId
+
+
+class FakeProducts:
+    """Minimal stand-in for the products collection that counts scans"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.scans = 0
+
+    def find(self, *args, **kwargs):
+        self.scans += 1
+        return list(self.docs)
+
+
+class FakeRedis:
+    """Just enough Redis for shared generations and loader locks"""
+
+    class Pipeline:
+        def __init__(self, redis):
+            self.redis = redis
+            self.calls = []
+
+        def incr(self, key):
+            self.calls.append(lambda: self.redis.incr(key))
+
+        def set(self, key, value):
+            self.calls.append(lambda: self.redis.set(key, value))
+
+        def execute(self):
+            return [call() for call in self.calls]
+
+    def __init__(self):
+        self.values = {}
+
+    def pipeline(self):
+        return self.Pipeline(self)
+
+    def incr(self, key):
+        self.values[key] = int(self.values.get(key, 0)) + 1
+        return self.values[key]
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return False
+        self.values[key] = str(value)
+        return True
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def mget(self, *keys):
+        return [self.values.get(key) for key in keys]
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+
+@contextmanager
+def shared_generations():
+    """Run against generations shared through (fake) Redis, as in production"""
+    backend.cache.redis = FakeRedis()
+    try:
+        yield
+    finally:
+        backend.cache.redis = None
+        backend.cache._generations.clear()
+
+
+class LaterClock:
+    """Stands in for the time module, shifted past every local-only lifetime"""
+
+    def __init__(self, offset):
+        self.offset = offset
+        self.monotonic = time.monotonic
+        self.sleep = time.sleep
+
+    def time(self):
+        return time.time() + self.offset
+
+
+def make_products():
+    return FakeProducts([
+        {'_id': ObjectId(), 'name': 'Tulsi', 'category': 'Plants', 'price': 120, 'stock': 4, 'image': '/uploads/tulsi.jpg'},
+        {'_id': ObjectId(), 'name': 'Tomato Seeds', 'category': 'Seeds', 'price': 40, 'stock': 0},
+    ])
+
+
+def test_snapshot_is_reused_and_revalidated():
+    original = backend.products_collection
+    backend.products_collection = make_products()
+    backend.bump_catalog_version()
+    try:
+        client = backend.app.test_client()
+
+        first = client.get('/api/products')
+        assert first.status_code == 200
+        assert first.headers.get('ETag')
+        assert first.get_json()[0]['image'] == '/uploads/tulsi.jpg'
+
+        second = client.get('/api/products')
+        assert second.data == first.data
+        assert backend.products_collection.scans == 1
+
+        not_modified = client.get('/api/products', headers={'If-None-Match': first.headers['ETag']})
+        assert not_modified.status_code == 304
+        assert backend.products_collection.scans == 1
+        print("PASS: snapshot served from memory and revalidated with 304")
+    finally:
+        backend.products_collection = original
+        backend.bump_catalog_version()
+
+
+def test_bump_rebuilds_snapshot():
+    original = backend.products_collection
+    backend.products_collection = make_products()
+    backend.bump_catalog_version()
+    try:
+        client = backend.app.test_client()
+        first = client.get('/api/products')
+
+        backend.products_collection.docs[0]['price'] = 150
+        backend.bump_catalog_version()
+
+        second = client.get('/api/products', headers={'If-None-Match': first.headers['ETag']})
+        assert second.status_code == 200
+        assert second.headers['ETag'] != first.headers['ETag']
+        assert second.get_json()[0]['price'] == 150.0
+        print("PASS: version bump rebuilt the snapshot")
+    finally:
+        backend.products_collection = original
+        backend.bump_catalog_version()
+
+
+def test_listing_args_and_cursor():
+    query, sort_name, limit, cursor = backend.parse_product_list_args({
+        'category': 'Seeds', 'subcategory': 'all', 'minPrice': '10', 'inStock': 'true',
+        'sort': 'price_asc', 'limit': '500',
+    })
+    assert query == {'category': 'Seeds', 'price': {'$gte': 10.0}, 'stock': {'$gt': 0}}
+    assert sort_name == 'price_asc'
+    assert limit == backend.PRODUCT_PAGE_MAX
+    assert cursor is None
+
+    last = {'_id': ObjectId(), 'price': 40}
+    token = backend.encode_product_cursor('price_asc', last)
+    condition = backend.decode_product_cursor('price_asc', token)
+    assert condition == {'$or': [
+        {'price': {'$gt': 40}},
+        {'price': 40, '_id': {'$gt': last['_id']}},
+    ]}
+
+    try:
+        backend.decode_product_cursor('name', token)
+        assert False, "cursor from another sort must be rejected"
+    except ValueError:
+        pass
+    print("PASS: listing args parsed and keyset cursor round-tripped")
+
+
+def test_invalid_listing_args_return_400():
+    client = backend.app.test_client()
+    assert client.get('/api/products?minPrice=cheap').status_code == 400
+    assert client.get('/api/products?sort=random').status_code == 400
+    assert client.get('/api/products?cursor=not-a-cursor').status_code == 400
+    print("PASS: invalid listing args rejected")
+
+
+def test_cached_view_serves_remedies_until_invalidated():
+    original = backend.remedies_collection
+    backend.remedies_collection = FakeProducts([{'_id': ObjectId(), 'name': 'Neem paste'}])
+    backend.cache.bump('remedies')
+    try:
+        client = backend.app.test_client()
+        first = client.get('/api/remedies')
+        second = client.get('/api/remedies')
+        assert first.status_code == 200 and second.data == first.data
+        assert backend.remedies_collection.scans == 1
+        assert client.get('/api/remedies', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+        backend.cache.invalidate('remedies')
+        client.get('/api/remedies')
+        assert backend.remedies_collection.scans == 2
+        print("PASS: cached view reused until its namespace is bumped")
+    finally:
+        backend.remedies_collection = original
+        backend.cache.bump('remedies')
+
+
+def test_cached_view_sees_other_workers_writes_without_redis():
+    original = backend.remedies_collection
+    backend.remedies_collection = FakeProducts([{'_id': ObjectId(), 'name': 'Neem paste'}])
+    backend.cache.bump('remedies')
+    try:
+        client = backend.app.test_client()
+        first = client.get('/api/remedies')
+        # No conditional validators without shared generations
+        assert 'Last-Modified' not in first.headers
+
+        # Another worker writes and bumps its own, unshared generation
+        backend.remedies_collection.docs[0]['name'] = 'Neem oil'
+        cache_module.time = LaterClock(cache_module.LOCAL_ONLY_TTL + cache_module.LOCAL_ONLY_STALE_TTL + 1)
+        try:
+            later = client.get('/api/remedies', headers={'If-None-Match': first.headers['ETag']})
+        finally:
+            cache_module.time = time
+        assert later.status_code == 200 and later.get_json()[0]['name'] == 'Neem oil'
+        print("PASS: without Redis, cached views pick up other workers' writes within seconds")
+    finally:
+        backend.remedies_collection = original
+        backend.cache.bump('remedies')
+
+
+def test_batch_checks_cart_in_one_query():
+    original = backend.products_collection
+    backend.products_collection = make_products()
+    tulsi, seeds = backend.products_collection.docs
+    try:
+        client = backend.app.test_client()
+        response = client.post('/api/products/batch', json={'items': [
+            {'id': str(tulsi['_id']), 'quantity': 2, 'price': 100},
+            {'id': str(seeds['_id']), 'quantity': 1, 'price': 40},
+            {'id': str(ObjectId()), 'quantity': 1},
+            {'id': 'bogus'},
+        ]})
+        assert response.status_code == 200
+        body = response.get_json()
+        assert backend.products_collection.scans == 1
+        first, second, missing, bogus = body['items']
+        assert first['available'] and first['priceChanged'] and first['price'] == 120.0
+        assert not second['available'] and not second['priceChanged']
+        assert missing['error'] == 'Product not found' and bogus['error'] == 'Invalid product ID'
+        assert body['allAvailable'] is False and body['priceChanged'] is True
+
+        assert client.post('/api/products/batch', json={'items': []}).status_code == 400
+        assert client.post('/api/products/batch', json={'items': [{'id': 'x', 'quantity': 0}]}).status_code == 400
+        print("PASS: batch cart check resolves every line with one query")
+    finally:
+        backend.products_collection = original
+
+
+def test_conditional_get_answers_before_the_view():
+    original = backend.reviews_collection
+    backend.reviews_collection = FakeProducts([])
+    try:
+        with shared_generations():
+            backend.cache.bump('reviews')
+            client = backend.app.test_client()
+            first = client.get('/api/reviews?productId=p1')
+            assert first.status_code == 200
+            assert first.headers['ETag'].startswith('W/') and first.headers['Last-Modified']
+            assert backend.reviews_collection.scans == 1
+
+            by_etag = client.get('/api/reviews?productId=p1', headers={'If-None-Match': first.headers['ETag']})
+            by_date = client.get('/api/reviews?productId=p1', headers={'If-Modified-Since': first.headers['Last-Modified']})
+            other_product = client.get('/api/reviews?productId=p2', headers={'If-None-Match': first.headers['ETag']})
+            assert by_etag.status_code == 304 and by_date.status_code == 304
+            assert other_product.status_code == 200
+            assert backend.reviews_collection.scans == 2
+
+            backend.cache.invalidate('reviews')
+            changed = client.get('/api/reviews?productId=p1', headers={'If-None-Match': first.headers['ETag']})
+            assert changed.status_code == 200
+        print("PASS: unchanged public reads answered with 304 before the view runs")
+    finally:
+        backend.reviews_collection = original
+        backend.cache.bump('reviews')
+
+
+def test_cached_views_revalidate_before_the_cache():
+    original = backend.products_collection
+    backend.products_collection = make_products()
+    original_fetch = backend.cache.fetch_entry
+    try:
+        with shared_generations():
+            backend.bump_catalog_version()
+            client = backend.app.test_client()
+            first = client.get('/api/products')
+            assert first.headers['ETag'] == backend.app.test_client().get('/api/products').headers['ETag']
+
+            def fetch_entry(*args, **kwargs):
+                raise AssertionError('the view ran for an unchanged catalog')
+            backend.cache.fetch_entry = fetch_entry
+            for headers in ({}, {'Accept-Encoding': 'gzip'}):
+                revalidated = client.get('/api/products', headers={**headers, 'If-None-Match': first.headers['ETag']})
+                assert revalidated.status_code == 304
+            backend.cache.fetch_entry = original_fetch
+
+            backend.bump_catalog_version()
+            changed = client.get('/api/products', headers={'If-None-Match': first.headers['ETag']})
+            assert changed.status_code == 200 and changed.headers['ETag'] != first.headers['ETag']
+        print("PASS: cached payloads carry the validator checked before the view")
+    finally:
+        backend.cache.fetch_entry = original_fetch
+        backend.products_collection = original
+        backend.bump_catalog_version()
+
+
+def test_cached_payloads_are_sent_precompressed():
+    original = backend.products_collection
+    backend.products_collection = make_products()
+    backend.products_collection.docs[0]['description'] = 'Holy basil ' * 200
+    backend.bump_catalog_version()
+    try:
+        client = backend.app.test_client()
+        plain = client.get('/api/products')
+        packed = client.get('/api/products', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in plain.headers
+        assert packed.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in packed.headers['Vary']
+        assert gzip.decompress(packed.data) == plain.data
+        assert len(packed.data) < len(plain.data) / 5
+
+        revalidated = client.get('/api/products', headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': packed.headers['ETag'],
+        })
+        assert revalidated.status_code == 304
+        assert backend.products_collection.scans == 1
+        print("PASS: cached catalog served from its stored gzip variant")
+    finally:
+        backend.products_collection = original
+        backend.bump_catalog_version()
+
+
+if __name__ == "__main__":
+    test_snapshot_is_reused_and_revalidated()
+    test_bump_rebuilds_snapshot()
+    test_listing_args_and_cursor()
+    test_invalid_listing_args_return_400()
+    test_cached_view_serves_remedies_until_invalidated()
+    test_cached_view_sees_other_workers_writes_without_redis()
+    test_batch_checks_cart_in_one_query()
+    test_conditional_get_answers_before_the_view()
+    test_cached_views_revalidate_before_the_cache()
+    test_cached_payloads_are_sent_precompressed()
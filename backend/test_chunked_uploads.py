@@ -0,0 +1,145 @@
+import hashlib
+import io
+import os
+import tempfile
+
+from chunked_uploads import MIN_PART_SIZE, ChunkedUploadStore, UploadNotFound
+
+
+class FakeSessions:
+    def __init__(self):
+        self.docs = {}
+
+    def _matches(self, doc, query):
+        for key, value in query.items():
+            if isinstance(value, dict) and '$in' in value:
+                if doc.get(key) not in value['$in']:
+                    return False
+            elif doc.get(key) != value:
+                return False
+        return True
+
+    def insert_one(self, doc):
+        self.docs[doc['_id']] = doc
+
+    def find_one(self, query):
+        doc = self.docs.get(query['_id'])
+        return doc if doc and self._matches(doc, query) else None
+
+    def update_one(self, query, update):
+        doc = self.find_one(query)
+        if doc:
+            for key, value in update['$set'].items():
+                target = doc
+                *path, leaf = key.split('.')
+                for part in path:
+                    target = target.setdefault(part, {})
+                target[leaf] = value
+        return doc
+
+    def find_one_and_update(self, query, update):
+        doc = self.find_one(query)
+        before = dict(doc) if doc else None
+        self.update_one(query, update)
+        return before
+
+    def delete_one(self, query):
+        doc = self.find_one(query)
+        if doc:
+            del self.docs[doc['_id']]
+        return type('Result', (), {'deleted_count': 1 if doc else 0})()
+
+
+def test_parts_in_any_order_assemble_and_verify():
+    upload_dir = tempfile.mkdtemp()
+    store = ChunkedUploadStore(FakeSessions(), upload_dir)
+    data = os.urandom(MIN_PART_SIZE * 2 + 1000)
+    session = store.initiate('tree.glb', '.glb', len(data), sha256=hashlib.sha256(data).hexdigest(), part_size=MIN_PART_SIZE)
+    upload_id = session['_id']
+    assert session['total_parts'] == 3
+
+    parts = [data[i:i + MIN_PART_SIZE] for i in range(0, len(data), MIN_PART_SIZE)]
+    store.write_part(upload_id, 3, io.BytesIO(parts[2]))
+    store.write_part(upload_id, 1, io.BytesIO(parts[0]), sha256=hashlib.sha256(parts[0]).hexdigest())
+    assert store.status(upload_id)['missingParts'] == [2]
+
+    try:
+        store.complete(upload_id)
+        assert False, 'completed with a missing part'
+    except ValueError:
+        pass
+
+    # A corrupted part is rejected and can be retried
+    try:
+        store.write_part(upload_id, 2, io.BytesIO(parts[1]), sha256='0' * 64)
+        assert False, 'accepted a part with the wrong checksum'
+    except ValueError:
+        pass
+    store.write_part(upload_id, 2, io.BytesIO(parts[1]))
+
+    filename, sha256, size = store.complete(upload_id)
+    assert sha256 == hashlib.sha256(data).hexdigest() and size == len(data)
+    with open(os.path.join(upload_dir, filename), 'rb') as f:
+        assert f.read() == data
+    assert not os.path.exists(store._session_dir(upload_id))
+    try:
+        store.write_part(upload_id, 1, io.BytesIO(parts[0]))
+        assert False, 'wrote to a completed session'
+    except UploadNotFound:
+        pass
+    print("PASS: chunked upload assembles parts in any order and verifies checksums")
+
+
+def test_part_size_and_file_checksum_enforced():
+    upload_dir = tempfile.mkdtemp()
+    store = ChunkedUploadStore(FakeSessions(), upload_dir)
+    session = store.initiate('leaf.png', '.png', 10, sha256='f' * 64, part_size=MIN_PART_SIZE)
+    try:
+        store.write_part(session['_id'], 1, io.BytesIO(b'x' * 11))
+        assert False, 'accepted an oversized part'
+    except ValueError:
+        pass
+
+    store.write_part(session['_id'], 1, io.BytesIO(b'x' * 10))
+    try:
+        store.complete(session['_id'])
+        assert False, 'completed despite a whole-file checksum mismatch'
+    except ValueError:
+        pass
+    assert store.status(session['_id'])['status'] == 'open'
+    assert [name for name in os.listdir(upload_dir) if not name.startswith('.')] == []
+    print("PASS: oversized parts and whole-file checksum mismatches are rejected")
+
+
+def test_abort_rejects_ids_outside_the_parts_directory():
+    upload_dir = tempfile.mkdtemp()
+    store = ChunkedUploadStore(FakeSessions(), upload_dir)
+    session = store.initiate('tree.glb', '.glb', 10, part_size=MIN_PART_SIZE)
+    with open(os.path.join(upload_dir, 'product.jpg'), 'wb') as f:
+        f.write(b'jpg')
+
+    for upload_id in ('..', '../x', '../' + session['_id'], session['_id'].upper()):
+        for call in (store.abort, store.status):
+            try:
+                call(upload_id)
+                assert False, f'accepted upload id {upload_id!r}'
+            except UploadNotFound:
+                pass
+    assert sorted(os.listdir(upload_dir)) == ['.parts', 'product.jpg']
+    assert os.listdir(os.path.join(upload_dir, '.parts')) == [session['_id']]
+
+    # An unknown but well-formed id removes nothing either
+    try:
+        store.abort('0' * 32)
+        assert False, 'aborted an unknown session'
+    except UploadNotFound:
+        pass
+    store.abort(session['_id'])
+    assert os.listdir(os.path.join(upload_dir, '.parts')) == []
+    print("PASS: upload ids cannot point outside the parts directory")
+
+
+if __name__ == "__main__":
+    test_parts_in_any_order_assemble_and_verify()
+    test_part_size_and_file_checksum_enforced()
+    test_abort_rejects_ids_outside_the_parts_directory()
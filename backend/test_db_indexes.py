@@ -0,0 +1,55 @@
+from db_indexes import INDEX_REGISTRY, QUERY_SHAPES, explain_query_shapes
+
+
+class FakeCursor:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def explain(self):
+        return {'queryPlanner': {'winningPlan': self.plan}}
+
+
+class FakeDb:
+    """Returns an index scan for users and a collection scan for everything else"""
+
+    def __getitem__(self, name):
+        class Collection:
+            def find(self, query):
+                if name == 'users':
+                    return FakeCursor({'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN'}})
+                return FakeCursor({'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN'}})
+        return Collection()
+
+
+def index_options(collection, name):
+    for model in INDEX_REGISTRY[collection]:
+        if model.document['name'] == name:
+            return model.document
+    raise AssertionError(f"{collection}.{name} is not registered")
+
+
+def test_registry_declares_constraints():
+    assert index_options('users', 'email_unique')['unique'] is True
+    assert index_options('blog_likes', 'post_user_unique')['unique'] is True
+    assert index_options('otp_verifications', 'expires_ttl')['expireAfterSeconds'] == 0
+    for label, collection, query, sort in QUERY_SHAPES:
+        assert collection in INDEX_REGISTRY, f"{label} queries an unindexed collection"
+    print("PASS: registry declares unique and TTL indexes for every queried collection")
+
+
+def test_report_flags_collscan():
+    shapes = [
+        ('login', 'users', {'email': 'a@b.c'}, None),
+        ('orders', 'orders', {'userId': 'x'}, [('created_at', -1)]),
+    ]
+    report = {label: flagged for label, _, _, flagged in explain_query_shapes(FakeDb(), shapes)}
+    assert report == {'login': False, 'orders': True}
+    print("PASS: COLLSCAN plans are flagged")
+
+
+if __name__ == "__main__":
+    test_registry_declares_constraints()
+    test_report_flags_collscan()
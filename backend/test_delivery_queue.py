@@ -0,0 +1,285 @@
+import datetime
+import threading
+import time
+
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from delivery_queue import CLAIM_LOCK_TTL, LEGACY_COURIER, DeliveryQueue
+
+
+def matches(doc, query):
+    for field, cond in query.items():
+        if field == '$or':
+            if not any(matches(doc, clause) for clause in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = doc.get(field)
+            if '$in' in cond and value not in cond['$in']:
+                return False
+            if '$exists' in cond and (field in doc) != cond['$exists']:
+                return False
+            if '$lte' in cond and (value is None or value > cond['$lte']):
+                return False
+        elif doc.get(field) != cond:
+            return False
+    return True
+
+
+def sort_key(keys):
+    # Missing fields sort first, as in Mongo
+    return lambda doc: tuple((field in doc, doc.get(field)) for field, _ in keys)
+
+
+class FakeCursor(list):
+    def sort(self, keys, direction=None):
+        if isinstance(keys, str):
+            keys = [(keys, direction)]
+        # Stable sorts from the last key to the first honour each direction
+        for key in reversed(keys):
+            super().sort(key=sort_key([key]), reverse=key[1] == -1)
+        return self
+
+    def limit(self, n):
+        return FakeCursor(self[:n])
+
+
+class FakeOrders:
+    """Applies each write under a lock, as Mongo does for a single document"""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.lock = threading.Lock()
+
+    def _apply(self, doc, update):
+        doc.update(update.get('$set', {}))
+        for field in update.get('$unset', {}):
+            doc.pop(field, None)
+
+    def find_one_and_update(self, query, update, sort=None, projection=None, return_document=None):
+        with self.lock:
+            found = [doc for doc in self.docs if matches(doc, query)]
+            if sort:
+                found.sort(key=sort_key(sort))
+            if not found:
+                return None
+            before = dict(found[0])
+            self._apply(found[0], update)
+            return dict(found[0]) if return_document == ReturnDocument.AFTER else before
+
+    def update_many(self, query, update):
+        with self.lock:
+            found = [doc for doc in self.docs if matches(doc, query)]
+            for doc in found:
+                self._apply(doc, update)
+
+            class Result:
+                modified_count = len(found)
+            return Result()
+
+    def update_one(self, query, update):
+        with self.lock:
+            found = [doc for doc in self.docs if matches(doc, query)]
+            if found:
+                self._apply(found[0], update)
+
+            class Result:
+                modified_count = len(found[:1])
+            return Result()
+
+    def find(self, query, projection=None):
+        return FakeCursor([dict(doc) for doc in self.docs if matches(doc, query)])
+
+    def count_documents(self, query):
+        return sum(1 for doc in self.docs if matches(doc, query))
+
+
+class FakeCouriers:
+    """Per-driver documents; an upsert that matches nothing collides on _id"""
+
+    def __init__(self):
+        self.docs = {}
+        self.lock = threading.Lock()
+
+    def update_one(self, query, update, upsert=False):
+        with self.lock:
+            doc = self.docs.get(query['_id'])
+            if doc is None and upsert:
+                doc = self.docs[query['_id']] = {'_id': query['_id']}
+            elif doc is None or not matches(doc, query):
+                if upsert:
+                    raise DuplicateKeyError('E11000 duplicate key')
+                return
+            doc.update(update.get('$set', {}))
+            for field in update.get('$unset', {}):
+                doc.pop(field, None)
+
+
+def make_orders(n, start=datetime.datetime(2024, 3, 1)):
+    return [
+        {'_id': ObjectId(), 'deliveryStatus': 'Confirmed', 'created_at': start + datetime.timedelta(minutes=i), 'userId': f'u{i}'}
+        for i in range(n)
+    ]
+
+
+def test_concurrent_claims_never_share_orders():
+    orders = FakeOrders(make_orders(40))
+    queue = DeliveryQueue(orders, FakeCouriers(), max_active=10)
+    claims = {}
+
+    def claim(courier):
+        claims[courier] = queue.claim(courier, count=10)
+
+    threads = [threading.Thread(target=claim, args=(f'driver{i}',)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    claimed = [order['_id'] for batch in claims.values() for order in batch]
+    assert len(claimed) == 40 and len(set(claimed)) == 40
+    for courier, batch in claims.items():
+        assert all(doc['courierId'] == courier for doc in batch)
+    print("PASS: concurrent claims hand each order to exactly one driver")
+
+
+def test_claims_take_oldest_first_up_to_the_cap():
+    docs = make_orders(8)
+    docs[0]['deliveryStatus'] = 'Pending'
+    queue = DeliveryQueue(FakeOrders(docs), FakeCouriers(), max_active=3)
+
+    first = queue.claim('a', count=2)
+    assert [doc['_id'] for doc in first] == [docs[1]['_id'], docs[2]['_id']]
+    # Only one more fits under the cap
+    assert len(queue.claim('a', count=5)) == 1
+    assert queue.claim('a') == []
+    assert [doc['_id'] for doc in queue.mine('a')] == [docs[1]['_id'], docs[2]['_id'], docs[3]['_id']]
+    print("PASS: drivers claim the oldest deliverable orders up to their cap")
+
+
+def test_expired_leases_return_to_the_pool():
+    docs = make_orders(1)
+    queue = DeliveryQueue(FakeOrders(docs), FakeCouriers(), lease=datetime.timedelta(minutes=30))
+    now = datetime.datetime(2024, 3, 2, 9)
+
+    assert len(queue.claim('a', now=now)) == 1
+    assert queue.claim('b', now=now + datetime.timedelta(minutes=10)) == []
+    [taken] = queue.claim('b', now=now + datetime.timedelta(minutes=31))
+    assert taken['courierId'] == 'b'
+
+    # The first driver lost the order and can no longer deliver it
+    assert queue.deliver(docs[0]['_id'], 'a') is None
+    delivered = queue.deliver(docs[0]['_id'], 'b')
+    assert delivered['userId'] == 'u0'
+    assert docs[0]['deliveryStatus'] == 'Delivered' and docs[0]['deliveredBy'] == 'b'
+    assert 'leaseExpiresAt' not in docs[0]
+    print("PASS: expired leases can be claimed by another driver")
+
+
+def test_release_hands_the_order_back():
+    docs = make_orders(1)
+    queue = DeliveryQueue(FakeOrders(docs), FakeCouriers())
+    queue.claim('a')
+    assert not queue.release(docs[0]['_id'], 'b')
+    assert queue.release(docs[0]['_id'], 'a')
+    assert 'courierId' not in docs[0]
+    assert len(queue.claim('b')) == 1
+    print("PASS: released orders go back to the pool")
+
+
+def test_batches_stay_within_a_zone():
+    docs = make_orders(6)
+    for doc, (zone, pincode) in zip(docs, [
+        ('686', '686004'), ('560', '560001'), ('686', '686001'),
+        ('686', '686004'), ('560', '560002'), (None, None),
+    ]):
+        doc.update(zone=zone, pincode=pincode)
+    queue = DeliveryQueue(FakeOrders(docs), FakeCouriers())
+
+    # The oldest order sets the zone; the rest of its zone follows in PIN code order
+    batch = queue.claim('a', count=4)
+    assert [doc['pincode'] for doc in batch] == ['686004', '686001', '686004', '560001']
+    assert [doc['pincode'] for doc in queue.mine('a')] == ['560001', '686001', '686004', '686004']
+
+    assert [doc['_id'] for doc in queue.available('560')] == [docs[4]['_id']]
+    assert [doc['pincode'] for doc in queue.claim('b', zone='560')] == ['560002']
+    print("PASS: claimed batches stay within one zone in route order")
+
+
+def test_one_drivers_concurrent_claims_respect_the_cap():
+    orders = FakeOrders(make_orders(40))
+    queue = DeliveryQueue(orders, FakeCouriers(), max_active=5)
+    # Widen the window between the cap check and the claims
+    count = queue.active_count
+    queue.active_count = lambda courier_id: (count(courier_id), time.sleep(0.02))[0]
+
+    threads = [threading.Thread(target=queue.claim, args=('a',), kwargs={'count': 5}) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert queue.active_count('a') == 5
+    print("PASS: concurrent claims by one driver never exceed their cap")
+
+
+def test_stale_claim_locks_are_taken_over():
+    couriers = FakeCouriers()
+    queue = DeliveryQueue(FakeOrders(make_orders(3)), couriers)
+    now = datetime.datetime(2024, 3, 2, 9)
+    # A claim that crashed while holding the lock
+    couriers.docs['a'] = {'_id': 'a', 'claimingUntil': now + CLAIM_LOCK_TTL}
+
+    assert queue.claim('a', now=now) == []
+    assert len(queue.claim('a', now=now + CLAIM_LOCK_TTL)) == 3
+    assert 'claimingUntil' not in couriers.docs['a']
+    print("PASS: a claim lock left behind expires")
+
+
+def test_store_status_changes_release_claims():
+    docs = make_orders(3)
+    queue = DeliveryQueue(FakeOrders(docs), FakeCouriers())
+    queue.claim('a', count=2)
+
+    # Still deliverable: the driver keeps it
+    assert queue.set_status(docs[0]['_id'], 'Shipped', 'admin')['deliveryStatus'] == 'Confirmed'
+    assert docs[0]['courierId'] == 'a'
+    # Back to Pending: out of the driver's hands
+    queue.set_status(docs[1]['_id'], 'Pending', 'admin')
+    assert 'courierId' not in docs[1] and 'leaseExpiresAt' not in docs[1]
+    assert [doc['_id'] for doc in queue.mine('a')] == [docs[0]['_id']]
+
+    # Delivered by the store: the holding driver gets the credit, else the store user
+    queue.set_status(docs[0]['_id'], 'Delivered', 'admin')
+    queue.set_status(docs[2]['_id'], 'Delivered', 'admin')
+    assert docs[0]['deliveredBy'] == 'a' and 'courierId' not in docs[0] and docs[0]['delivered_at']
+    assert docs[2]['deliveredBy'] == 'admin'
+    assert queue.mine('a') == [] and queue.set_status(ObjectId(), 'Shipped', 'admin') is None
+    print("PASS: store status changes release claims and credit deliveries")
+
+
+def test_history_keeps_legacy_deliveries():
+    docs = make_orders(3)
+    for doc in docs[:2]:
+        doc.update(deliveryStatus='Delivered', delivered_at=doc['created_at'])
+    docs[1]['deliveredBy'] = 'b'
+    queue = DeliveryQueue(FakeOrders(docs), FakeCouriers())
+
+    assert queue.history('a') == []
+    assert queue.backfill_legacy() == 1 and queue.backfill_legacy() == 0
+    assert docs[0]['deliveredBy'] == LEGACY_COURIER and 'deliveredBy' not in docs[2]
+    assert [doc['_id'] for doc in queue.history('a')] == [docs[0]['_id']]
+    assert [doc['_id'] for doc in queue.history('b')] == [docs[1]['_id'], docs[0]['_id']]
+    print("PASS: deliveries from before the queue stay in every driver's history")
+
+
+if __name__ == "__main__":
+    test_concurrent_claims_never_share_orders()
+    test_claims_take_oldest_first_up_to_the_cap()
+    test_expired_leases_return_to_the_pool()
+    test_release_hands_the_order_back()
+    test_batches_stay_within_a_zone()
+    test_one_drivers_concurrent_claims_respect_the_cap()
+    test_stale_claim_locks_are_taken_over()
+    test_store_status_changes_release_claims()
+    test_history_keeps_legacy_deliveries()
@@ -0,0 +1,54 @@
+from delivery_zones import UNZONED, ZoneSummary, address_pincode, zone_fields
+
+
+class FakeZones:
+    def __init__(self):
+        self.docs = {}
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.docs.setdefault(query['_id'], {'_id': query['_id'], 'counts': {}})
+        for field, delta in update['$inc'].items():
+            status = field.split('.', 1)[1]
+            doc['counts'][status] = doc['counts'].get(status, 0) + delta
+        doc.update(update['$set'])
+
+    def find(self):
+        return list(self.docs.values())
+
+
+def test_pincodes_and_zones():
+    assert address_pincode('12 MG Road, Kottayam, Kerala 686001') == '686001'
+    assert address_pincode('Flat 403, 2nd Cross, Bengaluru, Karnataka 560 034') == '560034'
+    assert address_pincode({'street': '4 Park St', 'zip': '700016'}) == '700016'
+    assert address_pincode({'street': 'House 110001', 'city': 'Delhi'}) == '110001'
+    assert address_pincode('Not provided') is None and address_pincode(None) is None
+    # Phone numbers and house numbers are not PIN codes
+    assert address_pincode('Call 9876543210, House 12') is None
+    assert zone_fields('Kottayam 686001') == {'pincode': '686001', 'zone': '686'}
+    assert zone_fields('Not provided') == {'pincode': None, 'zone': None}
+    print("PASS: orders are zoned by the PIN code in their address")
+
+
+def test_summary_moves_counts_between_statuses():
+    summary = ZoneSummary(FakeZones(), None)
+    for _ in range(3):
+        summary.move('686', None, 'Pending')
+    summary.move('686', 'Pending', 'Confirmed')
+    summary.move('686', 'Pending', 'Confirmed')
+    summary.move('686', 'Confirmed', 'Delivered')
+    summary.move('560', None, 'Pending')
+    summary.move('560', 'Pending', 'Shipped')
+    summary.move(None, None, 'Pending')
+    # A retried update that does not change the status is not counted
+    summary.move('560', 'Shipped', 'Shipped')
+
+    zones = summary.summary()
+    assert [(zone['zone'], zone['open']) for zone in zones] == [('560', 1), ('686', 1), (UNZONED, 0)]
+    assert zones[1]['counts'] == {'Pending': 1, 'Confirmed': 1, 'Delivered': 1}
+    assert zones[0]['counts'] == {'Shipped': 1}
+    print("PASS: zone summaries follow orders through their statuses")
+
+
+if __name__ == "__main__":
+    test_pincodes_and_zones()
+    test_summary_moves_counts_between_statuses()
@@ -0,0 +1,116 @@
+import datetime
+
+from pymongo.errors import DuplicateKeyError
+
+from idempotency import IdempotencyLedger, KeyInUse, KeyReused, request_fingerprint
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def set(self, name, value, nx=False, px=None, ex=None):
+        if nx and name in self.data:
+            return None
+        self.data[name] = value
+        return True
+
+    def get(self, name):
+        return self.data.get(name)
+
+    def delete(self, name):
+        self.data.pop(name, None)
+
+
+class DownRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError('Redis is down')
+        return fail
+
+
+class FakeKeys:
+    def __init__(self):
+        self.docs = {}
+
+    def insert_one(self, doc):
+        if doc['_id'] in self.docs:
+            raise DuplicateKeyError('duplicate key')
+        self.docs[doc['_id']] = dict(doc)
+
+    def find_one(self, query):
+        return self.docs.get(query['_id'])
+
+    def find_one_and_update(self, query, update):
+        doc = self.docs.get(query['_id'])
+        if not doc or doc['state'] != query['state'] or doc['fingerprint'] != query['fingerprint']:
+            return None
+        if not doc['locked_until'] < query['locked_until']['$lt']:
+            return None
+        before = dict(doc)
+        doc.update(update['$set'])
+        return before
+
+    def replace_one(self, query, doc, upsert=False):
+        self.docs[query['_id']] = {'_id': query['_id'], **doc}
+
+    def delete_one(self, query):
+        doc = self.docs.get(query['_id'])
+        if doc and all(doc.get(k) == v for k, v in query.items()):
+            del self.docs[query['_id']]
+
+
+def check_ledger(ledger):
+    order = request_fingerprint('POST', '/api/orders/create', b'{"items": [1], "total": 10}')
+    assert request_fingerprint('POST', '/api/orders/create', b'{"total":10,"items":[1]}') == order
+
+    assert ledger.begin('orders.create:u1:k1', order) is None
+    try:
+        ledger.begin('orders.create:u1:k1', order)
+        assert False, 'ran the same request twice at once'
+    except KeyInUse:
+        pass
+
+    ledger.finish('orders.create:u1:k1', order, 201, '{"orderId": "abc"}', 'application/json')
+    assert ledger.begin('orders.create:u1:k1', order) == {
+        'status': 201, 'body': '{"orderId": "abc"}', 'mimetype': 'application/json'}
+
+    other = request_fingerprint('POST', '/api/orders/create', b'{"items": [2]}')
+    try:
+        ledger.begin('orders.create:u1:k1', other)
+        assert False, 'replayed a response for a different body'
+    except KeyReused as e:
+        assert e.status == 422
+
+    # A failed request frees its key
+    assert ledger.begin('orders.create:u1:k2', order) is None
+    ledger.abandon('orders.create:u1:k2')
+    assert ledger.begin('orders.create:u1:k2', order) is None
+
+
+def test_redis_ledger_replays_and_rejects_conflicts():
+    check_ledger(IdempotencyLedger(FakeRedis(), FakeKeys()))
+    print("PASS: Redis ledger replays responses and rejects conflicting keys")
+
+
+def test_mongo_fallback_when_redis_is_down():
+    keys = FakeKeys()
+    check_ledger(IdempotencyLedger(DownRedis(), keys))
+    assert keys.docs['orders.create:u1:k1']['state'] == 'done'
+    print("PASS: ledger falls back to MongoDB when Redis is unavailable")
+
+
+def test_stale_claims_can_be_taken_over():
+    keys = FakeKeys()
+    ledger = IdempotencyLedger(None, keys, lock_ttl=datetime.timedelta(seconds=-1))
+    fingerprint = request_fingerprint('POST', '/api/orders/verify', b'{}')
+    assert ledger.begin('orders.verify:u1:pay_1', fingerprint) is None
+    # The first request died without finishing; an identical retry may run
+    assert ledger.begin('orders.verify:u1:pay_1', fingerprint) is None
+    print("PASS: claims of requests that died can be taken over")
+
+
+if __name__ == "__main__":
+    test_redis_ledger_replays_and_rejects_conflicts()
+    test_mongo_fallback_when_redis_is_down()
+    test_stale_claims_can_be_taken_over()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+
+from image_variants import PIL_AVAILABLE, ImageVariantWorker, cloudinary_variants, srcset, target_widths
+
+
+class FakeManifests:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.find_one(query)
+        if doc is None:
+            doc = dict(query)
+            self.docs.append(doc)
+        doc.update(update['$set'])
+
+    def find_one(self, query, projection=None):
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                return doc
+        return None
+
+
+def test_target_widths():
+    assert target_widths(2000) == [160, 320, 640, 1280]
+    assert target_widths(500) == [160, 320, 500]
+    assert target_widths(100) == [100]
+    print("PASS: variant widths never upscale")
+
+
+def test_srcset_groups_by_format():
+    variants = [
+        {'url': '/uploads/a.w320.webp', 'width': 320, 'format': 'webp'},
+        {'url': '/uploads/a.w160.webp', 'width': 160, 'format': 'webp'},
+        {'url': '/uploads/a.w160.avif', 'width': 160, 'format': 'avif'},
+    ]
+    assert srcset(variants) == {
+        'webp': '/uploads/a.w160.webp 160w, /uploads/a.w320.webp 320w',
+        'avif': '/uploads/a.w160.avif 160w',
+    }
+    print("PASS: srcset strings grouped by format and ordered by width")
+
+
+def test_lookup_uses_manifest_or_cloudinary_transforms():
+    variants = [{'url': '/uploads/a.w160.webp', 'width': 160, 'format': 'webp'}]
+    worker = ImageVariantWorker('/tmp', FakeManifests([{'url': '/uploads/a.jpg', 'status': 'ready', 'variants': variants}]))
+    assert worker.lookup('/uploads/a.jpg')['imageVariants'] == variants
+    assert worker.lookup('/uploads/missing.jpg') == {}
+    assert worker.lookup('https://example.com/a.jpg') == {}
+
+    url = 'https://res.cloudinary.com/demo/image/upload/v1/greencart/a.jpg'
+    assert cloudinary_variants(url)[0]['url'] == 'https://res.cloudinary.com/demo/image/upload/w_160,c_limit,f_avif,q_auto/v1/greencart/a.jpg'
+    assert 'webp' in worker.lookup(url)['imageSrcset']
+    print("PASS: variants looked up from manifests or built as Cloudinary transforms")
+
+
+def test_worker_derives_and_records_variants():
+    if not PIL_AVAILABLE:
+        print("SKIP: Pillow is not installed")
+        return
+    from PIL import Image
+
+    upload_dir = tempfile.mkdtemp()
+    Image.new('RGB', (800, 400), 'green').save(os.path.join(upload_dir, 'leaf.jpg'))
+    recorded = {}
+    manifests = FakeManifests([])
+    worker = ImageVariantWorker(upload_dir, manifests, on_ready=lambda url, variants: recorded.update({url: variants}))
+
+    worker.enqueue('/uploads/leaf.jpg').result(timeout=30)
+    assert manifests.find_one({'url': '/uploads/leaf.jpg'})['status'] == 'ready'
+    widths = sorted({v['width'] for v in recorded['/uploads/leaf.jpg']})
+    assert widths == [160, 320, 640, 800]
+    assert os.path.exists(os.path.join(upload_dir, 'leaf.w320.webp'))
+    assert worker.enqueue('https://example.com/leaf.jpg') is None
+    print("PASS: uploads resized in the background and recorded")
+
+
+if __name__ == "__main__":
+    test_target_widths()
+    test_srcset_groups_by_format()
+    test_lookup_uses_manifest_or_cloudinary_transforms()
+    test_worker_derives_and_records_variants()
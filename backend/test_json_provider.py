@@ -0,0 +1,27 @@
+import datetime
+import json
+
+from bson import Decimal128, ObjectId
+
+import app as backend
+
+
+def test_mongo_documents_serialize_natively():
+    oid = ObjectId()
+    created = datetime.datetime(2024, 5, 1, 9, 30, 15, 250000)
+    doc = {'_id': oid, 'author_id': oid, 'created_at': created, 'price': Decimal128('12.50'), 'day': created.date()}
+
+    with backend.app.app_context():
+        response = backend.jsonify([doc])
+    body = json.loads(response.get_data())
+    assert body == [{
+        '_id': str(oid), 'author_id': str(oid), 'created_at': '2024-05-01T09:30:15.250000',
+        'price': 12.5, 'day': '2024-05-01',
+    }]
+    assert json.loads(backend.app.json.dumps(doc)) == body[0]
+    assert json.loads(backend.app.json.dumps_bytes(doc)) == body[0]
+    print("PASS: ObjectId, datetime and Decimal128 serialize without per-document loops")
+
+
+if __name__ == "__main__":
+    test_mongo_documents_serialize_natively()
@@ -0,0 +1,131 @@
+import datetime
+
+import app as backend
+from bson import ObjectId
+
+
+def matches(doc, query):
+    for key, cond in query.items():
+        if key == '$and':
+            if not all(matches(doc, q) for q in cond):
+                return False
+            continue
+        if key == '$or':
+            if not any(matches(doc, q) for q in cond):
+                return False
+            continue
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            if '$lt' in cond and not (value is not None and value < cond['$lt']):
+                return False
+            if '$gt' in cond and not (value is not None and value > cond['$gt']):
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, spec):
+        for field, direction in reversed(spec):
+            self.docs.sort(key=lambda d: d[field], reverse=direction == -1)
+        return self
+
+    def limit(self, n):
+        return self.docs[:n]
+
+    def __iter__(self):
+        return iter(self.docs)
+
+
+class FakeOrders:
+    def __init__(self, docs):
+        self.docs = docs
+        self.projections = []
+        self.counts = 0
+
+    def find(self, query, projection=None):
+        self.projections.append(projection)
+        return FakeCursor([dict(d) for d in self.docs if matches(d, query)])
+
+    def estimated_document_count(self):
+        return len(self.docs)
+
+    def count_documents(self, query):
+        self.counts += 1
+        return sum(1 for d in self.docs if matches(d, query))
+
+
+def make_orders():
+    # Several orders share a timestamp, so pages must break ties on _id
+    start = datetime.datetime(2024, 1, 1)
+    return [
+        {'_id': ObjectId(), 'userId': 'u1', 'total': n, 'paymentStatus': 'Success' if n % 2 else 'Pending',
+         'created_at': start + datetime.timedelta(minutes=n // 3), 'items': [{'name': 'Tulsi'}]}
+        for n in range(10)
+    ]
+
+
+def collect_pages(path):
+    ids, totals, cursor = [], [], None
+    while True:
+        url = path + (f'&cursor={cursor}' if cursor else '')
+        with backend.app.test_request_context(url):
+            page = backend.order_page({}, backend.ORDER_LIST_PROJECTION, 1 if 'sortOrder=asc' in path else -1)
+        ids += [item['id'] for item in page['items']]
+        totals.append(page.get('total'))
+        cursor = page['next']
+        if not cursor:
+            return ids, totals
+
+
+def test_keyset_pages_cover_every_order_once():
+    original = backend.orders_collection
+    orders = make_orders()
+    backend.orders_collection = FakeOrders(orders)
+    try:
+        newest_first = sorted(orders, key=lambda o: (o['created_at'], o['_id']), reverse=True)
+        ids, totals = collect_pages('/api/orders?limit=3&includeTotal=1')
+        assert ids == [str(o['_id']) for o in newest_first]
+        assert totals[0] == 10
+
+        ids, _ = collect_pages('/api/orders?limit=4&sortOrder=asc')
+        assert ids == [str(o['_id']) for o in reversed(newest_first)]
+
+        # List views never load item arrays
+        assert all('items' not in (p or {}) for p in backend.orders_collection.projections)
+    finally:
+        backend.orders_collection = original
+    print("PASS: keyset pages cover every order exactly once")
+
+
+def test_full_list_and_bad_cursor():
+    original = backend.orders_collection
+    backend.orders_collection = FakeOrders(make_orders())
+    try:
+        with backend.app.test_request_context('/api/orders'):
+            assert len(backend.order_page({}, backend.ORDER_LIST_PROJECTION)) == 10
+        with backend.app.test_request_context('/api/orders?cursor=not-a-cursor'):
+            try:
+                backend.order_page({}, backend.ORDER_LIST_PROJECTION)
+                assert False, 'accepted a bad cursor'
+            except ValueError:
+                pass
+        # Customer history: a bare list for existing clients, pages on request
+        with backend.app.test_request_context('/api/user/orders'):
+            orders = backend.order_page({'userId': 'u1'}, backend.USER_ORDER_LIST_PROJECTION)
+            assert isinstance(orders, list) and len(orders) == 10
+        with backend.app.test_request_context('/api/user/orders?limit=4'):
+            page = backend.order_page({'userId': 'u1'}, backend.USER_ORDER_LIST_PROJECTION)
+            assert len(page['items']) == 4 and page['next']
+    finally:
+        backend.orders_collection = original
+    print("PASS: unpaged requests get the full list and bad cursors are rejected")
+
+
+if __name__ == "__main__":
+    test_keyset_pages_cover_every_order_once()
+    test_full_list_and_bad_cursor()
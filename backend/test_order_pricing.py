@@ -0,0 +1,41 @@
+from order_pricing import OrderProductError, order_items, order_totals
+
+
+SNAPSHOT = {
+    'a1': {'name': 'Tulsi', 'price': 120.0, 'stock': 10, 'category': 'Plants', 'image': '/uploads/t.jpg'},
+    'b2': {'name': 'Neem seeds', 'price': 45.5, 'stock': 1},
+}
+
+
+def test_items_come_from_the_product_snapshot():
+    items = order_items({'a1': 2, 'b2': 1}, SNAPSHOT)
+    assert [(i['name'], i['price'], i['quantity'], i['lineTotal']) for i in items] == [
+        ('Tulsi', 120.0, 2, 240.0), ('Neem seeds', 45.5, 1, 45.5)]
+    assert items[0]['image'] == '/uploads/t.jpg' and items[1]['category'] == ''
+    print("PASS: order items priced from the product snapshot")
+
+
+def test_missing_and_short_products_rejected_before_writing():
+    for lines, message in (({'zz': 1}, 'not found'), ({'b2': 2}, 'Insufficient stock for Neem seeds')):
+        try:
+            order_items(lines, SNAPSHOT)
+            assert False, f'accepted {lines}'
+        except OrderProductError as e:
+            assert message in str(e)
+    print("PASS: missing and short products rejected in memory")
+
+
+def test_totals_match_checkout_rules():
+    small = order_totals([{'price': 100.0, 'quantity': 2}])
+    assert small == {'subtotal': 200.0, 'discount': 0, 'shipping': 49, 'tax': 16.0, 'total': 265.0}
+    free_shipping = order_totals([{'price': 499.0, 'quantity': 1}])
+    assert free_shipping['shipping'] == 0 and free_shipping['discount'] == 0
+    large = order_totals([{'price': 1000.0, 'quantity': 2}])
+    assert large == {'subtotal': 2000.0, 'discount': 200.0, 'shipping': 0, 'tax': 144.0, 'total': 1944.0}
+    print("PASS: totals follow the checkout pricing rules")
+
+
+if __name__ == "__main__":
+    test_items_come_from_the_product_snapshot()
+    test_missing_and_short_products_rejected_before_writing()
+    test_totals_match_checkout_rules()
@@ -0,0 +1,36 @@
+from product_images import canonical_images, migration_update, needs_migration, normalize_image_url
+
+
+def test_normalize_image_url():
+    assert normalize_image_url('tulsi.jpg') == '/uploads/tulsi.jpg'
+    assert normalize_image_url('/tulsi.jpg') == '/uploads/tulsi.jpg'
+    assert normalize_image_url('/uploads/tulsi.jpg') == '/uploads/tulsi.jpg'
+    assert normalize_image_url('https://cdn.example.com/t.jpg') == 'https://cdn.example.com/t.jpg'
+    assert normalize_image_url(None) == ''
+    print("PASS: image URLs normalized once")
+
+
+def test_legacy_fields_fold_into_canonical_shape():
+    assert canonical_images({'imageUrl': '', 'photo': 'a.jpg', 'images': ['a.jpg', 'b.jpg', 'b.jpg']}) == {
+        'image': '/uploads/a.jpg', 'gallery': ['/uploads/b.jpg'],
+    }
+    assert canonical_images({'image': 'https://x/y.png', 'imageUrl': 'old.jpg'})['image'] == 'https://x/y.png'
+    print("PASS: legacy image fields fold into image + gallery")
+
+
+def test_migration_update():
+    legacy = {'_id': 1, 'imageUrl': 'a.jpg', 'thumbnail': 't.jpg'}
+    assert needs_migration(legacy)
+    assert migration_update(legacy) == {
+        '$set': {'image': '/uploads/a.jpg', 'gallery': []},
+        '$unset': {'imageUrl': '', 'thumbnail': ''},
+    }
+    assert not needs_migration({'_id': 2, 'image': '/uploads/a.jpg', 'gallery': []})
+    assert not needs_migration({'_id': 3, 'image': ''})
+    print("PASS: migration rewrites only non-canonical products")
+
+
+if __name__ == "__main__":
+    test_normalize_image_url()
+    test_legacy_fields_fold_into_canonical_shape()
+    test_migration_update()
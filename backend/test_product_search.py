@@ -0,0 +1,93 @@
+from product_search import ProductSearchIndex, edit_distance, tokenize
+
+PRODUCTS = [
+    {'_id': 'p1', 'name': 'Tomato Seeds', 'category': 'Seeds', 'subcategory': 'Vegetable', 'description': 'Hybrid tomato for home gardens'},
+    {'_id': 'p2', 'name': 'Tulsi Plant', 'category': 'Plants', 'subcategory': 'Herbs', 'description': 'Holy basil in a clay pot'},
+    {'_id': 'p3', 'name': 'Cherry Tomato Seeds', 'category': 'Seeds', 'subcategory': 'Vegetable', 'description': 'Sweet cherry tomatoes'},
+    {'_id': 'p4', 'name': 'Organic Compost', 'category': 'Fertilizers', 'subcategory': '', 'description': 'Great for tomato and chilli beds'},
+]
+
+
+def build_index():
+    index = ProductSearchIndex()
+    index.build(PRODUCTS, version='v1')
+    return index
+
+
+def test_tokenize_and_distance():
+    assert tokenize('Tomato Seeds for the Garden') == ['tomato', 'seed', 'garden']
+    assert edit_distance('tomoto', 'tomato', 2) == 1
+    assert edit_distance('compost', 'tulsi', 2) == 3
+    print("PASS: tokenizer and bounded edit distance")
+
+
+def test_name_matches_outrank_description_matches():
+    ids = [pid for pid, _ in build_index().search('tomato')]
+    assert ids[-1] == 'p4'
+    assert set(ids[:2]) == {'p1', 'p3'}
+    print("PASS: name matches rank above description mentions")
+
+
+def test_typos_and_prefixes():
+    index = build_index()
+    assert index.search('tomoto seeds')[0][0] in ('p1', 'p3')
+    assert index.search('tuls')[0][0] == 'p2'
+    assert index.search('compst')[0][0] == 'p4'
+    assert index.search('tomoto', fuzzy=False) == []
+    print("PASS: typo and prefix tolerance")
+
+
+def test_filters():
+    index = build_index()
+    assert [pid for pid, _ in index.search('tomato', category='Fertilizers')] == ['p4']
+    assert [pid for pid, _ in index.search('cherry tomato', require_all=True)] == ['p3']
+    print("PASS: category and all-terms filters")
+
+
+def test_incremental_updates():
+    index = build_index()
+    index.apply('p5', {'name': 'Marigold Seeds', 'category': 'Seeds'}, 'v1', 'v2')
+    assert index.search('marigold')[0][0] == 'p5'
+
+    index.apply('p2', None, 'v2', 'v3')
+    assert index.search('tulsi') == []
+    assert index.version == 'v3'
+
+    # A write from a version this index never saw leaves it stale for a rebuild
+    index.apply('p1', None, 'v7', 'v8')
+    assert index.version is None
+    print("PASS: incremental upsert/delete and stale detection")
+
+
+def test_unshared_index_rebuilds_on_a_timer():
+    import app as backend
+
+    class FakeProducts:
+        def __init__(self, docs):
+            self.docs = docs
+
+        def find(self, *args, **kwargs):
+            return list(self.docs)
+
+    original = backend.products_collection
+    backend.products_collection = FakeProducts(list(PRODUCTS))
+    try:
+        assert backend.ensure_search_index().search('marigold') == []
+        # A seed script inserts a product; without Redis it cannot bump the version
+        backend.products_collection.docs.append({'_id': 'p5', 'name': 'Marigold Seeds', 'category': 'Seeds'})
+        assert backend.ensure_search_index().search('marigold') == []
+        backend.product_search_index.built_at -= backend.SEARCH_INDEX_LOCAL_TTL + 1
+        assert backend.ensure_search_index().search('marigold')[0][0] == 'p5'
+        print("PASS: without shared versions the index picks up outside writes after its TTL")
+    finally:
+        backend.products_collection = original
+        backend.product_search_index.version = None
+
+
+if __name__ == "__main__":
+    test_tokenize_and_distance()
+    test_name_matches_outrank_description_matches()
+    test_typos_and_prefixes()
+    test_filters()
+    test_incremental_updates()
+    test_unshared_index_rebuilds_on_a_timer()
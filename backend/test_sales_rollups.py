@@ -0,0 +1,84 @@
+import datetime
+
+from bson import ObjectId
+
+from sales_rollups import SalesRollups, rollup_day
+
+
+class FakeRollups:
+    def __init__(self):
+        self.docs = {}
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            doc = self.docs.get(op._filter['_id'])
+            if doc is None:
+                doc = self.docs[op._filter['_id']] = {'_id': op._filter['_id'], **op._doc.get('$setOnInsert', {})}
+            for field, delta in op._doc['$inc'].items():
+                doc[field] = doc.get(field, 0) + delta
+            doc.update(op._doc.get('$set', {}))
+
+    def find(self, query):
+        day = query['day']
+        return [
+            doc for doc in self.docs.values()
+            if doc['kind'] == query['kind'] and day['$gte'] <= doc['day'] <= day['$lte']
+        ]
+
+
+class FakeOrders:
+    def __init__(self, docs):
+        self.docs = {doc['_id']: doc for doc in docs}
+
+    def find_one_and_update(self, query, update, projection=None):
+        doc = self.docs.get(query['_id'])
+        if not doc or doc.get('rolledUp') is True:
+            return None
+        before = dict(doc)
+        doc.update(update['$set'])
+        return before
+
+
+def make_order(created_at, lines, total):
+    return {
+        '_id': ObjectId(),
+        'created_at': created_at,
+        'total': total,
+        'items': [{'id': pid, 'name': name, 'price': price, 'quantity': qty, 'lineTotal': price * qty} for pid, name, price, qty in lines],
+    }
+
+
+def test_orders_are_rolled_up_once():
+    day = datetime.datetime(2024, 3, 5, 14, 30)
+    first = make_order(day, [('p1', 'Tulsi', 100, 2), ('p2', 'Neem', 50, 1)], 266.0)
+    second = make_order(day, [('p1', 'Tulsi', 100, 1)], 157.0)
+    rollups = SalesRollups(FakeRollups(), FakeOrders([first, second]))
+
+    assert rollups.record(first['_id']) and rollups.record(second['_id'])
+    # A retried payment verification does not count the order again
+    assert not rollups.record(first['_id'])
+
+    docs = rollups.rollups.docs
+    assert docs['2024-03-05'] == {'_id': '2024-03-05', 'kind': 'day', 'day': '2024-03-05', 'orders': 2, 'revenue': 423.0, 'items': 4}
+    tulsi = docs['2024-03-05:p1']
+    assert (tulsi['quantity'], tulsi['revenue'], tulsi['orders'], tulsi['name']) == (3, 300.0, 2, 'Tulsi')
+    assert docs['2024-03-05:p2']['quantity'] == 1
+    print("PASS: orders are rolled up by day and product exactly once")
+
+
+def test_revenue_series_fills_quiet_days():
+    start = datetime.datetime(2024, 3, 4)
+    order = make_order(datetime.datetime(2024, 3, 5, 9), [('p1', 'Tulsi', 10, 1)], 59.0)
+    rollups = SalesRollups(FakeRollups(), FakeOrders([order]))
+    rollups.record(order['_id'])
+
+    series = rollups.revenue_series(start, start + datetime.timedelta(days=2))
+    assert [day['day'] for day in series] == ['2024-03-04', '2024-03-05', '2024-03-06']
+    assert [day['revenue'] for day in series] == [0, 59.0, 0]
+    assert rollup_day(start) == '2024-03-04'
+    print("PASS: revenue series include days without sales")
+
+
+if __name__ == "__main__":
+    test_orders_are_rolled_up_once()
+    test_revenue_series_fills_quiet_days()
@@ -0,0 +1,159 @@
+from pymongo import UpdateOne
+
+from stock_alerts import LOW_STOCK, OUT_OF_STOCK, StockAlerts, stock_level
+
+
+def matches(doc, query):
+    for key, cond in query.items():
+        value = doc.get('data', {}).get(key[5:]) if key.startswith('data.') else doc.get(key)
+        if isinstance(cond, dict) and '$in' in cond:
+            if value not in cond['$in']:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+def apply_set(doc, fields):
+    for key, value in fields.items():
+        if key.startswith('data.'):
+            doc.setdefault('data', {})[key[5:]] = value
+        else:
+            doc[key] = value
+
+
+class FakeNotifications:
+    def __init__(self):
+        self.docs = []
+        self.bulk_writes = 0
+
+    def bulk_write(self, ops, ordered=True):
+        self.bulk_writes += 1
+        for op in ops:
+            found = [doc for doc in self.docs if matches(doc, op._filter)]
+            if isinstance(op, UpdateOne):
+                found = found[:1]
+            if not found and op._upsert:
+                doc = {}
+                apply_set(doc, {k: v for k, v in op._filter.items() if not isinstance(v, dict)})
+                apply_set(doc, op._doc.get('$setOnInsert', {}))
+                self.docs.append(doc)
+                found = [doc]
+            for doc in found:
+                apply_set(doc, op._doc['$set'])
+
+    def active(self):
+        return [doc for doc in self.docs if doc.get('active')]
+
+
+def test_stock_levels():
+    assert stock_level(0) == OUT_OF_STOCK and stock_level(-1) == OUT_OF_STOCK
+    assert stock_level(5) == LOW_STOCK and stock_level(6) is None
+    print("PASS: stock levels follow the low-stock threshold")
+
+
+def test_repeated_orders_update_one_alert():
+    notifications = FakeNotifications()
+    alerts = StockAlerts(notifications, flush_interval=3600)
+    alerts.flush()
+    for stock in (5, 4, 3, 2):
+        alerts.observe([{'_id': 'p1', 'name': 'Tulsi', 'stock': stock}])
+    # Buffered until the timer fires
+    assert notifications.bulk_writes == 0
+    assert alerts.flush() == 1 and notifications.bulk_writes == 1
+
+    alerts.observe([{'_id': 'p1', 'name': 'Tulsi', 'stock': 1}])
+    alerts.flush()
+    [alert] = notifications.docs
+    assert alert['type'] == LOW_STOCK and alert['data']['remainingStock'] == 1 and alert['read'] is False
+    print("PASS: repeated orders of a low product update one alert")
+
+
+def test_crossings_raise_new_alerts_and_restock_resolves():
+    notifications = FakeNotifications()
+    alerts = StockAlerts(notifications, flush_interval=0)
+
+    alerts.observe([{'_id': 'p1', 'name': 'Tulsi', 'stock': 3}])
+    alerts.observe([{'_id': 'p1', 'name': 'Tulsi', 'stock': 0}])
+    assert [doc['type'] for doc in notifications.active()] == [OUT_OF_STOCK]
+    assert len(notifications.docs) == 2
+
+    alerts.observe([{'_id': 'p1', 'name': 'Tulsi', 'stock': 40}])
+    assert notifications.active() == []
+
+    # Selling out again after a restock is a new crossing
+    alerts.observe([{'_id': 'p1', 'name': 'Tulsi', 'stock': 2}])
+    assert len(notifications.active()) == 1 and len(notifications.docs) == 3
+    print("PASS: threshold crossings raise new alerts and restocks resolve them")
+
+
+class MissingProducts:
+    def find_one_and_update(self, query, update, projection=None):
+        return None
+
+
+class RecordingAlerts:
+    def __init__(self):
+        self.observed = []
+
+    def observe(self, products):
+        self.observed.extend(products)
+
+
+def test_unknown_product_update_raises_no_alert():
+    import app as backend
+    from bson import ObjectId
+
+    original = backend.products_collection, backend.stock_alerts
+    backend.products_collection, backend.stock_alerts = MissingProducts(), RecordingAlerts()
+    try:
+        body = {'name': 'Tulsi', 'category': 'Plants', 'price': 10, 'stock': 1}
+        with backend.app.test_request_context(method='PUT', json=body):
+            _, status = backend.admin_update_product.__wrapped__(str(ObjectId()))
+        assert status == 404
+        assert backend.stock_alerts.observed == []
+    finally:
+        backend.products_collection, backend.stock_alerts = original
+    print("PASS: updating an unknown product is a 404 and raises no alert")
+
+
+class OneProduct:
+    def __init__(self, doc):
+        self.doc = doc
+
+    def find_one_and_update(self, query, update, projection=None):
+        before = dict(self.doc)
+        self.doc.update(update['$set'])
+        return before
+
+
+def test_stock_only_updates_keep_the_search_index():
+    import app as backend
+    from bson import ObjectId
+
+    product_id = ObjectId()
+    doc = {'_id': product_id, 'name': 'Tulsi', 'category': 'Plants', 'subcategory': '', 'description': 'Holy basil'}
+    original = backend.products_collection, backend.stock_alerts
+    backend.products_collection, backend.stock_alerts = OneProduct(doc), RecordingAlerts()
+    try:
+        body = {'name': 'Tulsi', 'category': 'Plants', 'description': 'Holy basil', 'price': 10, 'stock': 1}
+        version = backend.cache.generation('product_search')
+        with backend.app.test_request_context(method='PUT', json=body):
+            backend.admin_update_product.__wrapped__(str(product_id))
+        assert backend.cache.generation('product_search') == version
+
+        with backend.app.test_request_context(method='PUT', json={**body, 'name': 'Holy Tulsi'}):
+            backend.admin_update_product.__wrapped__(str(product_id))
+        assert backend.cache.generation('product_search') != version
+        assert [p['stock'] for p in backend.stock_alerts.observed] == [1, 1]
+    finally:
+        backend.products_collection, backend.stock_alerts = original
+    print("PASS: only edits to indexed text bump the search index")
+
+
+if __name__ == "__main__":
+    test_stock_levels()
+    test_repeated_orders_update_one_alert()
+    test_crossings_raise_new_alerts_and_restock_resolves()
+    test_unknown_product_update_raises_no_alert()
+    test_stock_only_updates_keep_the_search_index()
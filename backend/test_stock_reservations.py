@@ -0,0 +1,238 @@
+import datetime
+import threading
+
+from bson import ObjectId
+
+from stock_reservations import InsufficientStock, StockReservations, merge_lines
+
+
+def matches(doc, query):
+    for key, cond in query.items():
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            if '$gte' in cond and not (value is not None and value >= cond['$gte']):
+                return False
+            if '$lt' in cond and not (value is not None and value < cond['$lt']):
+                return False
+            if '$ne' in cond and cond['$ne'] in (value or []):
+                return False
+            if '$in' in cond and value not in cond['$in']:
+                return False
+        elif isinstance(value, list):
+            if cond not in value:
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class FakeProducts:
+    """Applies each update atomically, like a single-document Mongo write"""
+
+    def __init__(self, docs):
+        self.docs = {doc['_id']: doc for doc in docs}
+        self.lock = threading.Lock()
+        self.bulk_writes = 0
+
+    def bulk_write(self, ops, ordered=True):
+        self.bulk_writes += 1
+        modified = 0
+        for op in ops:
+            with self.lock:
+                doc = self.docs.get(op._filter['_id'])
+                if doc is None or not matches(doc, op._filter):
+                    continue
+                for field, delta in op._doc.get('$inc', {}).items():
+                    doc[field] = doc.get(field, 0) + delta
+                for field, value in op._doc.get('$push', {}).items():
+                    doc.setdefault(field, []).append(value)
+                for field, value in op._doc.get('$pull', {}).items():
+                    doc[field] = [v for v in doc.get(field, []) if v != value]
+                modified += 1
+        return type('Result', (), {'modified_count': modified})()
+
+    def find(self, query, projection=None):
+        return [doc for doc in self.docs.values() if matches(doc, query)]
+
+
+class FakeReservations:
+    def __init__(self):
+        self.docs = {}
+        self.lock = threading.Lock()
+
+    def replace_one(self, query, doc, upsert=False):
+        with self.lock:
+            existing = self.docs.get(query['_id'])
+            if existing and existing['status'] != query['status']:
+                raise RuntimeError('duplicate key')
+            self.docs[query['_id']] = {'_id': query['_id'], **doc}
+
+    def find_one_and_update(self, query, update):
+        with self.lock:
+            doc = self.docs.get(query['_id'])
+            if not doc or not matches(doc, query):
+                return None
+            before = dict(doc)
+            doc.update(update['$set'])
+            return before
+
+    def find_one(self, query, projection=None):
+        doc = self.docs.get(query['_id'])
+        return doc if doc and matches(doc, query) else None
+
+    def find(self, query, projection=None):
+        return [doc for doc in list(self.docs.values()) if matches(doc, query)]
+
+    def delete_one(self, query):
+        self.docs.pop(query['_id'], None)
+
+
+def make_store(**stock):
+    ids = {name: ObjectId() for name in stock}
+    products = FakeProducts([{'_id': ids[name], 'name': name, 'stock': qty} for name, qty in stock.items()])
+    return StockReservations(products, FakeReservations()), products, {name: str(oid) for name, oid in ids.items()}
+
+
+def test_merge_lines():
+    pid = str(ObjectId())
+    assert merge_lines([{'id': pid, 'quantity': 2}, {'_id': pid}]) == {pid: 3}
+    for bad in ([{'id': 'nope'}], [{'id': pid, 'quantity': 0}], [{'id': pid, 'quantity': 'x'}]):
+        try:
+            merge_lines(bad)
+            assert False, f'accepted {bad}'
+        except ValueError:
+            pass
+    print("PASS: cart lines merged and validated")
+
+
+def test_reservation_is_all_or_nothing():
+    store, products, ids = make_store(tulsi=5, neem=1)
+    try:
+        store.reserve('order-1', {ids['tulsi']: 2, ids['neem']: 2})
+        assert False, 'reserved more neem than exists'
+    except InsufficientStock as e:
+        assert e.products == ['neem']
+    assert [doc['stock'] for doc in products.docs.values()] == [5, 1]
+    assert all(not doc.get('stockHolds') for doc in products.docs.values())
+    assert 'order-1' not in store.reservations.docs
+    print("PASS: a cart that cannot be covered takes no stock")
+
+
+def test_hold_commit_and_release():
+    store, products, ids = make_store(tulsi=5)
+    tulsi = products.docs[ObjectId(ids['tulsi'])]
+
+    store.reserve('order-1', {ids['tulsi']: 2})
+    assert tulsi['stock'] == 3 and tulsi['stockHolds'] == ['order-1']
+    assert store.release('order-1') and not store.release('order-1')
+    assert tulsi['stock'] == 5 and tulsi['stockHolds'] == []
+    assert not store.commit('order-1')
+
+    # Paying late re-reserves the released record
+    store.reserve('order-1', {ids['tulsi']: 2}, hold=False)
+    assert tulsi['stock'] == 3 and tulsi['stockHolds'] == []
+    assert store.commit('order-1') and not store.release('order-1')
+    assert tulsi['stock'] == 3
+    print("PASS: holds commit once and release once")
+
+
+def test_expired_holds_are_released():
+    store, products, ids = make_store(tulsi=5)
+    store.reserve('order-1', {ids['tulsi']: 4})
+    store.reserve('order-2', {ids['tulsi']: 1}, hold=False)
+    assert store.release_expired() == 0
+    later = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    assert store.release_expired(now=later) == 1
+    assert products.docs[ObjectId(ids['tulsi'])]['stock'] == 4
+    print("PASS: expired holds give their stock back")
+
+
+def test_cancel_returns_committed_stock_once():
+    store, products, ids = make_store(tulsi=5, neem=3)
+
+    # Cash on delivery commits at once, so no tag is left for release()
+    store.reserve('order-1', {ids['tulsi']: 2, ids['neem']: 1}, hold=False)
+    assert not store.release('order-1')
+    assert store.cancel('order-1') and not store.cancel('order-1')
+    assert [doc['stock'] for doc in products.docs.values()] == [5, 3]
+
+    store.reserve('order-2', {ids['tulsi']: 4})
+    assert store.cancel('order-2') and not store.cancel('order-2')
+    assert [doc['stock'] for doc in products.docs.values()] == [5, 3]
+    print("PASS: cancelled orders give held or committed stock back once")
+
+
+def test_concurrent_checkouts_never_oversell():
+    store, products, ids = make_store(seeds=10)
+    sold = []
+
+    def checkout(n):
+        try:
+            store.reserve(f'order-{n}', {ids['seeds']: 1})
+            sold.append(n)
+        except InsufficientStock:
+            pass
+
+    threads = [threading.Thread(target=checkout, args=(n,)) for n in range(25)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(sold) == 10 and products.docs[ObjectId(ids['seeds'])]['stock'] == 0
+    print("PASS: concurrent checkouts never oversell")
+
+
+class StubOrders:
+    def __init__(self, order):
+        self.order = order
+
+    def find_one(self, query, projection=None):
+        return self.order if query['_id'] == self.order['_id'] else None
+
+
+class StubReservations:
+    """Reservation records have been purged: nothing left to commit"""
+
+    def __init__(self):
+        self.reserved = []
+
+    def commit(self, order_id):
+        return False
+
+    def reserve(self, order_id, lines, hold=True):
+        self.reserved.append(order_id)
+
+
+def test_replayed_verification_does_not_take_stock_again():
+    import app as backend
+
+    original = backend.orders_collection, backend.stock_reservations
+    items = [{'id': str(ObjectId()), 'quantity': 2}]
+    try:
+        for state, retaken in [
+            ({'stockReservation': 'committed', 'paymentStatus': 'Success'}, False),
+            ({'stockReservation': 'conflict', 'paymentStatus': 'Success'}, False),
+            ({'paymentStatus': 'Success'}, False),
+            ({'stockReservation': 'held', 'paymentStatus': 'Pending'}, True),
+            ({'stockReservation': 'released', 'paymentStatus': 'Failed'}, True),
+            ({'paymentStatus': 'Pending'}, True),
+        ]:
+            order = {'_id': ObjectId(), 'items': items, **state}
+            backend.orders_collection = StubOrders(order)
+            backend.stock_reservations = StubReservations()
+            outcome = backend.commit_order_stock(str(order['_id']))
+            assert (backend.stock_reservations.reserved == [str(order['_id'])]) == retaken, state
+            assert outcome == ({'stockReservation': 'committed'} if retaken else {}), state
+    finally:
+        backend.orders_collection, backend.stock_reservations = original
+    print("PASS: paid orders never have their stock taken twice")
+
+
+if __name__ == "__main__":
+    test_merge_lines()
+    test_reservation_is_all_or_nothing()
+    test_hold_commit_and_release()
+    test_expired_holds_are_released()
+    test_cancel_returns_committed_stock_once()
+    test_concurrent_checkouts_never_oversell()
+    test_replayed_verification_does_not_take_stock_again()
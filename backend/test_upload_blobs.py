@@ -0,0 +1,94 @@
+import datetime
+import os
+import tempfile
+
+from gc_uploads import _replace_url, adopt_legacy_files, hardcoded_upload_urls
+from upload_blobs import UploadBlobIndex, referenced_urls
+
+
+class FakeBlobs:
+    def __init__(self):
+        self.docs = {}
+
+    def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query['_id'])
+        if doc is None:
+            if not upsert:
+                return
+            doc = self.docs[query['_id']] = {'_id': query['_id'], **update.get('$setOnInsert', {})}
+        doc.update(update.get('$set', {}))
+        for field, value in update.get('$addToSet', {}).items():
+            doc.setdefault(field, [])
+            if value not in doc[field]:
+                doc[field].append(value)
+
+    def update_many(self, query, update):
+        urls = set(query['urls']['$in'])
+        for doc in self.docs.values():
+            if urls & set(doc.get('urls', [])):
+                for field, delta in update['$inc'].items():
+                    doc[field] = doc.get(field, 0) + delta
+
+    def find_one(self, query):
+        return self.docs.get(query['_id'])
+
+    def find(self, query, projection=None):
+        return list(self.docs.values())
+
+
+def test_referenced_urls_flattens_lists_and_nested_items():
+    product = {'image': '/uploads/a.jpg', 'gallery': ['/uploads/b.jpg', ''], 'arModelUrl': '/uploads/m.glb'}
+    assert referenced_urls(product, 'products') == {'/uploads/a.jpg', '/uploads/b.jpg', '/uploads/m.glb'}
+    order = {'items': [{'image': '/uploads/a.jpg'}, {'imageUrl': 'https://cdn/x.jpg'}]}
+    assert referenced_urls(order, 'orders') == {'/uploads/a.jpg', 'https://cdn/x.jpg'}
+    assert referenced_urls(None, 'products') == set()
+    assert _replace_url(order['items'], '/uploads/a.jpg', '/uploads/h.jpg')[0]['image'] == '/uploads/h.jpg'
+    print("PASS: upload references found in every field shape")
+
+
+def test_refcounts_follow_writes_across_local_and_remote_urls():
+    blobs = UploadBlobIndex(FakeBlobs())
+    blobs.register('a' * 64, '/uploads/aaa.jpg', size=10, ext='.jpg')
+    # Identical re-upload: same blob, no second entry
+    again = blobs.register('a' * 64, '/uploads/aaa.jpg', size=10, ext='.jpg')
+    assert again['urls'] == ['/uploads/aaa.jpg'] and again['refcount'] == 0
+    blobs.record_remote('a' * 64, 'https://res.cloudinary.com/demo/aaa.jpg', 'greencart/uploads/aaa')
+
+    blobs.adjust(set(), {'/uploads/aaa.jpg'})
+    blobs.adjust(set(), {'https://res.cloudinary.com/demo/aaa.jpg'})
+    assert blobs.find('a' * 64)['refcount'] == 2
+    blobs.adjust({'/uploads/aaa.jpg'}, {'/uploads/aaa.jpg', '/uploads/other.jpg'})
+    assert blobs.find('a' * 64)['refcount'] == 2
+    blobs.adjust({'/uploads/aaa.jpg'}, set())
+    assert blobs.find('a' * 64)['refcount'] == 1
+
+    assert blobs.recount({'https://res.cloudinary.com/demo/aaa.jpg': 3}) == 1
+    assert blobs.find('a' * 64)['refcount'] == 3
+    assert blobs.find('a' * 64)['last_uploaded_at'] <= datetime.datetime.utcnow()
+    print("PASS: refcounts follow document writes and recounts")
+
+
+def test_nested_and_hardcoded_references_are_kept():
+    category = {'imageUrl': 'https://cdn/c.jpg', 'subcategories': [{'name': 'Indoor', 'imageUrl': '/uploads/sub.jpg'}, {'name': 'Outdoor'}]}
+    assert referenced_urls(category, 'categories') == {'https://cdn/c.jpg', '/uploads/sub.jpg'}
+    assert referenced_urls({'imageUrl': '/uploads/old.jpg', 'images': ['/uploads/g.jpg']}, 'products') == {'/uploads/old.jpg', '/uploads/g.jpg'}
+
+    source = tempfile.mkdtemp()
+    with open(os.path.join(source, 'seed.py'), 'w') as f:
+        f.write('remedy = {"imageUrl": "/uploads/20250918164353826388.jpg"}\nurl = f"/uploads/{name}"\n')
+    pinned = hardcoded_upload_urls([source])
+    assert pinned == {'/uploads/20250918164353826388.jpg'}
+
+    # --adopt leaves files named in source alone (no database access needed)
+    upload_dir = tempfile.mkdtemp()
+    with open(os.path.join(upload_dir, '20250918164353826388.jpg'), 'wb') as f:
+        f.write(b'jpg')
+    assert adopt_legacy_files(None, None, upload_dir, pinned=pinned) == (0, 0, set())
+    assert os.listdir(upload_dir) == ['20250918164353826388.jpg']
+    print("PASS: nested and hard-coded upload references are never collected")
+
+
+if __name__ == "__main__":
+    test_referenced_urls_flattens_lists_and_nested_items()
+    test_refcounts_follow_writes_across_local_and_remote_urls()
+    test_nested_and_hardcoded_references_are_kept()
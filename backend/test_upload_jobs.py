@@ -0,0 +1,112 @@
+import io
+import os
+import tempfile
+import time
+
+import upload_jobs
+from upload_jobs import LocalUploader, UploadJobQueue, public_job
+from upload_storage import save_stream
+
+
+class FakeJobs:
+    def __init__(self):
+        self.docs = {}
+
+    def insert_one(self, doc):
+        self.docs[doc['_id']] = dict(doc)
+
+    def find_one(self, query, projection=None):
+        doc = self.docs.get(query['_id'])
+        return dict(doc) if doc else None
+
+    def update_one(self, query, update):
+        doc = self.docs.get(query['_id'])
+        if doc:
+            doc.update(update['$set'])
+        return type('Result', (), {'modified_count': 1 if doc else 0})()
+
+
+class FlakyUploader:
+    """Fails a set number of times before succeeding"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def upload(self, path, options):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError('Cloudinary timed out')
+        return {'url': 'https://res.cloudinary.com/demo/image/upload/' + os.path.basename(path), 'public_id': 'x'}
+
+
+def test_jobs_retry_and_report_the_final_url():
+    done = []
+    uploader = FlakyUploader(failures=2)
+    jobs = UploadJobQueue(FakeJobs(), uploader, on_done=lambda job, result: done.append((job['provisional_url'], result['url'])), backoff=0)
+    job = jobs.submit('/tmp/abc.glb', provisional_url='/uploads/abc.glb')
+    assert public_job(job)['url'] == '/uploads/abc.glb' and not public_job(job)['final']
+
+    finished = jobs.wait(job['_id'], timeout=5)
+    assert finished['status'] == 'done' and finished['attempts'] == 3
+    assert public_job(finished)['url'].startswith('https://res.cloudinary.com/')
+    assert done == [('/uploads/abc.glb', finished['url'])]
+    print("PASS: upload jobs retry and report the final URL")
+
+
+def test_jobs_fail_after_max_attempts():
+    jobs = UploadJobQueue(FakeJobs(), FlakyUploader(failures=10), max_attempts=3, backoff=0, inline=True)
+    job = jobs.submit('/tmp/abc.jpg', provisional_url='/uploads/abc.jpg')
+    assert job['status'] == 'failed' and job['attempts'] == 3
+    assert 'timed out' in job['error']
+    # Clients keep using the staged copy
+    assert public_job(job)['url'] == '/uploads/abc.jpg'
+    print("PASS: upload jobs give up after max attempts")
+
+
+def test_local_uploader_works_offline():
+    upload_dir = tempfile.mkdtemp()
+    name, _, _ = save_stream(io.BytesIO(b'model'), upload_dir, '.glb')
+    jobs = UploadJobQueue(FakeJobs(), LocalUploader(upload_dir), backoff=0, inline=True)
+    job = jobs.submit(os.path.join(upload_dir, name), provisional_url=f'/uploads/{name}')
+    assert job['status'] == 'done' and job['url'] == f'/uploads/{name}'
+
+    missing = jobs.submit(os.path.join(upload_dir, 'gone.glb'))
+    assert missing['status'] == 'failed'
+    print("PASS: local uploader completes jobs without a network")
+
+
+class SlowUploader:
+    """Records the job's heartbeat while a long upload runs"""
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.seen = []
+
+    def upload(self, path, options):
+        for _ in range(4):
+            time.sleep(0.05)
+            self.seen.append(self.jobs.docs[next(iter(self.jobs.docs))]['updated_at'])
+        return {'url': 'https://res.cloudinary.com/demo/big.glb', 'public_id': 'big'}
+
+
+def test_long_uploads_keep_their_heartbeat():
+    original = upload_jobs.HEARTBEAT_INTERVAL
+    upload_jobs.HEARTBEAT_INTERVAL = 0.02
+    try:
+        store = FakeJobs()
+        uploader = SlowUploader(store)
+        job = UploadJobQueue(store, uploader, backoff=0, inline=True).submit('/tmp/big.glb')
+    finally:
+        upload_jobs.HEARTBEAT_INTERVAL = original
+    assert job['status'] == 'done'
+    # updated_at kept moving while the upload was in flight, so recover() will not resume it
+    assert len(set(uploader.seen)) > 1
+    print("PASS: running uploads refresh their heartbeat")
+
+
+if __name__ == "__main__":
+    test_jobs_retry_and_report_the_final_url()
+    test_jobs_fail_after_max_attempts()
+    test_local_uploader_works_offline()
+    test_long_uploads_keep_their_heartbeat()
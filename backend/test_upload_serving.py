@@ -0,0 +1,53 @@
+import io
+import os
+import tempfile
+
+import app as backend
+from upload_storage import is_content_hashed, save_stream
+
+
+def test_save_stream_names_files_by_content():
+    upload_dir = tempfile.mkdtemp()
+    first, sha256, size = save_stream(io.BytesIO(b'glb-bytes'), upload_dir, '.GLB')
+    again, _, _ = save_stream(io.BytesIO(b'glb-bytes'), upload_dir, '.glb')
+    assert first == again == sha256[:32] + '.glb' and size == 9
+    assert sorted(os.listdir(upload_dir)) == [first]
+    assert is_content_hashed(first) and is_content_hashed(first.replace('.glb', '.w320.webp'))
+    assert not is_content_hashed('20250918164353826388.jpg')
+    print("PASS: uploads stored once under their content hash")
+
+
+def test_uploads_served_with_ranges_and_cache_headers():
+    original = backend.UPLOAD_DIR
+    backend.UPLOAD_DIR = tempfile.mkdtemp()
+    try:
+        hashed, _, _ = save_stream(io.BytesIO(b'0123456789' * 100), backend.UPLOAD_DIR, '.glb')
+        with open(os.path.join(backend.UPLOAD_DIR, 'legacy.jpg'), 'wb') as f:
+            f.write(b'jpeg')
+        client = backend.app.test_client()
+
+        full = client.get(f'/uploads/{hashed}')
+        assert full.status_code == 200
+        assert full.headers['Content-Type'] == 'model/gltf-binary'
+        assert 'immutable' in full.headers['Cache-Control'] and 'max-age=31536000' in full.headers['Cache-Control']
+        assert full.headers['Accept-Ranges'] == 'bytes'
+
+        partial = client.get(f'/uploads/{hashed}', headers={'Range': 'bytes=10-19'})
+        assert partial.status_code == 206 and partial.data == b'0123456789'
+
+        legacy = client.get('/uploads/legacy.jpg')
+        assert 'no-cache' in legacy.headers['Cache-Control']
+        assert client.get('/uploads/legacy.jpg', headers={'If-None-Match': legacy.headers['ETag']}).status_code == 304
+
+        os.makedirs(os.path.join(backend.UPLOAD_DIR, '.parts', 'session'))
+        with open(os.path.join(backend.UPLOAD_DIR, '.parts', 'session', '00001.part'), 'wb') as f:
+            f.write(b'part')
+        assert client.get('/uploads/.parts/session/00001.part').status_code == 404
+        print("PASS: uploads served with range, immutable and conditional support")
+    finally:
+        backend.UPLOAD_DIR = original
+
+
+if __name__ == "__main__":
+    test_save_stream_names_files_by_content()
+    test_uploads_served_with_ranges_and_cache_headers()
@@ -2,6 +2,8 @@ import pymongo
 from dotenv import load_dotenv
 import os
 
+from cache import NamespacedCache, redis_from_env
+
 # Load environment variables
 load_dotenv()
 
@@ -26,7 +28,7 @@ new_products = [
         "price": 199,
         "stock": 25,
         "description": "Nutrient-rich potting mix for healthy plant growth.",
-        "imageUrl": "",
+        "image": "",
         "rating": 4,
         "reviews": 10
     },
@@ -37,7 +39,7 @@ new_products = [
         "price": 149,
         "stock": 20,
         "description": "100% organic vermicompost for garden and potted plants.",
-        "imageUrl": "",
+        "image": "",
         "rating": 4,
         "reviews": 10
     },
@@ -50,7 +52,7 @@ new_products = [
         "price": 89,
         "stock": 30,
         "description": "Durable hand trowel for planting and transplanting.",
-        "imageUrl": "",
+        "image": "",
         "rating": 4,
         "reviews": 10
     },
@@ -61,7 +63,7 @@ new_products = [
         "price": 199,
         "stock": 15,
         "description": "Ergonomic watering can with rose attachment.",
-        "imageUrl": "",
+        "image": "",
         "rating": 4,
         "reviews": 10
     },
@@ -74,7 +76,7 @@ new_products = [
         "price": 129,
         "stock": 25,
         "description": "Pure aloe vera gel for skin care and healing.",
-        "imageUrl": "",
+        "image": "",
         "rating": 4,
         "reviews": 10
     },
@@ -87,7 +89,7 @@ new_products = [
         "price": 59,
         "stock": 40,
         "description": "Organic fenugreek seeds for kitchen garden.",
-        "imageUrl": "",
+        "image": "",
         "rating": 4,
         "reviews": 10
     },
@@ -100,7 +102,7 @@ new_products = [
         "price": 299,
         "stock": 15,
         "description": "Fragrant lavender plant with medicinal properties.",
-        "imageUrl": "",
+        "image": "",
         "rating": 4,
         "reviews": 10
     },
@@ -111,7 +113,7 @@ new_products = [
         "price": 149,
         "stock": 20,
         "description": "Bright flowering marigold plant for garden borders.",
-        "imageUrl": "",
+        "image": "",
         "rating": 4,
         "reviews": 10
     }
@@ -128,4 +130,9 @@ for product in new_products:
         products_collection.insert_one(product)
         print(f"Added new product: {product['name']}")
 
+# Retire cached listings and the servers' search indexes
+redis_client = redis_from_env()
+if redis_client:
+    NamespacedCache(redis_client).invalidate('products', 'product_search')
+
 print("Database update completed!")
\ No newline at end of file
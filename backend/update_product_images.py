@@ -12,6 +12,8 @@ import sys
 from pymongo import MongoClient
 from datetime import datetime
 
+from product_images import LEGACY_IMAGE_FIELDS, canonical_images
+
 # Add the parent directory to the path so we can import app config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -48,11 +50,11 @@ PRODUCT_IMAGE_MAP = {
 def clear_redis_cache():
     """Clear Redis cache if it exists"""
     try:
-        from app import redis_client
+        from cache import NamespacedCache, redis_from_env
+        redis_client = redis_from_env()
         if redis_client:
-            cache_key = "products_list"
-            redis_client.delete(cache_key)
-            print("✓ Redis cache cleared")
+            NamespacedCache(redis_client).invalidate('products', 'product_search')
+            print("✓ Product cache invalidated")
             return True
     except Exception as e:
         print(f"Note: Could not clear Redis cache: {e}")
@@ -77,24 +79,24 @@ def update_product_images():
             new_image_url = PRODUCT_IMAGE_MAP[product_name]
             
             # Update only if the image is different
-            current_image = product.get('imageUrl') or product.get('image')
+            current_image = canonical_images(product)['image']
             if current_image != new_image_url:
                 # Update the product with the new image URL
                 products_collection.update_one(
                     {'_id': product['_id']},
                     {
                         '$set': {
-                            'imageUrl': new_image_url,
                             'image': new_image_url,
                             'updated_at': datetime.utcnow()
-                        }
+                        },
+                        '$unset': {field: '' for field in LEGACY_IMAGE_FIELDS}
                     }
                 )
                 print(f"✓ Updated image for '{product_name}': {new_image_url}")
                 updated_count += 1
         else:
             # For products not in our map, use a default image if they don't have one
-            current_image = product.get('imageUrl') or product.get('image')
+            current_image = canonical_images(product)['image']
             if not current_image:
                 # Use the first available image as fallback
                 fallback_image = next(iter(PRODUCT_IMAGE_MAP.values()))
@@ -102,10 +104,10 @@ def update_product_images():
                     {'_id': product['_id']},
                     {
                         '$set': {
-                            'imageUrl': fallback_image,
                             'image': fallback_image,
                             'updated_at': datetime.utcnow()
-                        }
+                        },
+                        '$unset': {field: '' for field in LEGACY_IMAGE_FIELDS}
                     }
                 )
                 print(f"✓ Updated image for '{product_name}' (fallback): {fallback_image}")
@@ -123,7 +125,7 @@ def list_all_products():
     products = products_collection.find({})
     for product in products:
         name = product.get('name', 'Unknown')
-        image = product.get('imageUrl') or product.get('image') or 'None'
+        image = canonical_images(product)['image'] or 'None'
         print(f"{name:<30} | {image}")
 
 if __name__ == "__main__":
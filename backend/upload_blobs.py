@@ -0,0 +1,118 @@
+"""
+Content-addressed upload index.
+
+Every stored upload is recorded once in the `upload_blobs` collection, keyed
+by the SHA-256 of its bytes, with the URLs it is reachable under (the local
+/uploads/ copy and, once pushed, its Cloudinary URL) and a reference count.
+Re-uploading identical bytes finds the existing blob, so the file is neither
+stored nor sent to Cloudinary again.
+
+Reference counts are adjusted when products, categories, remedies and blog
+posts change their image fields. gc_uploads.py recounts them from every
+collection in REFERENCE_FIELDS before deleting unreferenced blobs, so a
+missed adjustment can delay collection but never delete a file in use.
+"""
+
+import datetime
+
+from product_images import LEGACY_GALLERY_FIELDS, LEGACY_IMAGE_FIELDS
+
+# Collections and fields that can hold upload URLs (lists and arrays of
+# subdocuments are flattened). Legacy product fields stay listed until
+# migrate_product_images.py has run everywhere.
+REFERENCE_FIELDS = {
+    'products': ('image', 'gallery', 'arModelUrl') + LEGACY_IMAGE_FIELDS + LEGACY_GALLERY_FIELDS,
+    'categories': ('imageUrl', 'image', 'subcategories.imageUrl', 'subcategories.image'),
+    'remedies': ('imageUrl',),
+    'remedy_categories': ('imageUrl',),
+    'blog_posts': ('image_url',),
+    'events': ('image',),
+    'reviews': ('image',),
+    'orders': ('items.imageUrl', 'items.image'),
+}
+
+# Freshly uploaded files are unreferenced until the form that uploaded them is saved
+GC_GRACE = datetime.timedelta(hours=24)
+
+
+def _field_values(doc, path):
+    head, _, rest = path.partition('.')
+    value = doc.get(head) if isinstance(doc, dict) else None
+    values = value if isinstance(value, list) else [value]
+    if rest:
+        return [v for item in values for v in _field_values(item, rest)]
+    return values
+
+
+def referenced_urls(doc, collection_name):
+    """Set of upload URLs a document in collection_name refers to"""
+    if not doc:
+        return set()
+    urls = set()
+    for field in REFERENCE_FIELDS.get(collection_name, ()):
+        urls.update(v for v in _field_values(doc, field) if isinstance(v, str) and v)
+    return urls
+
+
+def reference_projection(collection_name):
+    """Projection that loads just the reference fields of collection_name"""
+    return {field.split('.')[0]: 1 for field in REFERENCE_FIELDS.get(collection_name, ())}
+
+
+class UploadBlobIndex:
+    def __init__(self, collection):
+        self.collection = collection
+
+    def register(self, sha256, url=None, size=None, ext=None):
+        """Record a stored upload (idempotent) and return the blob"""
+        now = datetime.datetime.utcnow()
+        update = {
+            '$setOnInsert': {'size': size, 'ext': ext, 'refcount': 0, 'created_at': now, 'urls': []},
+            # Re-uploads restart the grace period
+            '$set': {'last_uploaded_at': now},
+        }
+        if url:
+            # Serverless staging has no local URL; the blob gains one when pushed
+            del update['$setOnInsert']['urls']
+            update['$set']['local_url'] = url
+            update['$addToSet'] = {'urls': url}
+        self.collection.update_one({'_id': sha256}, update, upsert=True)
+        return self.collection.find_one({'_id': sha256})
+
+    def find(self, sha256):
+        return self.collection.find_one({'_id': sha256}) if sha256 else None
+
+    def record_remote(self, sha256, url, public_id=None, resource_type='image'):
+        """Remember where the blob lives on Cloudinary"""
+        self.collection.update_one({'_id': sha256}, {
+            '$set': {'remote_url': url, 'public_id': public_id, 'resource_type': resource_type},
+            '$addToSet': {'urls': url},
+        })
+
+    def _inc(self, urls, delta):
+        if urls:
+            self.collection.update_many({'urls': {'$in': sorted(urls)}}, {'$inc': {'refcount': delta}})
+
+    def adjust(self, before_urls, after_urls):
+        """Apply a document's change of referenced URLs to the counts"""
+        before_urls, after_urls = set(before_urls), set(after_urls)
+        self._inc(after_urls - before_urls, 1)
+        self._inc(before_urls - after_urls, -1)
+
+    def recount(self, counts):
+        """Reset every blob's refcount from {url: references}; returns how many changed"""
+        changed = 0
+        for blob in self.collection.find({}, {'urls': 1, 'refcount': 1}):
+            refcount = sum(counts.get(url, 0) for url in blob.get('urls', []))
+            if refcount != blob.get('refcount'):
+                self.collection.update_one({'_id': blob['_id']}, {'$set': {'refcount': refcount}})
+                changed += 1
+        return changed
+
+    def unreferenced(self, grace=GC_GRACE, now=None):
+        """Blobs no document refers to that are older than the grace period"""
+        cutoff = (now or datetime.datetime.utcnow()) - grace
+        return self.collection.find({'refcount': {'$lte': 0}, 'last_uploaded_at': {'$lt': cutoff}})
+
+    def remove(self, sha256):
+        self.collection.delete_one({'_id': sha256})
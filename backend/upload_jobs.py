@@ -0,0 +1,230 @@
+"""
+Background upload jobs.
+
+Uploads are staged on local disk and acknowledged immediately with a job ID;
+a small thread pool then pushes each staged file to the remote store,
+retrying with exponential backoff. Jobs are recorded in the `upload_jobs`
+collection so clients can poll (or long-poll with wait()) for the final URL,
+and jobs interrupted by a restart are picked up again by recover().
+
+Two uploaders are provided: CloudinaryUploader for production and
+LocalUploader, which publishes the staged file under /uploads/ and needs no
+network, for development and tests.
+"""
+
+import datetime
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+JOB_TTL = datetime.timedelta(days=7)
+MAX_ATTEMPTS = 4
+RETRY_BACKOFF = 2.0
+# Keep long-polls short: each one holds a request worker
+MAX_WAIT = 5.0
+# A job untouched for this long belonged to a process that has gone away
+STALE_AFTER = datetime.timedelta(minutes=5)
+# Running uploads refresh updated_at this often, so recover() leaves them alone
+HEARTBEAT_INTERVAL = 60.0
+POLL_INTERVAL = 0.25
+# Cloudinary rejects single-request uploads above 100 MB; send big files in chunks
+LARGE_UPLOAD_SIZE = 20 * 1024 * 1024
+TERMINAL_STATUSES = ('done', 'failed')
+
+
+class CloudinaryUploader:
+    """Push a staged file to Cloudinary"""
+
+    def __init__(self, uploader):
+        self.uploader = uploader
+
+    def upload(self, path, options):
+        if os.path.getsize(path) > LARGE_UPLOAD_SIZE:
+            result = self.uploader.upload_large(path, **options)
+        else:
+            result = self.uploader.upload(path, **options)
+        if not result or not result.get('secure_url'):
+            raise RuntimeError(f'secure_url not found in Cloudinary response: {result}')
+        return {'url': result['secure_url'], 'public_id': result.get('public_id')}
+
+
+class LocalUploader:
+    """Offline stand-in: the staged file is already served from upload_dir"""
+
+    def __init__(self, upload_dir, url_prefix='/uploads/'):
+        self.upload_dir = upload_dir
+        self.url_prefix = url_prefix
+
+    def upload(self, path, options):
+        filename = os.path.basename(path)
+        if not os.path.exists(os.path.join(self.upload_dir, filename)):
+            raise RuntimeError(f'{filename} is not in the uploads directory')
+        return {'url': self.url_prefix + filename, 'public_id': os.path.splitext(filename)[0]}
+
+
+class UploadJobQueue:
+    """Uploads staged files in the background and records their progress"""
+
+    def __init__(self, collection, uploader, on_done=None, max_workers=2,
+                 max_attempts=MAX_ATTEMPTS, backoff=RETRY_BACKOFF, inline=False):
+        self.collection = collection
+        self.uploader = uploader
+        self.on_done = on_done
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        # Serverless workers stop when the response is sent, so run jobs in-request there
+        self.inline = inline
+        self._events = {}
+        self._lock = threading.Lock()
+        self._executor = None if inline else ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='upload-jobs')
+
+    def submit(self, staged_path, options=None, provisional_url=None, discard_staged=False, sha256=None):
+        """Record a job for staged_path and start it; returns the job document"""
+        now = datetime.datetime.utcnow()
+        job = {
+            '_id': uuid.uuid4().hex,
+            'status': 'queued',
+            'staged_path': staged_path,
+            'options': options or {},
+            'provisional_url': provisional_url,
+            'discard_staged': discard_staged,
+            'sha256': sha256,
+            'attempts': 0,
+            'created_at': now,
+            'updated_at': now,
+            'expires_at': now + JOB_TTL,
+        }
+        self.collection.insert_one(job)
+        self._start(job['_id'])
+        return self.collection.find_one({'_id': job['_id']}) if self.inline else job
+
+    def _start(self, job_id):
+        with self._lock:
+            self._events[job_id] = threading.Event()
+        if self.inline:
+            self._run(job_id)
+        else:
+            self._executor.submit(self._run, job_id)
+
+    def _finish(self, job_id, fields):
+        fields['updated_at'] = datetime.datetime.utcnow()
+        self.collection.update_one({'_id': job_id}, {'$set': fields})
+        with self._lock:
+            event = self._events.pop(job_id, None)
+        if event:
+            event.set()
+
+    @contextmanager
+    def _heartbeat(self, job_id):
+        """Refresh the job's updated_at while a (possibly long) upload runs"""
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(HEARTBEAT_INTERVAL):
+                try:
+                    self.collection.update_one(
+                        {'_id': job_id, 'status': 'uploading'},
+                        {'$set': {'updated_at': datetime.datetime.utcnow()}}
+                    )
+                except Exception as e:
+                    print(f"Upload job {job_id} heartbeat failed: {e}")
+
+        thread = threading.Thread(target=beat, name=f'upload-heartbeat-{job_id[:8]}', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def _run(self, job_id):
+        job = self.collection.find_one({'_id': job_id})
+        if not job:
+            return None
+        attempts = job.get('attempts', 0)
+        last_error = None
+        while attempts < self.max_attempts:
+            attempts += 1
+            self.collection.update_one({'_id': job_id}, {'$set': {
+                'status': 'uploading', 'attempts': attempts, 'updated_at': datetime.datetime.utcnow(),
+            }})
+            try:
+                with self._heartbeat(job_id):
+                    result = self.uploader.upload(job['staged_path'], job['options'])
+                break
+            except Exception as e:
+                last_error = str(e)
+                print(f"Upload job {job_id} attempt {attempts} failed: {e}")
+                if attempts < self.max_attempts:
+                    time.sleep(self.backoff * (2 ** (attempts - 1)))
+        else:
+            self._finish(job_id, {'status': 'failed', 'error': last_error})
+            return None
+
+        if job.get('discard_staged') and os.path.exists(job['staged_path']):
+            os.remove(job['staged_path'])
+        if self.on_done:
+            try:
+                self.on_done(job, result)
+            except Exception as e:
+                # The upload itself succeeded; only the follow-up rewrite failed
+                print(f"Upload job {job_id} follow-up failed: {e}")
+        self._finish(job_id, {'status': 'done', 'url': result['url'], 'public_id': result.get('public_id'), 'error': None})
+        return result
+
+    def get(self, job_id):
+        return self.collection.find_one({'_id': job_id})
+
+    def wait(self, job_id, timeout=0):
+        """Return the job, blocking up to timeout seconds for it to finish"""
+        timeout = max(0.0, min(float(timeout or 0), MAX_WAIT))
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            event = self._events.get(job_id)
+        if event:
+            event.wait(timeout)
+            return self.get(job_id)
+        # Running in another process: fall back to polling the collection
+        while True:
+            job = self.get(job_id)
+            if not job or job['status'] in TERMINAL_STATUSES or time.monotonic() >= deadline:
+                return job
+            time.sleep(POLL_INTERVAL)
+
+    def recover(self):
+        """Restart jobs left unfinished by a previous process; returns how many were resumed"""
+        now = datetime.datetime.utcnow()
+        resumed = 0
+        stale = self.collection.find(
+            {'status': {'$in': ['queued', 'uploading']}, 'updated_at': {'$lt': now - STALE_AFTER}},
+            {'staged_path': 1, 'updated_at': 1}
+        )
+        for job in stale:
+            # Claim the job so only one process resumes it
+            claimed = self.collection.update_one(
+                {'_id': job['_id'], 'updated_at': job['updated_at']},
+                {'$set': {'updated_at': now}}
+            )
+            if not claimed.modified_count:
+                continue
+            if os.path.exists(job['staged_path']):
+                self._start(job['_id'])
+                resumed += 1
+            else:
+                self._finish(job['_id'], {'status': 'failed', 'error': 'Staged file is missing'})
+        return resumed
+
+
+def public_job(job):
+    """Fields returned to clients polling a job"""
+    return {
+        'jobId': job['_id'],
+        'status': job['status'],
+        'url': job.get('url') or job.get('provisional_url'),
+        'final': job['status'] == 'done',
+        'attempts': job.get('attempts', 0),
+        'error': job.get('error'),
+    }
@@ -0,0 +1,67 @@
+"""
+Content-addressed storage for local uploads.
+
+Uploaded files are named after the SHA-256 of their bytes, so a name always
+refers to the same content and can be served with an immutable cache
+lifetime. Identical uploads land on the same file.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+CHUNK_SIZE = 1024 * 1024
+HASH_LENGTH = 32
+# One year, the conventional ceiling for immutable assets
+IMMUTABLE_MAX_AGE = 31536000
+
+# <hash>.<ext>, plus derived variants such as <hash>.w320.webp
+HASHED_NAME_RE = re.compile(r'^[0-9a-f]{%d}(\.w\d+)?\.[A-Za-z0-9]+$' % HASH_LENGTH)
+
+
+def hashed_name(digest, ext):
+    return f"{digest[:HASH_LENGTH]}{ext.lower()}"
+
+
+def is_content_hashed(filename):
+    """True when the basename of filename is a content-hashed upload or one of its variants"""
+    return bool(HASHED_NAME_RE.match(os.path.basename(filename)))
+
+
+def save_stream(stream, upload_dir, ext):
+    """
+    Copy stream into upload_dir under its content hash in bounded memory.
+    Returns (filename, sha256 hexdigest, size).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=upload_dir, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+        sha256 = digest.hexdigest()
+        return publish(temp_path, upload_dir, sha256, ext), sha256, size
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def publish(temp_path, upload_dir, sha256, ext):
+    """Move a fully written temp file to its content-hashed name and return that name"""
+    filename = hashed_name(sha256, ext)
+    final_path = os.path.join(upload_dir, filename)
+    if os.path.exists(final_path):
+        # Same bytes are already stored under this name
+        os.remove(temp_path)
+    else:
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, final_path)
+    return filename
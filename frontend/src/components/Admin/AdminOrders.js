@@ -1,26 +1,39 @@
 import React, { useEffect, useState } from 'react';
-import { api } from '../../lib/api';
+import { api, downloadExport } from '../../lib/api';
+
+const PAGE_SIZE = 20;
 
 export default function AdminOrders() {
   const [orders, setOrders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [total, setTotal] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState('');
   const [paymentFilter, setPaymentFilter] = useState('');
   const [deliveryFilter, setDeliveryFilter] = useState('');
   const [sortOrder, setSortOrder] = useState('desc'); // 'desc' for newest first, 'asc' for oldest first
 
+  function pageParams(cursor) {
+    // Build query parameters object with only non-empty values
+    const params = {
+      sortOrder: sortOrder,
+      limit: PAGE_SIZE,
+    };
+    if (paymentFilter) params.paymentStatus = paymentFilter;
+    if (deliveryFilter) params.deliveryStatus = deliveryFilter;
+    if (cursor) params.cursor = cursor;
+    else params.includeTotal = 1;
+    return params;
+  }
+
   async function load() {
     try {
       setLoading(true);
-      // Build query parameters object with only non-empty values
-      const params = {
-        sortOrder: sortOrder
-      };
-      if (paymentFilter) params.paymentStatus = paymentFilter;
-      if (deliveryFilter) params.deliveryStatus = deliveryFilter;
-      
-      const data = await api.listOrders(params);
-      setOrders(data || []);
+      const page = await api.listOrders(pageParams());
+      setOrders(page?.items || []);
+      setNextCursor(page?.next || null);
+      setTotal(page?.total ?? null);
     } catch (e) {
       setError(e.message);
     } finally {
@@ -28,14 +41,37 @@ export default function AdminOrders() {
     }
   }
 
+  async function loadMore() {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const page = await api.listOrders(pageParams(nextCursor));
+      setOrders((prev) => [...prev, ...(page?.items || [])]);
+      setNextCursor(page?.next || null);
+    } catch (e) {
+      setError(e.message);
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   useEffect(() => { 
     load(); 
   }, [paymentFilter, deliveryFilter, sortOrder]);
 
+  async function exportCsv() {
+    try {
+      await downloadExport('orders', { format: 'csv', paymentStatus: paymentFilter, deliveryStatus: deliveryFilter });
+    } catch (e) {
+      setError(e.message);
+    }
+  }
+
   async function setStatus(id, status) {
     try {
       await api.updateOrderStatus(id, status);
-      await load();
+      // Update in place so the pages already loaded stay put
+      setOrders((prev) => prev.map((o) => (o.id === id ? { ...o, deliveryStatus: status } : o)));
     } catch (e) {
       setError(e.message);
     }
@@ -80,6 +116,10 @@ export default function AdminOrders() {
             <option value="Shipped">Shipped</option>
             <option value="Delivered">Delivered</option>
           </select>
+
+          <button className="btn outline primary" style={{ marginLeft: 16 }} onClick={exportCsv}>
+            Export CSV
+          </button>
         </div>
       </div>
       {error && <div className="badge warning">{error}</div>}
@@ -152,6 +192,16 @@ export default function AdminOrders() {
               ))}
             </tbody>
           </table>
+          <div style={{ display: 'flex', alignItems: 'center', justifyContent: 'space-between', padding: '12px 0' }}>
+            <span style={{ color: '#666' }}>
+              Showing {orders.length}{total !== null ? ` of ${total}` : ''} orders
+            </span>
+            {nextCursor && (
+              <button className="btn outline primary" onClick={loadMore} disabled={loadingMore}>
+                {loadingMore ? 'Loading...' : 'Load more'}
+              </button>
+            )}
+          </div>
         </div>
       )}
     </div>
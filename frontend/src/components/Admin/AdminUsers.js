@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from 'react';
-import { api } from '../../lib/api';
+import { api, downloadExport } from '../../lib/api';
 import {
   Box,
   Button,
@@ -116,9 +116,14 @@ export default function AdminUsers() {
     <Box>
       <Box className="panel-header" sx={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', mb: 3 }}>
         <Typography variant="h4">User Management</Typography>
-        <Button variant="contained" onClick={() => setOpenDialog(true)}>
-          Add User
-        </Button>
+        <Box sx={{ display: 'flex', gap: 1 }}>
+          <Button variant="outlined" onClick={() => downloadExport('users', { format: 'csv' }).catch((e) => setError(e.message))}>
+            Export CSV
+          </Button>
+          <Button variant="contained" onClick={() => setOpenDialog(true)}>
+            Add User
+          </Button>
+        </Box>
       </Box>
       
       {error && <Alert severity="error" sx={{ mb: 2 }}>{error}</Alert>}
@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Box, Container, Typography, Button, Grid, Card, CardContent, CardMedia, Dialog, DialogTitle, DialogContent, DialogActions, TextField, FormControl, InputLabel, Select, MenuItem, Alert, Stack, Chip, Tabs, Tab } from '@mui/material';
 import { eventsApi } from '../../lib/eventsApi';
+import { downloadExport } from '../../lib/api';
 import AddIcon from '@mui/icons-material/Add';
 import EditIcon from '@mui/icons-material/Edit';
 import DeleteIcon from '@mui/icons-material/Delete';
@@ -309,9 +310,14 @@ const EventManagement = () => {
             <Typography>Loading registrations...</Typography>
           ) : (
             <Box>
-              <Typography variant="h6" sx={{ mb: 2 }}>
-                Event Registrations ({registrations.length})
-              </Typography>
+              <Box sx={{ display: 'flex', justifyContent: 'space-between', alignItems: 'center', mb: 2 }}>
+                <Typography variant="h6">
+                  Event Registrations ({registrations.length})
+                </Typography>
+                <Button variant="outlined" onClick={() => downloadExport('registrations', { format: 'csv' }).catch(() => setError('Failed to export registrations'))}>
+                  Export CSV
+                </Button>
+              </Box>
               {registrations.length === 0 ? (
                 <Typography color="text.secondary">No registrations found.</Typography>
               ) : (
@@ -33,7 +33,7 @@ export default function RecentActivity() {
         // Fetch recent activities (notifications, orders, users)
         const [notificationsRes, ordersRes, usersRes] = await Promise.all([
           api.adminNotifications().catch(() => ({ notifications: [] })),
-          api.listOrders().catch(() => ({ orders: [] })),
+          api.listOrders({ limit: 2 }).then((page) => ({ orders: page.items })).catch(() => ({ orders: [] })),
           api.listUsers().catch(() => ({ users: [] }))
         ]);
 
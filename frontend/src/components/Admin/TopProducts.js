@@ -1,15 +1,19 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import { Card, CardHeader, CardContent, Stack, Typography, LinearProgress, Avatar } from '@mui/material';
-
-const top = [
-  { name: 'Monstera Deliciosa', sales: 124, growth: '+15.2%', amount: '₹5,580' },
-  { name: 'Snake Plant', sales: 98, growth: '+8.7%', amount: '₹2,842' },
-  { name: 'Peace Lily', sales: 87, growth: '+12.3%', amount: '₹3,132' },
-  { name: 'Pothos', sales: 76, growth: '+6.1%', amount: '₹1,824' },
-  { name: 'Fiddle Leaf Fig', sales: 65, growth: '+9.8%', amount: '₹3,250' },
-];
+import { api } from '../../lib/api';
 
 export default function TopProducts() {
+  const [top, setTop] = useState([]);
+  const [error, setError] = useState('');
+
+  useEffect(() => {
+    api.adminAnalytics({ days: 30, limit: 5 })
+      .then((res) => setTop(res.topProducts || []))
+      .catch((e) => setError(e.message));
+  }, []);
+
+  const maxSold = Math.max(1, ...top.map((p) => p.quantity));
+
   return (
     <Card elevation={0} sx={{
       borderRadius: 4,
@@ -20,13 +24,17 @@ export default function TopProducts() {
     }}>
       <CardHeader
         title={<Typography variant="h6" fontWeight={800} sx={{ color: 'var(--admin-text-primary)' }}>Top Products</Typography>}
-        subheader={<Typography variant="body2" color="success.main" sx={{ fontWeight: 500 }}>Best selling items this month</Typography>}
+        subheader={<Typography variant="body2" color="success.main" sx={{ fontWeight: 500 }}>Best selling items in the last 30 days</Typography>}
         sx={{ borderBottom: '1px solid var(--admin-border)', bgcolor: 'rgba(255,255,255,0.5)' }}
       />
       <CardContent sx={{ p: 3 }}>
         <Stack spacing={2}>
+          {error && <Typography variant="body2" color="error">{error}</Typography>}
+          {!error && top.length === 0 && (
+            <Typography variant="body2" color="var(--admin-text-secondary)">No sales yet</Typography>
+          )}
           {top.map((p, i) => (
-            <Stack key={p.name} spacing={1.5} sx={{
+            <Stack key={p.productId} spacing={1.5} sx={{
               p: 2,
               bgcolor: 'rgba(255,255,255,0.4)',
               borderRadius: 3,
@@ -43,17 +51,17 @@ export default function TopProducts() {
                   <Avatar sx={{ width: 36, height: 36, bgcolor: 'var(--admin-primary)', color: 'white', fontSize: 14, fontWeight: 700 }}>{i + 1}</Avatar>
                   <Stack sx={{ flex: 1, minWidth: 0 }}>
                     <Typography variant="body1" fontWeight={700} sx={{ color: 'var(--admin-text-primary)', lineHeight: 1.2 }}>{p.name}</Typography>
-                    <Typography variant="caption" color="var(--admin-text-secondary)">{p.sales} sales</Typography>
+                    <Typography variant="caption" color="var(--admin-text-secondary)">{p.quantity} sold</Typography>
                   </Stack>
                 </Stack>
                 <Stack alignItems="flex-end" sx={{ flexShrink: 0 }}>
-                  <Typography variant="body2" color="success.main" fontWeight={700}>{p.growth}</Typography>
-                  <Typography variant="caption" color="var(--admin-text-secondary)" fontWeight={600}>{p.amount}</Typography>
+                  <Typography variant="body2" color="success.main" fontWeight={700}>₹{p.revenue.toLocaleString('en-IN')}</Typography>
+                  <Typography variant="caption" color="var(--admin-text-secondary)" fontWeight={600}>{p.orders} orders</Typography>
                 </Stack>
               </Stack>
               <LinearProgress
                 variant="determinate"
-                value={Math.min(100, (p.sales / 124) * 100)}
+                value={Math.min(100, (p.quantity / maxSold) * 100)}
                 sx={{
                   height: 6,
                   borderRadius: 999,
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import './Checkout.css';
 import { api, assetUrl } from '../../lib/api';
 
@@ -28,6 +28,19 @@ const Checkout = ({ cartItems, onOrderComplete }) => {
   });
 
   const [errors, setErrors] = useState({});
+  // One key per distinct order attempt: resubmitting the same cart and address
+  // (e.g. after a timeout) replays the order already placed instead of a new one
+  const orderAttempt = useRef({ payload: null, key: null });
+
+  const idempotencyKeyFor = (payload) => {
+    const serialized = JSON.stringify(payload);
+    if (orderAttempt.current.payload !== serialized) {
+      const key = window.crypto?.randomUUID ? window.crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+      orderAttempt.current = { payload: serialized, key };
+    }
+    return orderAttempt.current.key;
+  };
+
   const [isProcessing, setIsProcessing] = useState(false);
   const [isLoadingLocation, setIsLoadingLocation] = useState(false);
   const [paymentError, setPaymentError] = useState('');
@@ -191,14 +204,15 @@ const Checkout = ({ cartItems, onOrderComplete }) => {
       const addressString = `${formData.address}, ${formData.city}, ${formData.state} ${formData.zipCode}`;
 
       if (formData.paymentMethod === 'cod') {
-        const res = await api.createOrder({
+        const payload = {
           products: productsPayload,
           totalAmount: orderTotal.total,
           address: addressString,
           paymentMethod: 'cod'
-        });
+        };
+        const res = await api.createOrder(payload, idempotencyKeyFor(payload));
         if (res.status === 'success') {
-          onOrderComplete({ orderId: res.orderId, status: 'success', total: orderTotal.total, date: new Date().toISOString(), method: 'COD' });
+          onOrderComplete({ orderId: res.orderId, status: 'success', total: res.total ?? orderTotal.total, date: new Date().toISOString(), method: 'COD' });
         } else {
           throw new Error(res.error || 'Failed to place COD order');
         }
@@ -206,12 +220,13 @@ const Checkout = ({ cartItems, onOrderComplete }) => {
         const ok = await loadRazorpay();
         if (!ok) throw new Error('Failed to load payment SDK');
 
-        const createRes = await api.createOrder({
+        const payload = {
           products: productsPayload,
           totalAmount: orderTotal.total,
           address: addressString,
           paymentMethod: 'razorpay'
-        });
+        };
+        const createRes = await api.createOrder(payload, idempotencyKeyFor(payload));
 
         const options = {
           key: createRes.razorpayKeyId,
@@ -234,7 +249,7 @@ const Checkout = ({ cartItems, onOrderComplete }) => {
                 dbOrderId: createRes.orderId,
               });
               if (verifyRes.success) {
-                onOrderComplete({ orderId: createRes.orderId, status: 'success', total: orderTotal.total, date: new Date().toISOString(), method: 'Razorpay' });
+                onOrderComplete({ orderId: createRes.orderId, status: 'success', total: createRes.total ?? orderTotal.total, date: new Date().toISOString(), method: 'Razorpay' });
               } else {
                 setPaymentError(verifyRes.error || 'Payment verification failed');
               }
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useParams } from 'react-router-dom';
-import { getUserOrders } from '../../lib/api';
+import { getUserOrder } from '../../lib/api';
 import './OrderDetails.css';
 
 const OrderDetails = ({ user }) => {
@@ -15,16 +15,9 @@ const OrderDetails = ({ user }) => {
       
       try {
         setLoading(true);
-        const orders = await getUserOrders();
-        const foundOrder = orders.find(o => o.id === orderId);
-        
-        if (foundOrder) {
-          setOrder(foundOrder);
-        } else {
-          setError('Order not found');
-        }
+        setOrder(await getUserOrder(orderId));
       } catch (err) {
-        setError('Failed to load order details');
+        setError(err.status === 404 ? 'Order not found' : 'Failed to load order details');
         console.error('Error fetching order:', err);
       } finally {
         setLoading(false);
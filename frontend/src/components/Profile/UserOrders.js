@@ -2,9 +2,13 @@ import React, { useState, useEffect } from 'react';
 import { getUserOrders } from '../../lib/api';
 import './UserOrders.css';
 
+const PAGE_SIZE = 10;
+
 const UserOrders = ({ user }) => {
   const [orders, setOrders] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState('');
 
   useEffect(() => {
@@ -13,8 +17,9 @@ const UserOrders = ({ user }) => {
       
       try {
         setLoading(true);
-        const orders = await getUserOrders();
-        setOrders(orders);
+        const page = await getUserOrders({ limit: PAGE_SIZE });
+        setOrders(page.items || []);
+        setNextCursor(page.next || null);
       } catch (err) {
         setError('Failed to load orders');
         console.error('Error fetching orders:', err);
@@ -28,6 +33,21 @@ const UserOrders = ({ user }) => {
     }
   }, [user]);
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    try {
+      setLoadingMore(true);
+      const page = await getUserOrders({ limit: PAGE_SIZE, cursor: nextCursor });
+      setOrders((prev) => [...prev, ...(page.items || [])]);
+      setNextCursor(page.next || null);
+    } catch (err) {
+      setError('Failed to load orders');
+      console.error('Error fetching orders:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const formatDate = (dateString) => {
     if (!dateString) return 'N/A';
     return new Date(dateString).toLocaleDateString('en-US', {
@@ -143,6 +163,12 @@ const UserOrders = ({ user }) => {
                 </div>
               </div>
             ))}
+            {nextCursor && (
+              <button className="secondary-btn load-more-btn" onClick={loadMore} disabled={loadingMore}>
+                <span className="material-icons">expand_more</span>
+                {loadingMore ? 'Loading...' : 'Load more orders'}
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -1,10 +1,14 @@
 import React, { useState, useEffect } from 'react';
-import { getUserOrders } from '../../lib/api';
+import { getUserOrders, getUserOrderSummary } from '../../lib/api';
 import './UserProfile.css';
 
+const RECENT_ORDERS = 5;
+
 const UserProfile = ({ user, wishlistItems = [] }) => {
   const safeUser = user || { name: 'Guest User', email: 'guest@example.com' };
   const [userOrders, setUserOrders] = useState([]);
+  const [hasMoreOrders, setHasMoreOrders] = useState(false);
+  const [orderSummary, setOrderSummary] = useState({ totalOrders: 0, totalSpent: 0 });
   const [loadingOrders, setLoadingOrders] = useState(false);
   const [error, setError] = useState('');
   const [activeTab, setActiveTab] = useState('orders'); // orders, wishlist, settings
@@ -16,8 +20,14 @@ const UserProfile = ({ user, wishlistItems = [] }) => {
       
       try {
         setLoadingOrders(true);
-        const orders = await getUserOrders();
-        setUserOrders(orders);
+        // Recent orders only; the totals come from a server-side aggregate
+        const [page, summary] = await Promise.all([
+          getUserOrders({ limit: RECENT_ORDERS }),
+          getUserOrderSummary(),
+        ]);
+        setUserOrders(page.items || []);
+        setHasMoreOrders(Boolean(page.next));
+        setOrderSummary(summary);
       } catch (err) {
         setError('Failed to load orders');
         console.error('Error fetching orders:', err);
@@ -66,9 +76,9 @@ const UserProfile = ({ user, wishlistItems = [] }) => {
 
   // Calculate user stats
   const userStats = {
-    totalOrders: userOrders.length,
+    totalOrders: orderSummary.totalOrders || 0,
     wishlistCount: wishlistItems.length,
-    totalSpent: userOrders.reduce((sum, order) => sum + (order.totalAmount || 0), 0)
+    totalSpent: Number(orderSummary.totalSpent || 0)
   };
 
   return (
@@ -275,6 +285,12 @@ const UserProfile = ({ user, wishlistItems = [] }) => {
                           </div>
                         </div>
                       ))}
+                      {hasMoreOrders && (
+                        <button className="secondary-btn" onClick={() => window.location.href = '/orders'}>
+                          <span className="material-icons">list</span>
+                          View all {userStats.totalOrders} orders
+                        </button>
+                      )}
                     </div>
                   )}
                 </div>
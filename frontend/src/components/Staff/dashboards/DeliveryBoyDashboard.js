@@ -1,6 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-import { listDeliveryOrders, markOrderDelivered } from '../../../lib/api';
+import { listDeliveryOrders, markOrderDelivered, claimDeliveryOrders, releaseDeliveryOrder, listDeliveryBatches } from '../../../lib/api';
 import {
     AppBar,
     Toolbar,
@@ -43,6 +43,8 @@ export default function DeliveryBoyDashboard({ user, onLogout }) {
     const [error, setError] = useState('');
     const [mobileOpen, setMobileOpen] = useState(false);
     const [activeView, setActiveView] = useState('active'); // 'active' or 'history'
+    const [claiming, setClaiming] = useState(false);
+    const [batches, setBatches] = useState([]);
 
     const navigate = useNavigate();
     const theme = useTheme();
@@ -53,6 +55,11 @@ export default function DeliveryBoyDashboard({ user, onLogout }) {
             setLoading(true);
             const data = await listDeliveryOrders(activeView);
             setOrders(data || []);
+            if (activeView === 'active') {
+                // Zones with orders waiting to be picked up, busiest first
+                const zones = await listDeliveryBatches().catch(() => []);
+                setBatches(zones || []);
+            }
         } catch (e) {
             setError(e.message);
         } finally {
@@ -74,6 +81,30 @@ export default function DeliveryBoyDashboard({ user, onLogout }) {
         }
     };
 
+    const handleClaim = async (zone) => {
+        try {
+            setClaiming(true);
+            setError('');
+            const res = await claimDeliveryOrders(undefined, zone);
+            if (!res?.claimed?.length) setError('No orders are waiting to be picked up, or you already hold the maximum.');
+            loadOrders();
+        } catch (e) {
+            setError(e.message);
+        } finally {
+            setClaiming(false);
+        }
+    };
+
+    const handleRelease = async (id) => {
+        if (!window.confirm('Return this order to the pool for another delivery partner?')) return;
+        try {
+            await releaseDeliveryOrder(id);
+            loadOrders();
+        } catch (e) {
+            alert('Failed to release order: ' + e.message);
+        }
+    };
+
     const handleLogout = () => {
         if (onLogout) onLogout();
         navigate('/');
@@ -166,6 +197,18 @@ export default function DeliveryBoyDashboard({ user, onLogout }) {
                     <Typography variant="h6" noWrap component="div" sx={{ flexGrow: 1, fontWeight: 800, color: '#2e7d32' }}>
                         {activeView === 'active' ? 'Active Deliveries' : 'Delivery History'}
                     </Typography>
+                    {activeView === 'active' && (
+                        <Button
+                            variant="contained"
+                            color="success"
+                            startIcon={claiming ? <CircularProgress size={16} color="inherit" /> : <LocalShippingIcon />}
+                            onClick={() => handleClaim()}
+                            disabled={claiming}
+                            sx={{ borderRadius: 2, textTransform: 'none', fontWeight: 700 }}
+                        >
+                            Claim next orders
+                        </Button>
+                    )}
                 </Toolbar>
             </AppBar>
 
@@ -204,6 +247,24 @@ export default function DeliveryBoyDashboard({ user, onLogout }) {
                 <Container maxWidth="md" sx={{ py: 2 }}>
                     {error && <Alert severity="error" sx={{ mb: 3, borderRadius: 2 }}>{error}</Alert>}
 
+                    {activeView === 'active' && batches.length > 0 && (
+                        <Stack direction="row" spacing={1} useFlexGap flexWrap="wrap" alignItems="center" sx={{ mb: 3 }}>
+                            <Typography variant="body2" color="text.secondary" fontWeight={600}>Claim by area:</Typography>
+                            {batches.map((batch) => (
+                                <Chip
+                                    key={batch.zone}
+                                    icon={<LocationOnIcon />}
+                                    label={`PIN ${batch.zone}xxx · ${batch.orders.length} waiting`}
+                                    onClick={() => handleClaim(batch.zone)}
+                                    disabled={claiming}
+                                    variant="outlined"
+                                    color="success"
+                                    sx={{ fontWeight: 600 }}
+                                />
+                            ))}
+                        </Stack>
+                    )}
+
                     {loading ? (
                         <Box sx={{ display: 'flex', justifyContent: 'center', py: 8 }}><CircularProgress /></Box>
                     ) : (
@@ -214,7 +275,7 @@ export default function DeliveryBoyDashboard({ user, onLogout }) {
                                         {activeView === 'active' ? <LocalShippingIcon sx={{ fontSize: 40, color: '#ccc' }} /> : <HistoryIcon sx={{ fontSize: 40, color: '#ccc' }} />}
                                     </Box>
                                     <Typography color="text.secondary" fontWeight={500}>
-                                        {activeView === 'active' ? 'No pending deliveries assigned to you.' : 'No delivery history found.'}
+                                        {activeView === 'active' ? 'No deliveries assigned to you. Claim the next orders to get started.' : 'No delivery history found.'}
                                     </Typography>
                                 </Box>
                             ) : (
@@ -230,6 +291,7 @@ export default function DeliveryBoyDashboard({ user, onLogout }) {
                                         <Box sx={{ p: 2, borderBottom: '1px solid #f5f5f5', display: 'flex', justifyContent: 'space-between', alignItems: 'center', bgcolor: activeView === 'active' ? '#fafafa' : '#e8f5e9', borderTopLeftRadius: 16, borderTopRightRadius: 16 }}>
                                             <Typography variant="caption" fontWeight={700} color="text.secondary" sx={{ letterSpacing: 0.5 }}>
                                                 ORDER #{order.id.substring(0, 8).toUpperCase()}
+                                                {order.pincode && ` · PIN ${order.pincode}`}
                                             </Typography>
                                             <Chip
                                                 label={order.deliveryStatus}
@@ -286,6 +348,14 @@ export default function DeliveryBoyDashboard({ user, onLogout }) {
                                                         >
                                                             Map
                                                         </Button>
+                                                        <Button
+                                                            variant="outlined"
+                                                            color="inherit"
+                                                            onClick={() => handleRelease(order.id)}
+                                                            sx={{ flex: 1, borderRadius: 2, textTransform: 'none', fontWeight: 600, py: 1 }}
+                                                        >
+                                                            Release
+                                                        </Button>
                                                     </Stack>
                                                 )}
 
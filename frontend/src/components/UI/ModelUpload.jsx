@@ -1,5 +1,5 @@
 import React, { useState } from 'react';
-import { uploadImage } from '../../lib/api'; // We can reuse the same API helper or create a new one
+import { uploadImage, waitForUpload } from '../../lib/api'; // We can reuse the same API helper or create a new one
 import { handleImageUpload } from '../../lib/imageUpload'; // We might need to adjust this or duplicate logic for models
 
 const ModelUpload = ({
@@ -33,11 +33,12 @@ const ModelUpload = ({
                 body: formData
             });
 
-            const data = await response.json();
+            let data = await response.json();
 
             if (!response.ok) {
                 throw new Error(data.error || 'Upload failed');
             }
+            data = await waitForUpload(data);
 
             if (data.success) {
                 if (setValue) setValue(data.url);
@@ -75,10 +75,56 @@ async function request(path, options = {}) {
   }
 }
 
+// Admin exports are streamed by the server (CSV or NDJSON); save one as a file
+export async function downloadExport(dataset, params = {}) {
+  const filtered = Object.fromEntries(
+    Object.entries(params).filter(([_, v]) => v !== undefined && v !== null && v !== '')
+  );
+  const query = new URLSearchParams(filtered).toString();
+  const res = await fetch(`${BASE_URL}/admin/exports/${dataset}${query ? `?${query}` : ''}`, {
+    headers: getAuthHeaders(),
+    credentials: 'include',
+  });
+  if (!res.ok) {
+    const text = await res.text();
+    let data = null;
+    try {
+      data = JSON.parse(text);
+    } catch (e) {
+      // Not JSON
+    }
+    throw new ApiError(data?.error || `Export failed: ${res.status}`, res.status, data);
+  }
+  const blob = await res.blob();
+  const link = document.createElement('a');
+  link.href = URL.createObjectURL(blob);
+  link.download = `${dataset}-${new Date().toISOString().slice(0, 10)}.${filtered.format || 'csv'}`;
+  document.body.appendChild(link);
+  link.click();
+  link.remove();
+  URL.revokeObjectURL(link.href);
+}
+
+// Uploads are acknowledged with a provisional URL while a background job
+// pushes them to Cloudinary; long-poll the job until the final URL is known.
+export async function waitForUpload(result, { attempts = 12 } = {}) {
+  if (!result || !result.jobId || result.final) return result;
+  let latest = result;
+  for (let i = 0; i < attempts; i += 1) {
+    const response = await fetch(`${API_ORIGIN}${result.statusUrl}?wait=5`, { headers: getAuthHeaders() });
+    if (!response.ok) break;
+    latest = await response.json();
+    if (latest.status === 'done' || latest.status === 'failed') break;
+  }
+  // A failed job still leaves the provisional copy in place
+  return { ...result, ...latest, url: latest.url || result.url };
+}
+
 // Export all API functions directly instead of attaching to an object
 export const api = {
   // Admin stats
   adminStats: () => request('/admin/stats'),
+  adminAnalytics: (params = {}) => request(`/admin/analytics?${new URLSearchParams(params).toString()}`),
 
   // Products (Admin + Public)
   listProductsPublic: (path = '') => request(`/products${path}`),
@@ -125,7 +171,7 @@ export const api = {
       throw new Error('Upload succeeded but no URL returned');
     }
 
-    return result;
+    return waitForUpload(result);
   },
 
   // Orders
@@ -136,12 +182,33 @@ export const api = {
     const query = new URLSearchParams(filtered).toString();
     return request(`/orders${query ? `?${query}` : ''}`);
   },
-  getUserOrders: () => request('/user/orders'),
+  getUserOrders: (params = {}) => {
+    const filtered = Object.fromEntries(
+      Object.entries(params).filter(([_, v]) => v !== undefined && v !== null && v !== '')
+    );
+    const query = new URLSearchParams(filtered).toString();
+    return request(`/user/orders${query ? `?${query}` : ''}`);
+  },
+  getUserOrderSummary: () => request('/user/orders/summary'),
+  getUserOrder: (id) => request(`/user/orders/${id}`),
   updateOrderStatus: (id, status) => request(`/orders/${id}/status`, { method: 'PUT', body: JSON.stringify({ status }) }),
-  createOrder: (payload) => request('/orders/create', { method: 'POST', body: JSON.stringify(payload) }),
-  verifyPayment: (payload) => request('/orders/verify', { method: 'POST', body: JSON.stringify(payload) }),
+  // Retries that reuse idempotencyKey get the original order back instead of a new one
+  createOrder: (payload, idempotencyKey) => request('/orders/create', {
+    method: 'POST',
+    body: JSON.stringify(payload),
+    headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {},
+  }),
+  verifyPayment: (payload) => request('/orders/verify', {
+    method: 'POST',
+    body: JSON.stringify(payload),
+    headers: { 'Idempotency-Key': payload.razorpay_payment_id },
+  }),
   listDeliveryOrders: (type = 'active') => request(`/delivery/orders?type=${type}`),
   markOrderDelivered: (id) => request(`/delivery/orders/${id}/deliver`, { method: 'POST' }),
+  claimDeliveryOrders: (count, zone) => request('/delivery/orders/claim', { method: 'POST', body: JSON.stringify({ ...(count ? { count } : {}), ...(zone ? { zone } : {}) }) }),
+  listDeliveryBatches: (size) => request(`/delivery/batches${size ? `?size=${size}` : ''}`),
+  listDeliveryZones: () => request('/delivery/zones'),
+  releaseDeliveryOrder: (id) => request(`/delivery/orders/${id}/release`, { method: 'POST' }),
 
   // Inventory alerts
   lowStock: (threshold) => request(`/admin/low-stock${threshold ? `?threshold=${encodeURIComponent(threshold)}` : ''}`),
@@ -314,6 +381,7 @@ export const api = {
 
 // Export individual functions for direct access
 export const adminStats = api.adminStats;
+export const adminAnalytics = api.adminAnalytics;
 export const listProductsPublic = api.listProductsPublic;
 export const listProducts = api.listProducts;
 export const createProduct = api.createProduct;
@@ -322,6 +390,8 @@ export const deleteProduct = api.deleteProduct;
 export const uploadImage = api.uploadImage;
 export const listOrders = api.listOrders;
 export const getUserOrders = api.getUserOrders;
+export const getUserOrderSummary = api.getUserOrderSummary;
+export const getUserOrder = api.getUserOrder;
 export const updateOrderStatus = api.updateOrderStatus;
 export const createOrder = api.createOrder;
 export const verifyPayment = api.verifyPayment;
@@ -377,5 +447,9 @@ export const recommendCrops = api.recommendCrops;
 export const listCropsSuitability = api.listCropsSuitability;
 export const listDeliveryOrders = api.listDeliveryOrders;
 export const markOrderDelivered = api.markOrderDelivered;
+export const claimDeliveryOrders = api.claimDeliveryOrders;
+export const releaseDeliveryOrder = api.releaseDeliveryOrder;
+export const listDeliveryBatches = api.listDeliveryBatches;
+export const listDeliveryZones = api.listDeliveryZones;
 // Rename the export to avoid naming conflict
 export const getAuthHeadersFunction = getAuthHeaders;
\ No newline at end of file